@@ -8,33 +8,56 @@ import shutil
 import socket
 import platform
 import json
+import importlib.util
+from contextlib import closing
+from dataclasses import dataclass
 from datetime import datetime
 import concurrent.futures
+import queue
+import threading
 import random
-import requests
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
 from selenium.common.exceptions import NoSuchWindowException, WebDriverException, TimeoutException
-from selenium.webdriver.common.action_chains import ActionChains
 
 # SMTP email imports
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
-import ssl
+from smtp_sender import REGARDS_SECTION, SMTPSender, SMTPTimings
+from rate_limit import AdaptiveLimiter, TokenBucket, TokenBudgetScheduler
+from llm_enrichment import EnrichmentEngine
+from llm_cache import LLMCache
+from llm_client import LLMClient, LLMRateLimitError, RateLimitInfo, raise_for_provider_status
+from llm_stream import read_json_stream
+from content_cleaning import DEFAULT_MAX_TOKENS, clean_post_content
+from name_resolution import resolve_name
+from network_capture import enable_performance_logging
+from keyword_workers import (EMAIL_REGEX, BrowserSetup, KeywordJob, KeywordWorkerPool, load_cookies,
+                             scrape_keyword_page, scraping_options)
+from process_supervisor import ProcessSupervisor
+from chrome_profiles import ProfilePool, gc_profiles
+from driver_cache import LaunchTimings, clear_driver_cache, launch_chrome, launch_history, record_launch, timings_summary
+from resource_profiles import DEFAULT_PROFILE, PROFILES, PageMetrics, apply_profile, measure_page
+from page_scripts import collect_lead_posts, expand_collapsed_posts, scroll_and_wait
+from html_parsing import get_post_parser
+import llm_batch
 
 # Debug log area
 if 'debug_log' not in st.session_state:
     st.session_state.debug_log = ''
+_debug_log_lock = threading.Lock()
+# Set on LLM enrichment worker threads, which have no script run context: their log
+# lines go through the engine and are written to session state on the script thread
+_enrichment_worker = threading.local()
 def log_debug(msg):
-    st.session_state.debug_log += str(msg) + '\n'
-    if len(st.session_state.debug_log) > 5000:
-        st.session_state.debug_log = st.session_state.debug_log[-5000:]
+    engine = getattr(_enrichment_worker, 'engine', None)
+    if engine is not None:
+        engine.report_log(str(msg))
+        return
+    with _debug_log_lock:
+        st.session_state.debug_log += str(msg) + '\n'
+        if len(st.session_state.debug_log) > 5000:
+            st.session_state.debug_log = st.session_state.debug_log[-5000:]
 
 # --- Groq AI API config ---
 GROQ_API_KEY = st.session_state.get("groq_api_key", "YOUR_GROQ_API_KEY_HERE")
@@ -45,8 +68,157 @@ GROQ_MODELS = [
     # Add more models here as Groq supports them
 ]
 GROQ_MODEL_DEFAULT = "llama-3.3-70b-versatile"
+# Per-model quotas (requests / tokens per minute) used by the token-budget scheduler.
+# Defaults match Groq's free tier; raise them to your account's limits.
+GROQ_MODEL_LIMITS = {
+    "llama-3.3-70b-versatile": {"rpm": 30, "tpm": 12000},
+}
+OPENAI_MODEL_LIMITS = {
+    "gpt-3.5-turbo": {"rpm": 3500, "tpm": 200000},
+}
+
+OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
+LLM_CHAT_URLS = {"groq": GROQ_API_URL, "openai": OPENAI_API_URL}
+LLM_CONNECT_TIMEOUT = 5.0   # seconds to establish TCP + TLS
+LLM_READ_TIMEOUT = 60.0     # seconds to wait for the completion
+
+@st.cache_resource
+def get_llm_client(provider, connect_timeout=LLM_CONNECT_TIMEOUT, read_timeout=LLM_READ_TIMEOUT):
+    """Pooled keep-alive client per provider, reused across Streamlit reruns."""
+    return LLMClient(provider, LLM_CHAT_URLS[provider], connect_timeout=connect_timeout, read_timeout=read_timeout)
+
+@st.cache_resource
+def get_adaptive_limiter(provider):
+    """Account-wide AIMD limiter per provider, shared by every worker and rerun."""
+    return AdaptiveLimiter(initial=2, maximum=16)
+
+@st.cache_resource
+def get_token_scheduler(provider, model):
+    """Per-model RPM/TPM budget shared by every worker, so batches run at the quota's pace."""
+    limits = (GROQ_MODEL_LIMITS if provider == "groq" else OPENAI_MODEL_LIMITS).get(model, {})
+    return TokenBudgetScheduler(requests_per_minute=limits.get("rpm"), tokens_per_minute=limits.get("tpm"))
+
+@st.cache_resource
+def get_html_parser():
+    """Fastest installed post parser backend (selectolax, lxml, then html.parser), built once."""
+    parser = get_post_parser()
+    log_debug(f"[INFO] Parsing posts with the {parser.name} backend")
+    return parser
+
+@st.cache_resource
+def get_llm_cache():
+    """One on-disk response cache per server process, shared across reruns and sessions."""
+    return LLMCache()
+
+@dataclass
+class LLMBackend:
+    """The shared client, limiter, token budget and response cache for one provider/model."""
+    provider: str
+    client: LLMClient
+    limiter: AdaptiveLimiter
+    scheduler: TokenBudgetScheduler
+    cache: LLMCache
+
+def get_llm_backend(provider, model):
+    """Look up the cached resources for ``provider``/``model``; call on the script thread."""
+    provider = provider.lower()
+    return LLMBackend(provider, get_llm_client(provider), get_adaptive_limiter(provider),
+                      get_token_scheduler(provider, model), get_llm_cache())
+
+def parse_llm_json(text):
+    """Parse a JSON object out of a chat completion, tolerating code fences and chatter around it."""
+    text = re.sub(r"^(```json|```|json)\s*", "", text.strip(), flags=re.IGNORECASE).strip('`\n ')
+    try:
+        return json.loads(text)
+    except ValueError:
+        match = re.search(r"\{.*\}", text, flags=re.DOTALL)
+        if not match:
+            raise
+        return json.loads(match.group(0))
+
+def call_with_rate_limit_retries(fn, *args, max_retries=3):
+    """
+    Call ``fn`` and retry it when the provider rate-limits. There is no sleep
+    here: the shared AdaptiveLimiter already holds every worker until the
+    reset the provider advertised, so the retry simply waits for a slot.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args)
+        except LLMRateLimitError:
+            if attempt == max_retries:
+                raise
 
-def extract_name_from_content(content):
+def chat_completion_text(backend, api_key, data, validate=None, stream_fields=None, on_fields=None, cache_bypass=False):
+    """
+    POST a chat completion over the backend's pooled client and return the
+    assistant's text, going through the on-disk response cache (unless
+    ``cache_bypass``). Only responses that pass ``validate`` (if given) are
+    cached, so a malformed answer is retried next time instead of replayed.
+
+    With ``stream_fields`` the completion is streamed: top-level JSON string
+    fields are parsed as they arrive, ``on_fields`` gets the fields so far each
+    time one completes, and the stream is closed as soon as all of
+    ``stream_fields`` are in.
+    """
+    provider = backend.provider
+    cache = backend.cache
+    key = LLMCache.make_key(provider, data)
+    if not cache_bypass:
+        cached = cache.get(key)
+        if cached is not None:
+            log_debug(f"[{provider.upper()} CACHE] hit {key[3][:12]}")
+            return cached
+    # Reserve this request's estimated tokens in the model's per-minute budget
+    scheduler = backend.scheduler
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in data.get("messages", []))
+    prompt_estimate, reserve_tokens = scheduler.estimate(prompt_chars, data.get("max_tokens", 0), len(data.get("messages", [])))
+    reservation = scheduler.reserve(reserve_tokens)
+    billed_tokens, billed_prompt = 0, None
+    limiter = backend.limiter
+    streaming = stream_fields is not None
+    request_data = data
+    if streaming:
+        request_data = dict(data, stream=True)
+        if provider == "openai":
+            request_data["stream_options"] = {"include_usage": True}
+    try:
+        with limiter:
+            response = backend.client.chat(api_key, request_data, stream=streaming)
+            # The slot stays held while the stream is read
+            streamed = read_json_stream(response, stream_fields, on_fields) if streaming and response.ok else None
+        log_debug(f"[{provider.upper()} DEBUG] Status code: {response.status_code}")
+        if streamed is None:
+            log_debug(f"[{provider.upper()} DEBUG] Response text: {response.text}")
+        info = RateLimitInfo.from_headers(response.headers)
+        try:
+            raise_for_provider_status(provider, response, info)
+        except LLMRateLimitError as e:
+            limiter.on_rate_limited(e.retry_after)
+            log_debug(f"[{provider.upper()} RATE LIMIT] retry after {e.retry_after}s, "
+                      f"concurrency now {limiter.stats()['concurrency_limit']}")
+            raise
+        limiter.on_success(info.remaining_requests, info.reset_requests, info.remaining_tokens, info.reset_tokens)
+        if streamed is not None:
+            log_debug(f"[{provider.upper()} STREAM] {streamed.generated_chars} chars"
+                      f"{', closed early' if streamed.cancelled_early else ''}: {streamed.text}")
+            text, usage = streamed.text, streamed.usage
+            # An early-closed stream has no usage chunk; bill what was generated
+            billed_tokens = usage.get('total_tokens', prompt_estimate + streamed.completion_tokens_estimate())
+        else:
+            result = response.json()
+            text = result['choices'][0]['message']['content']
+            usage = result.get('usage') or {}
+            billed_tokens = usage.get('total_tokens', reserve_tokens)
+        billed_prompt = usage.get('prompt_tokens')
+    finally:
+        scheduler.settle(reservation, billed_tokens, prompt_estimate, billed_prompt)
+    if validate is not None:
+        validate(text)
+    cache.set(key, text)
+    return text
+
+def extract_name_from_content(content, settings):
     """Extract name from LinkedIn post content using Groq API"""
     prompt = f"""
 Extract the person's name from this LinkedIn post content. Look for:
@@ -60,13 +232,8 @@ Return ONLY a JSON object with key "name" and the extracted name as value. If no
 LinkedIn Post Content:
 {content}
 """
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    model = st.session_state.get("groq_model", GROQ_MODEL_DEFAULT)
     data = {
-        "model": model,
+        "model": settings.groq_model,
         "messages": [
             {"role": "system", "content": "You are a helpful assistant that extracts names from text."},
             {"role": "user", "content": prompt}
@@ -75,37 +242,37 @@ LinkedIn Post Content:
         "temperature": 0.3
     }
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-        try:
-            result = response.json()
-            import json as pyjson
-            text = result['choices'][0]['message']['content']
-            text = re.sub(r"^(```json|```|json)\\s*", "", text.strip(), flags=re.IGNORECASE)
-            text = text.strip('`\n ')
-            parsed = pyjson.loads(text)
-            return parsed.get('name', 'there')
-        except Exception:
-            return 'there'
+        text = chat_completion_text(settings.name_backend, GROQ_API_KEY, data, validate=parse_llm_json,
+                                    cache_bypass=settings.cache_bypass)
+        return parse_llm_json(text).get('name', 'there')
+    except LLMRateLimitError:
+        raise
     except Exception:
         return 'there'
 
-def call_groq_api(email, content):
-    # Structured, concise prompt for Moshi Moshi outreach, enforce brevity and JSON
-    prompt = f"""
-You are Anusha, a sales person from Moshi Moshi, a branding and consultancy agency in Bangalore. Write a personalized outreach email based on the following LinkedIn post content.
+# --- Outreach email template ---
+# The fixed parts of every outreach email. In template mode the LLM writes only the
+# subject and the personalized paragraph, and the body is stitched together locally.
+EMAIL_INTRO = """Well, that's how we say hello. Hope you are doing great!
 
-Use this EXACT email format:
+Just a quick intro about Moshi Moshi — we're a Bangalore-headquartered communication company with offices in Mumbai and Gurgaon, working at the intersection of design, digital, content, and code — turning brand goals into sharp strategies, clean visuals, and campaigns that don't just look good, but actually connect with the right audience.
 
-Well, that's how we say hello. Hope you are doing great!
+Over the last 10 years, we haven't just worked on major launches, legacy rebrands, or brand campaigns that grabbed attention — we've steadily become long-term partners to many businesses, including several in your space, supporting them from brand creation all the way to customer acquisition. That's where both our clients and we see real value."""
 
-Just a quick intro about Moshi Moshi — we're a Bangalore-headquartered communication company with offices in Mumbai and Gurgaon, working at the intersection of design, digital, content, and code — turning brand goals into sharp strategies, clean visuals, and campaigns that don't just look good, but actually connect with the right audience.
+EMAIL_CLOSING = """Attaching a few relevant projects from your space (and a few others), along with a quick proposal. Let us know a good time this week — we'd love to walk you through our approach."""
 
-Over the last 10 years, we haven't just worked on major launches, legacy rebrands, or brand campaigns that grabbed attention — we've steadily become long-term partners to many businesses, including several in your space, supporting them from brand creation all the way to customer acquisition. That's where both our clients and we see real value.
+PERSONALIZED_PARAGRAPH_PLACEHOLDER = "[ADD A PERSONALIZED PARAGRAPH HERE based on the LinkedIn content - mention their specific need/pain point and how Moshi Moshi can help them specifically]"
 
-[ADD A PERSONALIZED PARAGRAPH HERE based on the LinkedIn content - mention their specific need/pain point and how Moshi Moshi can help them specifically]
+def stitch_email_body(paragraph):
+    """Full email body (without greeting or regards) around one personalized paragraph."""
+    return f"{EMAIL_INTRO}\n\n{paragraph.strip()}\n\n{EMAIL_CLOSING}"
+
+OUTREACH_PROMPT = """
+You are Anusha, a sales person from Moshi Moshi, a branding and consultancy agency in Bangalore. Write a personalized outreach email based on the following LinkedIn post content.
+
+Use this EXACT email format:
 
-Attaching a few relevant projects from your space (and a few others), along with a quick proposal. Let us know a good time this week — we'd love to walk you through our approach.
+""" + stitch_email_body(PERSONALIZED_PARAGRAPH_PLACEHOLDER) + """
 
 Respond ONLY in valid JSON with keys: subject, body.
 - Subject: Max 10 words, catchy and relevant to their specific need.
@@ -115,41 +282,59 @@ Respond ONLY in valid JSON with keys: subject, body.
 LinkedIn Post Content:
 {content}
 """
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    model = st.session_state.get("groq_model", GROQ_MODEL_DEFAULT)
+
+TEMPLATED_OUTREACH_PROMPT = """
+You are Anusha, a sales person from Moshi Moshi, a branding and consultancy agency in Bangalore. Moshi Moshi works across design, digital, content and code, from brand creation to customer acquisition.
+
+Read the LinkedIn post below and respond ONLY with a raw JSON object with keys: subject, paragraph.
+- subject: max 10 words, catchy and relevant to their specific need.
+- paragraph: 2-4 sentences that mention their specific need or pain point and how Moshi Moshi can help them specifically. No greeting, no sign-off.
+
+LinkedIn Post Content:
+{content}
+"""
+
+def outreach_fields(templated=False):
+    """The JSON fields an outreach reply must contain; streaming stops once they are all in."""
+    return ('subject', 'paragraph') if templated else ('subject', 'body')
+
+def outreach_prompt(content, templated=False):
+    return (TEMPLATED_OUTREACH_PROMPT if templated else OUTREACH_PROMPT).format(content=content)
+
+def outreach_subject_body(parsed):
+    """(subject, body) from a parsed outreach reply; a template-mode 'paragraph' is stitched into the body."""
+    paragraph = parsed.get('paragraph')
+    if isinstance(paragraph, str) and paragraph.strip() and not parsed.get('body'):
+        return parsed.get('subject', ''), stitch_email_body(paragraph)
+    return parsed.get('subject', ''), parsed.get('body', '')
+
+def call_groq_api(email, content, settings, on_fields=None):
+    # Structured, concise prompt for Moshi Moshi outreach, enforce brevity and JSON
+    templated = settings.templated
+    prompt = outreach_prompt(content, templated)
     data = {
-        "model": model,
+        "model": settings.model,
         "messages": [
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": prompt}
         ],
-        "max_tokens": 512,
+        "max_tokens": 200 if templated else 512,
         "temperature": 0.7
     }
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=data, timeout=30)
-        log_debug(f"[GROQ DEBUG] Status code: {response.status_code}")
-        log_debug(f"[GROQ DEBUG] Response text: {response.text}")
-        response.raise_for_status()
+        text = chat_completion_text(settings.backend, GROQ_API_KEY, data, validate=parse_llm_json,
+                                    stream_fields=outreach_fields(templated) if settings.stream else None,
+                                    on_fields=on_fields, cache_bypass=settings.cache_bypass)
         try:
-            result = response.json()
-            import json as pyjson
-            text = result['choices'][0]['message']['content']
-            # Post-process: strip leading 'json', code block markers, and whitespace
-            import re
-            text = re.sub(r"^(```json|```|json)\\s*", "", text.strip(), flags=re.IGNORECASE)
-            text = text.strip('`\n ')
-            parsed = pyjson.loads(text)
-            return parsed.get('subject', ''), parsed.get('body', '')
+            parsed = parse_llm_json(text)
+            return outreach_subject_body(parsed)
         except Exception as json_e:
             log_debug(f"[GROQ JSON ERROR] {json_e}")
-            log_debug(f"[GROQ JSON ERROR] Raw response: {response.text}")
+            log_debug(f"[GROQ JSON ERROR] Raw response: {text}")
             log_debug(f"[GROQ JSON ERROR] Request payload: {data}")
-            st.write("Groq raw response:", response.text)
             return "[Groq error]", "[Groq error]"
+    except LLMRateLimitError:
+        raise
     except Exception as e:
         log_debug(f"[GROQ ERROR] {e}")
         try:
@@ -158,73 +343,40 @@ LinkedIn Post Content:
         except Exception:
             pass
         log_debug(f"[GROQ ERROR] Request payload: {data}")
-        st.write("Groq raw response:", getattr(e, 'response', None) and e.response.text or str(e))
         return "[Groq error]", "[Groq error]"
 
-def call_openai_api(email, content, api_key):
+def call_openai_api(email, content, settings, on_fields=None):
     """Call OpenAI API for email generation"""
-    if not api_key:
+    if not settings.api_key:
         return "[OpenAI error]", "[OpenAI error - No API key]"
     
-    prompt = f"""
-You are Anusha, a sales person from Moshi Moshi, a branding and consultancy agency in Bangalore. Write a personalized outreach email based on the following LinkedIn post content.
-
-Use this EXACT email format:
-
-Well, that's how we say hello. Hope you are doing great!
-
-Just a quick intro about Moshi Moshi — we're a Bangalore-headquartered communication company with offices in Mumbai and Gurgaon, working at the intersection of design, digital, content, and code — turning brand goals into sharp strategies, clean visuals, and campaigns that don't just look good, but actually connect with the right audience.
-
-Over the last 10 years, we haven't just worked on major launches, legacy rebrands, or brand campaigns that grabbed attention — we've steadily become long-term partners to many businesses, including your space, supporting them from brand creation all the way to customer acquisition. That's where both our clients and we see real value.
-
-[ADD A PERSONALIZED PARAGRAPH HERE based on the LinkedIn content - mention their specific need/pain point and how Moshi Moshi can help them specifically]
-
-Attaching a few relevant projects from your space (and a few others), along with a quick proposal. Let us know a good time this week — we'd love to walk you through our approach.
-
-Respond ONLY in valid JSON with keys: subject, body.
-- Subject: Max 10 words, catchy and relevant to their specific need.
-- Body: Use the exact format above, only customize the personalized paragraph based on their LinkedIn content.
-- Do NOT include any explanations, the word 'json', code blocks, or any extra text. Respond with ONLY the raw JSON object.
-
-LinkedIn Post Content:
-{content}
-"""
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    templated = settings.templated
+    prompt = outreach_prompt(content, templated)
     
     data = {
-        "model": "gpt-3.5-turbo",
+        "model": settings.model,
         "messages": [
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": prompt}
         ],
-        "max_tokens": 512,
+        "max_tokens": 200 if templated else 512,
         "temperature": 0.7
     }
     
     try:
-        response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=data, timeout=30)
-        log_debug(f"[OPENAI DEBUG] Status code: {response.status_code}")
-        log_debug(f"[OPENAI DEBUG] Response text: {response.text}")
-        response.raise_for_status()
+        text = chat_completion_text(settings.backend, settings.api_key, data, validate=parse_llm_json,
+                                    stream_fields=outreach_fields(templated) if settings.stream else None,
+                                    on_fields=on_fields, cache_bypass=settings.cache_bypass)
         
         try:
-            result = response.json()
-            import json as pyjson
-            text = result['choices'][0]['message']['content']
-            # Post-process: strip leading 'json', code block markers, and whitespace
-            import re
-            text = re.sub(r"^(```json|```|json)\\s*", "", text.strip(), flags=re.IGNORECASE)
-            text = text.strip('`\n ')
-            parsed = pyjson.loads(text)
-            return parsed.get('subject', ''), parsed.get('body', '')
+            parsed = parse_llm_json(text)
+            return outreach_subject_body(parsed)
         except Exception as json_e:
             log_debug(f"[OPENAI JSON ERROR] {json_e}")
-            log_debug(f"[OPENAI JSON ERROR] Raw response: {response.text}")
+            log_debug(f"[OPENAI JSON ERROR] Raw response: {text}")
             return "[OpenAI error]", "[OpenAI error]"
+    except LLMRateLimitError:
+        raise
     except Exception as e:
         log_debug(f"[OPENAI ERROR] {e}")
         try:
@@ -234,6 +386,317 @@ LinkedIn Post Content:
             pass
         return "[OpenAI error]", "[OpenAI error]"
 
+# --- Combined single-call generation (name + subject + body) ---
+COMBINED_PROMPT = """
+You are Anusha, a sales person from Moshi Moshi, a branding and consultancy agency in Bangalore. Read the following LinkedIn post and write a personalized outreach email to its author.
+
+Use this EXACT email format for the body:
+
+""" + stitch_email_body(PERSONALIZED_PARAGRAPH_PLACEHOLDER) + """
+
+Respond ONLY with a JSON object with exactly these keys:
+- "name": the first name of the post author (or the person the post is about). Use "there" if no clear name is found.
+- "subject": max 10 words, catchy and relevant to their specific need.
+- "body": the exact format above, only customizing the personalized paragraph. Do not add a greeting line or a signature.
+
+LinkedIn Post Content:
+{content}
+"""
+
+COMBINED_TEMPLATED_PROMPT = """
+You are Anusha, a sales person from Moshi Moshi, a branding and consultancy agency in Bangalore. Moshi Moshi works across design, digital, content and code, from brand creation to customer acquisition.
+
+Read the following LinkedIn post and respond ONLY with a JSON object with exactly these keys:
+- "name": the first name of the post author (or the person the post is about). Use "there" if no clear name is found.
+- "subject": max 10 words, catchy and relevant to their specific need.
+- "paragraph": 2-4 sentences that mention their specific need or pain point and how Moshi Moshi can help them specifically. No greeting, no sign-off.
+
+LinkedIn Post Content:
+{content}
+"""
+
+class CombinedSchemaError(ValueError):
+    """The model answered, but not with a usable {name, subject, body} object."""
+
+def validate_combined_response(parsed):
+    """Check the combined schema (body, or paragraph in template mode) and normalise it.
+    Raises CombinedSchemaError if unusable."""
+    if not isinstance(parsed, dict):
+        raise CombinedSchemaError(f"expected a JSON object, got {type(parsed).__name__}")
+    subject, body = parsed.get('subject'), parsed.get('body')
+    if not isinstance(subject, str) or not subject.strip():
+        raise CombinedSchemaError("missing or empty 'subject'")
+    if body is None and isinstance(parsed.get('paragraph'), str) and parsed['paragraph'].strip():
+        # Template mode: only the personalized paragraph came back
+        body = stitch_email_body(parsed['paragraph'])
+    if not isinstance(body, str) or not body.strip():
+        raise CombinedSchemaError("missing or empty 'body'")
+    name = parsed.get('name')
+    if not isinstance(name, str) or not name.strip() or len(name.split()) > 4:
+        name = 'there'
+    return {'name': name.strip(), 'subject': subject.strip(), 'body': body.strip()}
+
+def build_combined_payload(content, model, templated=False):
+    """Chat-completions payload for the single-call request; shared with offline batch files."""
+    prompt = COMBINED_TEMPLATED_PROMPT if templated else COMBINED_PROMPT
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that replies with JSON only."},
+            {"role": "user", "content": prompt.format(content=content)}
+        ],
+        "max_tokens": 250 if templated else 600,
+        "temperature": 0.7,
+        "response_format": {"type": "json_object"}
+    }
+
+def call_llm_combined(content, settings, on_fields=None):
+    """
+    Generate name, subject and body for one post in a single request
+
+    Returns:
+        dict: {'name', 'subject', 'body'}; raises CombinedSchemaError on a malformed answer
+        and requests exceptions on transport/HTTP errors
+    """
+    data = build_combined_payload(content, settings.model, settings.templated)
+    try:
+        text = chat_completion_text(settings.backend, settings.api_key, data,
+                                    validate=lambda t: validate_combined_response(parse_llm_json(t)),
+                                    stream_fields=('name',) + outreach_fields(settings.templated) if settings.stream else None,
+                                    on_fields=on_fields, cache_bypass=settings.cache_bypass)
+        return validate_combined_response(parse_llm_json(text))
+    except (KeyError, IndexError, ValueError) as e:
+        if isinstance(e, CombinedSchemaError):
+            raise
+        raise CombinedSchemaError(f"unparseable response: {e}")
+
+def generate_email_with_retries(email, content, llm_func, max_retries=3):
+    """Generate subject/body, retrying provider rate limits. Returns (subject, body, llm_error)."""
+    try:
+        subject, body = call_with_rate_limit_retries(llm_func, email, content, max_retries=max_retries)
+    except LLMRateLimitError as e:
+        return "[LLM error]", "[LLM error]", f"429 Too Many Requests after {max_retries} retries: {e}"
+    if subject in ("[Groq error]", "[OpenAI error]") or body in ("[Groq error]", "[OpenAI error]"):
+        return subject, body, "LLM error (see debug log)"
+    return subject, body, ""
+
+# --- LLM enrichment engine wiring ---
+@dataclass
+class LLMSettings:
+    """Sidebar LLM settings and shared resources, gathered on the script thread by
+    llm_settings(). Enrichment workers get everything from here and never touch
+    st.session_state or the st.cache_resource getters themselves."""
+    provider: str
+    api_key: str
+    model: str
+    groq_model: str
+    templated: bool
+    stream: bool
+    combined: bool
+    cache_bypass: bool
+    max_context_tokens: int
+    workers: int
+    requests_per_minute: float
+    backend: LLMBackend       # the selected provider
+    name_backend: LLMBackend  # name extraction always goes to Groq
+
+def llm_settings():
+    """Snapshot the sidebar LLM settings. Call on the script thread."""
+    provider = st.session_state.get("api_provider", "Groq")
+    groq_model = st.session_state.get("groq_model", GROQ_MODEL_DEFAULT)
+    model = groq_model if provider == "Groq" else "gpt-3.5-turbo"
+    return LLMSettings(
+        provider=provider,
+        api_key=GROQ_API_KEY if provider == "Groq" else st.session_state.get("openai_api_key", ""),
+        model=model,
+        groq_model=groq_model,
+        templated=st.session_state.get("llm_templated", True),
+        stream=st.session_state.get("llm_stream", False),
+        combined=st.session_state.get("llm_combined", True),
+        cache_bypass=st.session_state.get("llm_cache_bypass", False),
+        max_context_tokens=st.session_state.get("llm_context_tokens", DEFAULT_MAX_TOKENS),
+        workers=st.session_state.get("llm_workers", 4),
+        requests_per_minute=st.session_state.get("llm_rpm", 0),
+        backend=get_llm_backend(provider, model),
+        name_backend=get_llm_backend("Groq", groq_model),
+    )
+
+def get_llm_func(settings):
+    """Pick the (email, content) -> (subject, body) function for the selected provider."""
+    if settings.provider == "Groq":
+        return lambda email, content, on_fields=None: call_groq_api(email, content, settings, on_fields)
+    return lambda email, content, on_fields=None: call_openai_api(email, content, settings, on_fields)
+
+def get_combined_llm_func(settings):
+    """The content -> {name, subject, body} function, or None when single-call mode is off.
+    Both this and get_llm_func take an optional on_fields callback for streamed partial fields."""
+    if not settings.combined:
+        return None
+    return lambda content, on_fields=None: call_llm_combined(content, settings, on_fields)
+
+def make_enrichment_engine(settings):
+    """Build an engine from the sidebar throughput settings. log_debug on its worker
+    threads is routed through the engine; pass on_log=log_debug to engine.run."""
+    engine = EnrichmentEngine(
+        max_workers=settings.workers,
+        requests_per_minute=settings.requests_per_minute,
+        thread_initializer=lambda: setattr(_enrichment_worker, 'engine', engine)
+    )
+    return engine
+
+def _personalized_fields(email, extracted_name, subject, body, llm_error, mode):
+    greeting = f"Moshi moshi {extracted_name}!"
+    return {
+        'email': email,
+        'extracted_name': extracted_name,
+        'greetings': greeting,
+        'subject': subject,
+        'body': body,
+        'full_body': greeting + "\n\n" + body + REGARDS_SECTION,
+        'llm_error': llm_error,
+        'generation_mode': mode
+    }
+
+def personalize_row(row, settings, engine):
+    """
+    Generate name, greeting, subject and body for one row. Runs on an engine worker.
+    Tries the single combined request first (when enabled) and falls back to the
+    two-call path (name extraction + subject/body) if the model doesn't follow the
+    combined schema. Rate limits are retried rather than treated as a bad schema.
+    The post is cleaned and capped at ``max_context_tokens`` first; the result
+    records the context size before and after. The name comes from local sources
+    (author, profile slug, email, sign-off) when they are confident enough.
+    """
+    email = row.get('email', '') if 'email' in row else ''
+    context = clean_post_content(row.get('content', ''), row.get('raw_content', ''), settings.max_context_tokens)
+    local_name = resolve_name(row.get('author', ''), row.get('profile_url', ''), email, context.text)
+    fields = _generate_row_fields(email, context.text, settings, engine, local_name)
+    fields['context_tokens_before'] = context.tokens_before
+    fields['context_tokens_after'] = context.tokens_after
+    return fields
+
+def _generate_row_fields(email, context_content, settings, engine, local_name):
+    llm_func = get_llm_func(settings)
+    combined_func = get_combined_llm_func(settings)
+
+    def throttled(fn, report_fields=False):
+        def call(*args):
+            engine.throttle()
+            if report_fields:
+                # Streamed fields (e.g. the subject) show up in the results table before the row finishes
+                return fn(*args, on_fields=engine.report_partial)
+            return fn(*args)
+        return call
+
+    fallback_reason = ""
+    if combined_func is not None:
+        try:
+            generated = call_with_rate_limit_retries(throttled(combined_func, True), context_content)
+            # The combined reply names the author too; a confident local match wins over it
+            name, source = (local_name.name, local_name.source) if local_name.confident else (generated['name'], 'llm')
+            fields = _personalized_fields(email, name, generated['subject'], generated['body'], "", 'combined')
+            fields['name_source'] = source
+            return fields
+        except LLMRateLimitError as e:
+            return _personalized_fields(email, 'there', "[LLM error]", "[LLM error]", f"429 Too Many Requests: {e}", 'error')
+        except Exception as e:
+            fallback_reason = f"combined call failed ({e}); used two-call fallback"
+            log_debug(f"[LLM COMBINED] {fallback_reason}")
+
+    name_source = local_name.source
+    if local_name.confident:
+        extracted_name = local_name.name
+    else:
+        name_source = 'llm'
+        try:
+            extracted_name = call_with_rate_limit_retries(throttled(extract_name_from_content), context_content, settings)
+        except LLMRateLimitError:
+            extracted_name = 'there'
+
+    # llm_func wraps the post in the outreach prompt itself; pass the cleaned post only
+    subject, body, llm_error = generate_email_with_retries(email, context_content, throttled(llm_func, True), max_retries=3)
+    fields = _personalized_fields(email, extracted_name, subject, body, llm_error or fallback_reason,
+                                  'fallback' if combined_func is not None else 'two-call')
+    fields['name_source'] = name_source
+    # Only the two-call path has a separate name request to skip
+    fields['name_llm_calls_saved'] = 1 if name_source != 'llm' else 0
+    return fields
+
+def failed_personalization(row, error):
+    fields = _personalized_fields(row.get('email', '') if 'email' in row else '', 'there', "[LLM error]", "[LLM error]", str(error), 'error')
+    fields['full_body'] = ""
+    return fields
+
+def context_reduction_caption(results_df):
+    """One-line summary of how much the content cleaning stage trimmed the LLM context."""
+    if 'context_tokens_before' not in results_df.columns:
+        return ""
+    before = int(results_df['context_tokens_before'].fillna(0).sum())
+    after = int(results_df['context_tokens_after'].fillna(0).sum())
+    saved = f" ({100 * (before - after) / before:.0f}% less)" if before else ""
+    return f"Post context: ~{before} → ~{after} tokens across {len(results_df)} rows{saved}"
+
+def name_resolution_caption(results_df):
+    """How many names were resolved without the LLM, and how many requests that skipped."""
+    if 'name_source' not in results_df.columns:
+        return ""
+    local = int((results_df['name_source'].fillna('llm') != 'llm').sum())
+    saved = int(results_df['name_llm_calls_saved'].fillna(0).sum()) if 'name_llm_calls_saved' in results_df.columns else 0
+    return f"Names: {local}/{len(results_df)} resolved locally, {saved} LLM name request(s) saved"
+
+def streaming_preview(row, fields):
+    """Placeholder results-table row for a row whose reply is still streaming in."""
+    return {
+        'email': row.get('email', '') if 'email' in row else '',
+        'extracted_name': fields.get('name', ''),
+        'subject': fields.get('subject', ''),
+        'generation_mode': 'streaming…'
+    }
+
+# --- Offline batch mode ---
+def batch_model_and_key():
+    """(model, api_key) for batch jobs, from the sidebar provider settings."""
+    if st.session_state.get("api_provider", "Groq") == "Groq":
+        return st.session_state.get("groq_model", GROQ_MODEL_DEFAULT), GROQ_API_KEY
+    return "gpt-3.5-turbo", st.session_state.get("openai_api_key", "")
+
+def write_batch_job(source_df, name, base_url):
+    """Save the source rows and one combined-prompt request per row into a new batches/ job."""
+    job_dir = llm_batch.new_job_dir(re.sub(r'[^A-Za-z0-9_-]+', '_', name)[:40])
+    rows_path = os.path.join(job_dir, "rows.csv")
+    source_df.to_csv(rows_path, index=False)
+    model, _ = batch_model_and_key()
+    templated = st.session_state.get("llm_templated", True)
+    rows = source_df.fillna("").to_dict('records')
+    max_context_tokens = st.session_state.get("llm_context_tokens", DEFAULT_MAX_TOKENS)
+    bodies = ((llm_batch.row_custom_id(i),
+               build_combined_payload(clean_post_content(row.get('content', ''), row.get('raw_content', ''), max_context_tokens).text,
+                                      model, templated))
+              for i, row in enumerate(rows))
+    return llm_batch.BatchJob.create(job_dir, bodies, base_url=base_url, rows_path=rows_path)
+
+def merge_batch_job(job):
+    """Merge whatever results the job has so far into personalized rows. Returns (DataFrame, summary)."""
+    rows = pd.read_csv(job.rows_path).fillna("").to_dict('records')
+    results = llm_batch.read_results(job.result_paths)
+    max_context_tokens = st.session_state.get("llm_context_tokens", DEFAULT_MAX_TOKENS)
+
+    def on_result(row, content):
+        generated = validate_combined_response(parse_llm_json(content))
+        # Same rule as the interactive path: a confident local name wins over the model's
+        context = clean_post_content(row.get('content', ''), row.get('raw_content', ''), max_context_tokens)
+        local_name = resolve_name(row.get('author', ''), row.get('profile_url', ''), row.get('email', ''), context.text)
+        name, source = (local_name.name, local_name.source) if local_name.confident else (generated['name'], 'llm')
+        fields = _personalized_fields(row.get('email', ''), name, generated['subject'], generated['body'], "", 'batch')
+        fields['name_source'] = source
+        return {**row, **{k: v for k, v in fields.items() if k != 'email'}}
+
+    def on_error(row, error):
+        return {**row, **{k: v for k, v in failed_personalization(row, error).items() if k != 'email'}}
+
+    merged = llm_batch.merge_results(rows, results, on_result, on_error)
+    return pd.DataFrame(merged), llm_batch.summarize(job, results)
+
 # --- SMTP Email Sending Module ---
 def send_email_smtp(sender_email, sender_password, recipient_email, subject, body, sender_name="Anusha from Moshi Moshi"):
     """
@@ -250,77 +713,33 @@ def send_email_smtp(sender_email, sender_password, recipient_email, subject, bod
     Returns:
         tuple: (success: bool, message: str)
     """
-    try:
-        # Check if body already contains regards section
-        if "Best regards," in body or "Moshi Moshi Communications" in body:
-            # Body already has regards, use as is
-            full_body = body
-        else:
-            # Add hardcoded regards section to the body
-            regards_section = f"""
-
-Check out our portfolio: https://drive.google.com/file/d/1zaK36IRSEWesf2ccPudco_G6fdPD2YYN/view?usp=sharing
-        
-Best regards,
-Anusha
-Moshi Moshi Communications Ltd.
-Bangalore
-
-+91 91485 44178
-www.moshimoshi.in
-"""
-            # Combine body with regards
-            full_body = body + regards_section
-        
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = f"{sender_name} <{sender_email}>"
-        msg['To'] = recipient_email
-        msg['Subject'] = subject
-        
-        # Add body to email
-        msg.attach(MIMEText(full_body, 'plain'))
-        
-        # Gmail SMTP configuration
-        smtp_server = "smtp.gmail.com"
-        smtp_port = 587
-        
-        # Create secure connection and send email
-        context = ssl.create_default_context()
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls(context=context)
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-        
+    # One-off send (e.g. the sidebar SMTP test): a single-use session
+    with SMTPSender(sender_email, sender_password, sender_name=sender_name) as sender:
+        success, message = sender.send(recipient_email, subject, body)
+    if success:
         log_debug(f"[EMAIL SUCCESS] Email sent to {recipient_email}")
-        return True, f"Email sent successfully to {recipient_email}"
-        
-    except smtplib.SMTPAuthenticationError:
-        error_msg = "Authentication failed. Please check your email and app password."
-        log_debug(f"[EMAIL ERROR] {error_msg}")
-        return False, error_msg
-    except smtplib.SMTPRecipientsRefused:
-        error_msg = f"Recipient email {recipient_email} was refused by the server."
-        log_debug(f"[EMAIL ERROR] {error_msg}")
-        return False, error_msg
-    except Exception as e:
-        error_msg = f"Failed to send email: {str(e)}"
-        log_debug(f"[EMAIL ERROR] {error_msg}")
-        return False, error_msg
+    else:
+        log_debug(f"[EMAIL ERROR] {message}")
+    return success, message
 
-def send_bulk_emails(sender_email, sender_password, email_data, delay_seconds=2.0, sender_name="Anusha from Moshi Moshi"):
+def send_bulk_emails(sender_email, sender_password, email_data, delay_seconds=2.0, sender_name="Anusha from Moshi Moshi",
+                     connections=1, messages_per_minute=0, burst=1):
     """
-    Send multiple emails with progress tracking
-    
+    Send multiple emails with progress tracking over persistent SMTP sessions
+
     Args:
         sender_email (str): Gmail address to send from
         sender_password (str): App password for Gmail
         email_data (list): List of dicts with 'email', 'subject', 'body' keys
-        delay_seconds (float): Delay between emails to avoid rate limiting
+        delay_seconds (float): Delay between emails to avoid rate limiting (serial mode)
         sender_name (str): Display name for sender
-    
+        connections (int): Parallel SMTP connections; more than 1 enables concurrent dispatch
+        messages_per_minute (float): Token-bucket rate; 0 keeps the fixed delay (serial) or
+            derives the rate from delay_seconds (concurrent)
+        burst (int): Token-bucket burst size
+
     Returns:
-        dict: Results with success/failure counts and details
+        dict: Results with success/failure counts, details and SMTP timing stats
     """
     results = {
         'total': len(email_data),
@@ -328,49 +747,126 @@ def send_bulk_emails(sender_email, sender_password, email_data, delay_seconds=2.
         'failed': 0,
         'details': []
     }
-    
+
     progress_bar = st.progress(0.0, text="Sending emails...")
-    
-    for i, email_info in enumerate(email_data):
-        recipient = email_info.get('email', '')
-        subject = email_info.get('subject', 'Hello from Moshi Moshi')
-        body = email_info.get('body', 'Thank you for connecting!')
-        
-        if not recipient:
-            results['failed'] += 1
-            results['details'].append({
-                'email': 'N/A',
-                'status': 'failed',
-                'message': 'No email address provided'
-            })
-            continue
-        
-        success, message = send_email_smtp(sender_email, sender_password, recipient, subject, body, sender_name)
-        
-        if success:
-            results['sent'] += 1
-            status = 'sent'
-        else:
-            results['failed'] += 1
-            status = 'failed'
-        
-        results['details'].append({
-            'email': recipient,
-            'status': status,
-            'message': message
-        })
-        
-        # Update progress
-        progress = (i + 1) / len(email_data)
-        progress_bar.progress(progress, text=f"Sending emails... {i+1}/{len(email_data)}")
-        
-        # Add delay to avoid rate limiting
-        if i < len(email_data) - 1:  # Don't delay after the last email
-            time.sleep(delay_seconds)
-    
+
+    if connections > 1 or messages_per_minute > 0:
+        rate = messages_per_minute if messages_per_minute > 0 else 60.0 / max(delay_seconds, 0.1)
+        timings = _send_bulk_concurrent(sender_email, sender_password, sender_name, email_data,
+                                        max(1, int(connections)), TokenBucket(rate, burst), results, progress_bar)
+    else:
+        timings = _send_bulk_serial(sender_email, sender_password, sender_name, email_data,
+                                    delay_seconds, results, progress_bar)
+
+    # Per-connection / per-message timings for the whole batch
+    results['stats'] = timings.summary()
+    log_debug(f"[EMAIL STATS] {results['stats']}")
     progress_bar.progress(1.0, text="Email sending complete!")
     return results
 
+def _record_send_result(results, recipient, success, message, seconds):
+    if success:
+        results['sent'] += 1
+        status = 'sent'
+        log_debug(f"[EMAIL SUCCESS] Email sent to {recipient}")
+    else:
+        results['failed'] += 1
+        status = 'failed'
+        log_debug(f"[EMAIL ERROR] {message}")
+    return {
+        'email': recipient,
+        'status': status,
+        'message': message,
+        'seconds': round(seconds, 3)
+    }
+
+def _missing_recipient_result(results):
+    results['failed'] += 1
+    return {
+        'email': 'N/A',
+        'status': 'failed',
+        'message': 'No email address provided'
+    }
+
+def _send_bulk_serial(sender_email, sender_password, sender_name, email_data, delay_seconds, results, progress_bar):
+    """One connection, one message at a time, fixed delay between sends."""
+    sender = SMTPSender(sender_email, sender_password, sender_name=sender_name)
+    try:
+        for i, email_info in enumerate(email_data):
+            recipient = email_info.get('email', '')
+            subject = email_info.get('subject', 'Hello from Moshi Moshi')
+            body = email_info.get('body', 'Thank you for connecting!')
+
+            if not recipient:
+                results['details'].append(_missing_recipient_result(results))
+                continue
+
+            success, message = sender.send(recipient, subject, body)
+            results['details'].append(_record_send_result(results, recipient, success, message, sender.timings.message_seconds[-1]))
+
+            # Update progress
+            progress = (i + 1) / len(email_data)
+            progress_bar.progress(progress, text=f"Sending emails... {i+1}/{len(email_data)}")
+
+            # Add delay to avoid rate limiting
+            if i < len(email_data) - 1:  # Don't delay after the last email
+                time.sleep(delay_seconds)
+    finally:
+        sender.close()
+    return sender.timings
+
+def _send_bulk_concurrent(sender_email, sender_password, sender_name, email_data, connections, bucket, results, progress_bar):
+    """
+    N worker threads share N SMTP sessions and one token bucket. Workers only
+    talk SMTP; counting, logging and the progress bar stay on the script thread.
+    """
+    senders = [SMTPSender(sender_email, sender_password, sender_name=sender_name) for _ in range(connections)]
+    idle_senders = queue.Queue()
+    for sender in senders:
+        idle_senders.put(sender)
+
+    def send_one(recipient, subject, body):
+        bucket.acquire()
+        sender = idle_senders.get()
+        try:
+            success, message = sender.send(recipient, subject, body)
+            return success, message, sender.timings.message_seconds[-1]
+        finally:
+            idle_senders.put(sender)
+
+    total = len(email_data)
+    details = [None] * total
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as executor:
+            future_to_idx = {}
+            for i, email_info in enumerate(email_data):
+                recipient = email_info.get('email', '')
+                if not recipient:
+                    details[i] = _missing_recipient_result(results)
+                    continue
+                future = executor.submit(send_one, recipient,
+                                         email_info.get('subject', 'Hello from Moshi Moshi'),
+                                         email_info.get('body', 'Thank you for connecting!'))
+                future_to_idx[future] = i
+            done = total - len(future_to_idx)
+            for future in concurrent.futures.as_completed(future_to_idx):
+                i = future_to_idx[future]
+                recipient = email_data[i].get('email', '')
+                try:
+                    success, message, seconds = future.result()
+                except Exception as e:
+                    success, message, seconds = False, f"Failed to send email: {str(e)}", 0.0
+                details[i] = _record_send_result(results, recipient, success, message, seconds)
+                done += 1
+                progress_bar.progress(done / total, text=f"Sending emails... {done}/{total} ({connections} connections)")
+    finally:
+        for sender in senders:
+            sender.close()
+
+    # Keep details in input order, same as the serial path
+    results['details'] = details
+    return SMTPTimings.merge([sender.timings for sender in senders])
+
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.2 Safari/605.1.15",
@@ -467,28 +963,71 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/0.0.469.0 Safari/537.36",
 ]
 
-# Try to import Selenium and browser automation libraries
-try:
-    from selenium import webdriver
-    from selenium.webdriver.chrome.service import Service
-    from webdriver_manager.chrome import ChromeDriverManager
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from selenium.webdriver.chrome.options import Options
-    from bs4 import BeautifulSoup
-    
-    # Try to import undetected-chromedriver as optional
+# undetected-chromedriver is optional; driver_cache only imports it for uc launches
+UNDETECTED_CHROME_AVAILABLE = importlib.util.find_spec("undetected_chromedriver") is not None
+if not UNDETECTED_CHROME_AVAILABLE:
+    st.warning("⚠️ undetected-chromedriver not available. Using standard Chrome driver.")
+
+def copy_cookies_to_driver(main_driver, new_driver, launch_timings=None):
+    """Log a fresh browser in by copying the session cookies of an already logged-in one."""
     try:
-        import undetected_chromedriver as uc
-        UNDETECTED_CHROME_AVAILABLE = True
-    except ImportError:
-        UNDETECTED_CHROME_AVAILABLE = False
-        st.warning("⚠️ undetected-chromedriver not available. Using standard Chrome driver.")
-        
-except ImportError as e:
-    st.error(f"Missing required library: {e}. Please run 'pip install -r requirements.txt' and restart the app.")
-    st.stop()
+        load_cookies(new_driver, main_driver.get_cookies(), launch_timings)
+    except Exception:
+        pass
+
+def launch_scraping_browser(seed=None, network_logging=False, label="session"):
+    """Start an extra scraping Chrome, logged in with ``seed``'s cookies when given."""
+    options = scraping_options(random.choice(USER_AGENTS), network_logging)
+
+    # Use undetected Chrome if available, otherwise use regular Chrome; both start on the pinned driver
+    driver, launch_timings = launch_chrome(options, use_uc=UNDETECTED_CHROME_AVAILABLE)
+    get_process_supervisor().register(driver, label)
+    if seed is not None:
+        copy_cookies_to_driver(seed, driver, launch_timings)
+    log_launch(launch_timings)
+    return driver
+
+def log_launch(launch_timings):
+    log_debug(f"[LAUNCH] {launch_timings.kind} (Chrome {launch_timings.chrome_version or '?'}): "
+              f"driver resolve {launch_timings.resolve_seconds:.2f}s{' (cached)' if launch_timings.driver_cached else ''}, "
+              f"spawn {launch_timings.spawn_seconds:.2f}s, first navigation {launch_timings.first_navigation_seconds:.2f}s")
+
+# Default RSS ceiling for one browser's whole process tree before it is replaced
+BROWSER_MEMORY_CEILING_MB = 1500
+
+@st.cache_resource
+def get_process_supervisor():
+    """Tracks the chromedriver/Chrome trees this server launched; reaps ones a crashed earlier run left behind."""
+    supervisor = ProcessSupervisor(memory_ceiling_mb=BROWSER_MEMORY_CEILING_MB)
+    reaped = supervisor.reap_orphans()
+    if reaped:
+        log_debug(f"[PROCESSES] Killed {reaped} orphaned browser process(es) from an earlier run")
+    return supervisor
+
+def recycle_session_driver(driver):
+    """Swap the logged-in browser for a fresh one with the same cookies once it passes the memory ceiling."""
+    supervisor = get_process_supervisor()
+    if not supervisor.over_ceiling(driver):
+        return driver
+    stats = supervisor.stats(driver)
+    log_debug(f"[PROCESSES] Session browser at {stats.rss_mb:.0f} MB over {stats.processes} processes "
+              f"(ceiling {supervisor.memory_ceiling_mb:.0f} MB); recycling it")
+    new_driver = launch_scraping_browser(seed=driver, network_logging=bool(st.session_state.get('network_logging')))
+    supervisor.terminate(driver)
+    release_profile()
+    st.session_state.driver = new_driver
+    return new_driver
+
+@st.cache_resource
+def get_keyword_workers():
+    """Parallel Fast Mode's worker processes, kept alive (browsers warm) across keywords and reruns."""
+    supervisor = get_process_supervisor()
+    return KeywordWorkerPool(on_spawn=supervisor.register, on_exit=supervisor.unregister, dispose=supervisor.terminate)
+
+def close_keyword_workers():
+    """Stop the workers and their browsers, e.g. after logout, so none keep the old session's cookies."""
+    get_keyword_workers().close()
+
 
 # Add this after imports, before any scraping logic
 
@@ -509,32 +1048,46 @@ def is_driver_alive(driver):
     except Exception:
         return False
 
+# Reusable login-browser profiles; more concurrent logins than this get a throwaway profile
+PROFILE_POOL_SIZE = 4
+
+def chrome_profiles_base_dir():
+    """Directory the MoScraper_* scraping profiles live in, next to the user's own Chrome data."""
+    if platform.system() == "Darwin":  # macOS
+        return os.path.expanduser("~/Library/Application Support/Google/Chrome")
+    elif platform.system() == "Windows":
+        return os.path.expanduser("~/AppData/Local/Google/Chrome/User Data")
+    else:  # Linux
+        return os.path.expanduser("~/.config/google-chrome")
+
+@st.cache_resource
+def prune_chrome_profiles_once(base_dir):
+    """Garbage-collect stale scraping profiles on the first login of this server process."""
+    report = gc_profiles(base_dir)
+    log_debug(f"[PROFILES] Removed {len(report.removed)} stale profile(s), cleared {len(report.caches_cleared)} cache(s), "
+              f"freed {report.freed_mb:.0f} MB")
+    return report
+
+def release_profile():
+    """Unlock this session's pooled Chrome profile once its browser has exited."""
+    ProfilePool.release(st.session_state.get('profile_lease'))
+    st.session_state.profile_lease = None
+
 def get_optimal_chrome_options(headless_mode=False, local_mode=True):
     """Get optimized Chrome options based on environment"""
-    import uuid
-    import time
     options = Options()
     
     if local_mode:
         # Local machine optimizations
         st.info("🏠 Running in local mode - optimized for your machine")
         
-        # Create a unique user data directory to avoid conflicts
-        import platform
-        if platform.system() == "Darwin":  # macOS
-            base_user_data_dir = os.path.expanduser("~/Library/Application Support/Google/Chrome")
-        elif platform.system() == "Windows":
-            base_user_data_dir = os.path.expanduser("~/AppData/Local/Google/Chrome/User Data")
-        else:  # Linux
-            base_user_data_dir = os.path.expanduser("~/.config/google-chrome")
+        # Borrow one of a few reusable profiles (warm cache) that no other live browser holds
+        base_user_data_dir = chrome_profiles_base_dir()
+        prune_chrome_profiles_once(base_user_data_dir)
+        profile_lease = ProfilePool(base_user_data_dir, size=PROFILE_POOL_SIZE).acquire()
+        st.session_state.profile_lease = profile_lease
         
-        # Create a unique profile for this session to avoid conflicts
-        unique_id = str(uuid.uuid4())[:8]
-        timestamp = str(int(time.time()))
-        scraping_profile = os.path.join(base_user_data_dir, f"MoScraper_{timestamp}_{unique_id}")
-        os.makedirs(scraping_profile, exist_ok=True)
-        
-        options.add_argument(f"--user-data-dir={scraping_profile}")
+        options.add_argument(f"--user-data-dir={profile_lease.path}")
         options.add_argument("--profile-directory=Default")
         
         # Add arguments to prevent Chrome from conflicting with existing instances
@@ -604,12 +1157,40 @@ def get_optimal_chrome_options(headless_mode=False, local_mode=True):
     
     if headless_mode:
         options.add_argument("--headless=new")
+    if st.session_state.get('network_logging'):
+        enable_performance_logging(options)
     
     return options
 
-EMAIL_REGEX = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
-# Regex for website URLs
-URL_REGEX = re.compile(r'(https?://[\w\.-]+(?:/[\w\.-]*)*|www\.[\w\.-]+(?:/[\w\.-]*)*)', re.IGNORECASE)
+def apply_resource_profile(driver, profile_name):
+    """Block the profile's resources on a scraping browser; scraping goes on unblocked if CDP is unavailable."""
+    try:
+        apply_profile(driver, profile_name)
+    except Exception as e:
+        log_debug(f"[WARN] Could not apply resource profile '{profile_name}': {e}")
+
+def record_page_metrics(driver, profile_name, keyword, metrics_log):
+    """Append what the current search page has transferred so far to ``metrics_log`` and log it."""
+    try:
+        metrics = measure_page(driver, profile_name)
+    except Exception as e:
+        log_debug(f"[WARN] Could not read page metrics for {keyword}: {e}")
+        return
+    metrics_log.append(metrics)
+    log_debug(f"[PAGE METRICS] {keyword} ({profile_name}): {metrics.megabytes:.2f} MB in {metrics.resources} requests, "
+              f"DOM ready {metrics.dom_ready_ms:.0f} ms, load {metrics.load_ms:.0f} ms")
+
+def resource_usage_caption(metrics_log):
+    """Totals across keywords for the resource profile in use."""
+    if not metrics_log:
+        return ""
+    total_mb = sum(m.megabytes for m in metrics_log)
+    ready = sum(m.dom_ready_ms for m in metrics_log) / len(metrics_log)
+    return (f"Resource profile '{metrics_log[0].profile}': {total_mb:.1f} MB transferred over {len(metrics_log)} "
+            f"search page(s), page ready in {ready / 1000:.1f}s on average")
+
+# Fixed sleep the old per-post "see more" clicks took, for reporting what the bulk expander saves
+LEAD_SEE_MORE_SLEEP = 1.5
 
 st.set_page_config(page_title="MoScraper by Moshi Moshi", page_icon="🔍", layout="wide")
 # Display logo and title using st.image for local compatibility
@@ -640,32 +1221,32 @@ with st.form("login_form"):
     email = st.text_input("LinkedIn Email")
     password = st.text_input("LinkedIn Password", type="password")
     headless_mode = st.checkbox("Run browser in headless mode (faster, but less stable)", value=False)
+    network_logging = st.checkbox("Record LinkedIn's network responses (needed for 📡 network capture)", value=False)
     login_btn = st.form_submit_button("🔑 Login")
 
 def close_driver():
     try:
         if st.session_state.driver:
-            st.session_state.driver.quit()
+            get_process_supervisor().terminate(st.session_state.driver)
     except Exception:
         pass
     st.session_state.driver = None
     st.session_state.logged_in = False
+    release_profile()
+    close_keyword_workers()
 
-def cleanup_chrome_processes():
-    """Kill any hanging Chrome processes that might interfere"""
-    import subprocess
-    import platform
-    
+def cleanup_chrome_processes(all_browsers=False):
+    """Kill hanging MoScraper browsers; the user's own Chrome windows are never touched.
+
+    Orphans of an earlier server run and browsers that stopped responding are always
+    killed; with ``all_browsers`` every browser this server launched goes too.
+    """
+    supervisor = get_process_supervisor()
     try:
-        if platform.system() == "Darwin":  # macOS
-            subprocess.run(["pkill", "-f", "chrome"], capture_output=True)
-            subprocess.run(["pkill", "-f", "chromedriver"], capture_output=True)
-        elif platform.system() == "Windows":
-            subprocess.run(["taskkill", "/f", "/im", "chrome.exe"], capture_output=True)
-            subprocess.run(["taskkill", "/f", "/im", "chromedriver.exe"], capture_output=True)
-        else:  # Linux
-            subprocess.run(["pkill", "-f", "chrome"], capture_output=True)
-            subprocess.run(["pkill", "-f", "chromedriver"], capture_output=True)
+        supervisor.reap_orphans()
+        for tracked_driver in supervisor.drivers():
+            if all_browsers or not is_driver_alive(tracked_driver):
+                supervisor.terminate(tracked_driver)
     except Exception:
         pass  # Ignore errors if processes don't exist
 
@@ -700,9 +1281,9 @@ def linkedin_login(email, password, headless_mode, retry=True):
         # Get optimized Chrome options based on environment
         chrome_options = get_optimal_chrome_options(headless_mode, local_mode)
         
-        # Use webdriver-manager to get the correct binary for ARM64
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
+        # Chromedriver is resolved once per Chrome version and pinned; see driver_cache
+        driver, launch_timings = launch_chrome(chrome_options)
+        get_process_supervisor().register(driver, "login")
         
         # Execute basic anti-detection scripts
         driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
@@ -719,7 +1300,8 @@ def linkedin_login(email, password, headless_mode, retry=True):
         # Try to load cookies if they exist
         cookies_loaded = False
         if os.path.exists("linkedin_cookies.pkl"):
-            driver.get("https://www.linkedin.com")
+            launch_timings.navigate(driver, "https://www.linkedin.com")
+            log_launch(launch_timings)
             with open("linkedin_cookies.pkl", 'rb') as f:
                 cookies = pickle.load(f)
                 for cookie in cookies:
@@ -743,7 +1325,10 @@ def linkedin_login(email, password, headless_mode, retry=True):
         
         # If not logged in, do manual login
         st.info("🔐 Navigating to LinkedIn login page...")
-        driver.get("https://www.linkedin.com/login")
+        first_navigation = not launch_timings.first_navigation_seconds
+        launch_timings.navigate(driver, "https://www.linkedin.com/login")
+        if first_navigation:
+            log_launch(launch_timings)
         
         # Wait for login form and add some delay to appear more human-like
         WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.ID, "username")))
@@ -811,6 +1396,7 @@ def linkedin_login(email, password, headless_mode, retry=True):
         return False
 
 if login_btn and email and password:
+    st.session_state.network_logging = network_logging
     linkedin_login(email, password, headless_mode)
 
 if st.session_state.logged_in:
@@ -851,10 +1437,6 @@ with st.sidebar:
             import time as pytime
             start = pytime.time()
             try:
-                headers = {
-                    "Authorization": f"Bearer {groq_api_key}",
-                    "Content-Type": "application/json"
-                }
                 data = {
                     "model": groq_model,
                     "messages": [
@@ -864,8 +1446,7 @@ with st.sidebar:
                     "max_tokens": 10,
                     "temperature": 0.1
                 }
-                import requests
-                resp = requests.post(GROQ_API_URL, headers=headers, json=data, timeout=10)
+                resp = get_llm_client("groq").chat(groq_api_key, data, timeout=(LLM_CONNECT_TIMEOUT, 10))
                 resp.raise_for_status()
                 elapsed = pytime.time() - start
                 st.success(f"Groq API key is valid! Response time: {elapsed:.2f} seconds.")
@@ -880,10 +1461,6 @@ with st.sidebar:
             import time as pytime
             start = pytime.time()
             try:
-                headers = {
-                    "Authorization": f"Bearer {openai_api_key}",
-                    "Content-Type": "application/json"
-                }
                 data = {
                     "model": "gpt-3.5-turbo",
                     "messages": [
@@ -893,14 +1470,59 @@ with st.sidebar:
                     "max_tokens": 10,
                     "temperature": 0.1
                 }
-                import requests
-                resp = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=data, timeout=10)
+                resp = get_llm_client("openai").chat(openai_api_key, data, timeout=(LLM_CONNECT_TIMEOUT, 10))
                 resp.raise_for_status()
                 elapsed = pytime.time() - start
                 st.success(f"OpenAI API key is valid! Response time: {elapsed:.2f} seconds.")
             except Exception as e:
                 st.error(f"OpenAI API check failed: {e}")
     
+    # Shared by every "Generate Email" path (scraped results, uploaded CSV, CSV name extraction)
+    llm_workers = st.number_input("Parallel LLM workers", min_value=1, max_value=16,
+                                  value=st.session_state.get("llm_workers", 4),
+                                  help="Rows enriched at the same time")
+    llm_rpm = st.number_input("Extra cap on LLM requests per minute (0 = model quota only)", min_value=0, max_value=10000,
+                              value=st.session_state.get("llm_rpm", 0),
+                              help="Requests are already packed into the model's RPM/TPM quota; set this to stay further below it")
+    llm_context_tokens = st.number_input("Max post tokens sent to the LLM", min_value=0, max_value=8000,
+                                         value=st.session_state.get("llm_context_tokens", DEFAULT_MAX_TOKENS), step=50,
+                                         help="Post text is stripped of HTML and LinkedIn UI chrome, then cut to this budget (0 = no cap)")
+    llm_templated = st.checkbox("Template mode (LLM writes only subject + personalized paragraph)",
+                                value=st.session_state.get("llm_templated", True),
+                                help="The fixed intro, closing and regards are stitched in locally, so prompts and replies are several times shorter.")
+    llm_stream = st.checkbox("Stream LLM responses",
+                             value=st.session_state.get("llm_stream", False),
+                             help="Show each subject as soon as it is written and stop generation once all fields are in")
+    llm_combined = st.checkbox("Single-call generation (name + subject + body)",
+                               value=st.session_state.get("llm_combined", True),
+                               help="One JSON request per row instead of two. Turn off for models that struggle with the combined format.")
+    st.session_state["llm_combined"] = llm_combined
+    st.session_state["llm_templated"] = llm_templated
+    st.session_state["llm_stream"] = llm_stream
+    st.session_state["llm_context_tokens"] = llm_context_tokens
+    # On-disk response cache in front of every LLM call
+    llm_cache_bypass = st.checkbox("Bypass LLM cache (force regeneration)",
+                                   value=st.session_state.get("llm_cache_bypass", False),
+                                   help="Fresh answers still overwrite the cached ones")
+    st.session_state["llm_cache_bypass"] = llm_cache_bypass
+    cache_stats = get_llm_cache().stats()
+    st.caption(f"LLM cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+               f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries, {cache_stats['bytes'] / 1024:.0f} KB")
+    if st.button("🗑️ Clear LLM Cache"):
+        get_llm_cache().clear()
+        st.success("LLM cache cleared!")
+    budget_model = st.session_state.get("groq_model", GROQ_MODEL_DEFAULT) if api_provider == "Groq" else "gpt-3.5-turbo"
+    budget = get_token_scheduler(api_provider.lower(), budget_model).stats()
+    st.caption(f"{budget_model} budget: {budget['requests_last_minute']}/{budget['requests_per_minute'] or '∞'} requests, "
+               f"{budget['tokens_last_minute']}/{budget['tokens_per_minute'] or '∞'} tokens in the last minute")
+    limiter_stats = get_adaptive_limiter(api_provider.lower()).stats()
+    st.caption(f"{api_provider} limiter: concurrency {limiter_stats['concurrency_limit']}, "
+               f"{limiter_stats['rate_limited']} rate-limited / {limiter_stats['successes']} ok, "
+               f"remaining requests {limiter_stats['remaining_requests'] if limiter_stats['remaining_requests'] is not None else 'n/a'}"
+               + (f", paused {limiter_stats['paused_for']}s" if limiter_stats['paused_for'] else ""))
+    st.session_state["llm_workers"] = llm_workers
+    st.session_state["llm_rpm"] = llm_rpm
+    
     st.markdown("---")
     st.markdown("### 📧 SMTP Email Configuration")
     st.markdown("Configure Gmail SMTP to send personalized emails directly from the app.")
@@ -937,6 +1559,21 @@ with st.sidebar:
             else:
                 st.error(f"❌ SMTP connection failed: {test_message}")
     
+    # Bulk dispatch: parallel connections governed by a token bucket
+    with st.expander("⚡ Bulk Sending Speed"):
+        smtp_connections = st.number_input("Parallel SMTP connections", min_value=1, max_value=5,
+                                           value=st.session_state.get("smtp_connections", 1),
+                                           help="More than 1 sends over several connections at once")
+        smtp_rate = st.number_input("Max emails per minute (0 = fixed delay)", min_value=0, max_value=600,
+                                    value=st.session_state.get("smtp_rate", 0),
+                                    help="Token-bucket limit that replaces the fixed delay between emails")
+        smtp_burst = st.number_input("Burst size", min_value=1, max_value=50,
+                                     value=st.session_state.get("smtp_burst", 1),
+                                     help="How many emails may go out back-to-back before the rate limit applies")
+        st.session_state["smtp_connections"] = smtp_connections
+        st.session_state["smtp_rate"] = smtp_rate
+        st.session_state["smtp_burst"] = smtp_burst
+
     # Instructions for Gmail App Password
     with st.expander("📖 How to get Gmail App Password"):
         st.markdown("""
@@ -958,9 +1595,12 @@ with st.sidebar:
         if st.button("🧹 Clear ChromeDriver Cache"):
             cache_path = os.path.expanduser("~/Library/Application Support/undetected_chromedriver")
             try:
+                pinned_cleared = clear_driver_cache()
                 if os.path.exists(cache_path):
                     shutil.rmtree(cache_path)
                     st.success("ChromeDriver cache cleared! Restart the app to re-download the driver.")
+                elif pinned_cleared:
+                    st.success("Pinned ChromeDriver cleared! The next launch will resolve it again.")
                 else:
                     st.info("No ChromeDriver cache found to clear.")
             except Exception as e:
@@ -969,14 +1609,45 @@ with st.sidebar:
     with col2:
         if st.button("🔄 Cleanup Chrome Processes"):
             try:
-                cleanup_chrome_processes()
-                st.success("Chrome processes cleaned up!")
+                cleanup_chrome_processes(all_browsers=True)
+                close_driver()
+                st.success("MoScraper's Chrome processes cleaned up! Your own Chrome windows were left alone.")
             except Exception as e:
                 st.error(f"Failed to cleanup processes: {e}")
 
+    if st.button("🗑️ Prune Chrome Profiles"):
+        try:
+            report = gc_profiles(chrome_profiles_base_dir())
+            st.success(f"Removed {len(report.removed)} stale profile(s) and cleared {len(report.caches_cleared)} cache(s), "
+                       f"freeing {report.freed_mb:.0f} MB. Profiles in use were left alone.")
+        except Exception as e:
+            st.error(f"Failed to prune profiles: {e}")
+
+    supervisor = get_process_supervisor()
+    supervisor.memory_ceiling_mb = st.number_input(
+        "Browser memory ceiling (MB)", min_value=0, max_value=16000, step=100,
+        value=BROWSER_MEMORY_CEILING_MB, key="browser_memory_ceiling_mb",
+        help="A scraping browser whose processes use more RAM than this is replaced between keywords. 0 disables.")
+    process_stats = supervisor.sample()
+    if process_stats:
+        with st.expander(f"🧠 Browser processes ({len(process_stats)})"):
+            st.dataframe(pd.DataFrame([{
+                "browser": s.label, "processes": s.processes, "rss_mb": round(s.rss_mb),
+                "cpu_percent": round(s.cpu_percent, 1), "alive": s.alive, "age_min": round(s.age_seconds / 60, 1),
+            } for s in process_stats]), use_container_width=True)
+
+    launches = launch_history()
+    if launches:
+        with st.expander(f"🚀 Browser launch timings (last {len(launches)})"):
+            st.dataframe(pd.DataFrame([timings_summary(t) for t in launches]), use_container_width=True)
+
 # Add an 'Advanced Options' toggle in the sidebar
 with st.sidebar:
     advanced_mode = st.checkbox('Show Advanced Options (Parallel/Fast Mode)', value=False)
+    resource_profile = st.selectbox(
+        "Browser resource profile", list(PROFILES), index=list(PROFILES).index(DEFAULT_PROFILE),
+        format_func=lambda name: f"{name}: {PROFILES[name].description}",
+        help="What scraping browsers skip downloading. Applied when scraping starts; login is unaffected.")
     st.markdown('---')
     st.info('You are logged in and ready to scrape!')
     st.caption('If you encounter login issues, try logging out and back in.')
@@ -1002,10 +1673,17 @@ if scrape_mode == "Scrape by Posts/Keywords":
             value="looking for designer\nneed developer\nseeking marketing help")
         max_posts = st.slider("Max posts to scrape", 10, 100, 30)
         delay = st.slider("Delay between actions (seconds)", 1, 10, 2)
+        scroll_floor = st.slider("Minimum pause between scrolls (seconds)", 0.0, 5.0, 0.5, 0.1,
+            help="Each scroll moves on as soon as new posts load (or after 'Delay between actions' at most), "
+                 "but never sooner than this.")
         fast_mode = False
         parallel_fast_mode = False
         max_workers = 1
         batch_update = 5
+        network_capture_mode = st.checkbox(
+            "📡 Network capture (read posts from LinkedIn's JSON responses instead of the rendered page)",
+            value=False, disabled=not st.session_state.get('network_logging'),
+            help="Log in with 'Record LinkedIn's network responses' ticked to enable this.")
         if advanced_mode:
             fast_mode = st.checkbox("⚡ Fast Mode (less waiting, more slaying)", value=False)
             parallel_fast_mode = st.checkbox("🤖 Parallel Fast Mode (one browser per keyword, max turbo)", value=False, disabled=not fast_mode)
@@ -1044,214 +1722,75 @@ if scrape_mode == "Scrape by Posts/Keywords":
             st.session_state.results = df
             results_placeholder.dataframe(df, use_container_width=True)
 
-        # Helper to copy cookies from main session to a new driver
-
-        def copy_cookies_to_driver(main_driver, new_driver):
-            try:
-                cookies = main_driver.get_cookies()
-                new_driver.get("https://www.linkedin.com")
-                for cookie in cookies:
-                    cookie_dict = {k: v for k, v in cookie.items() if k in ['name', 'value', 'domain', 'path', 'expiry', 'secure', 'httpOnly', 'sameSite']}
-                    if 'expiry' in cookie_dict and cookie_dict['expiry'] is not None:
-                        cookie_dict['expiry'] = int(cookie_dict['expiry'])
-                    try:
-                        new_driver.add_cookie(cookie_dict)
-                    except Exception:
-                        pass
-                new_driver.refresh()
-            except Exception:
-                pass
-
-        # In get_driver(), use the main session driver if available
-
-        def get_driver(parallel=False):
-            if not parallel and st.session_state.get('driver'):
-                return st.session_state.driver
-            options = Options()
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--disable-blink-features=AutomationControlled")
-            user_agent = random.choice(USER_AGENTS)
-            options.add_argument(f'user-agent={user_agent}')
-            
-            # Use undetected Chrome if available, otherwise use regular Chrome
-            if UNDETECTED_CHROME_AVAILABLE:
-                driver = uc.Chrome(options=options)
-            else:
-                service = Service(ChromeDriverManager().install())
-                driver = webdriver.Chrome(service=service, options=options)
-                
-            # For parallel scraping, try to copy cookies from main session
-            if parallel and st.session_state.get('driver'):
-                copy_cookies_to_driver(st.session_state.driver, driver)
-            return driver
-
-        # In all scraping logic, replace calls to get_driver() with get_driver(parallel=...) as appropriate
-        # For single-browser scraping, use get_driver(parallel=False)
-        # For parallel scraping, use get_driver(parallel=True) and show a warning
+        # Sequential keywords reuse the logged-in session; parallel ones run in worker processes with their own browsers
+        primary_driver = st.session_state.driver
 
         # Only show parallel scraping warning if advanced_mode and parallel_fast_mode are enabled
         if advanced_mode and fast_mode and parallel_fast_mode:
             st.warning("Parallel scraping launches new browsers and attempts to copy your session, but LinkedIn may still require login in some tabs. For best results, use single-browser mode.")
 
-        def scrape_keyword(kw, mode):
-            local_driver = get_driver()
-            try:
-                posts_collected = 0
-                seen_posts = set()
-                all_page_posts = []  # Initialize the list for this keyword's posts
-                max_scrolls = 20 if not fast_mode else 10
-                search_url = f"https://www.linkedin.com/search/results/content/?keywords={kw.replace(' ', '%20')}&sortBy=date_posted"
-                try:
-                    local_driver.get(search_url)
-                except NoSuchWindowException:
-                    log_debug(f"[ERROR] Browser window closed for keyword: {kw}")
-                    return
-                time.sleep(delay)
-                scrolls = 0
-                last_first_ids = []
-                stale_scrolls = 0
-                while posts_collected < max_posts and scrolls < max_scrolls and not st.session_state.pause:
-                    try:
-                        # Random scroll height to mimic human behavior
-                        scroll_height = random.randint(300, 1000) * (scrolls + 1)
-                        local_driver.execute_script(f"window.scrollTo(0, {scroll_height});")
-                    except NoSuchWindowException:
-                        log_debug(f"[ERROR] Scroll failed for keyword: {kw}")
-                        break
-                    # Random delay between 0.8x and 1.2x the user-set delay
-                    time.sleep(delay * random.uniform(0.8, 1.2))
-                    try:
-                        soup = BeautifulSoup(local_driver.page_source, 'html.parser')
-                    except NoSuchWindowException:
-                        log_debug(f"[ERROR] Soup failed for keyword: {kw}")
-                        break
-                    except Exception as e:
-                        log_debug(f"[ERROR] Unexpected error during scroll/soup: {e}")
-                        break
-                    posts = soup.find_all('div', attrs={'data-urn': True})
-                    if posts:
-                        first_ids = [posts[i].get('data-urn') for i in range(min(3, len(posts)))]
-                        log_debug(f"[DEBUG] Keyword: {kw}, Scroll: {scrolls+1}, First 3 post IDs: {first_ids}")
-                        if first_ids == last_first_ids:
-                            stale_scrolls += 1
-                        else:
-                            stale_scrolls = 0
-                        last_first_ids = first_ids
-                        if stale_scrolls >= 3:
-                            log_debug(f"[INFO] Breaking scroll loop for {kw} due to repeated post IDs.")
-                            break
-                    for post in posts:
-                        if st.session_state.pause:
-                            break
-                        post_id = post.get('data-urn')
-                        if post_id and post_id in seen_posts:
-                            continue
-                        seen_posts.add(post_id)
-                        # Try to click 'see more' button for this post using Selenium
-                        try:
-                            post_xpath = f"//div[@data-urn='{post_id}']"
-                            post_elem = local_driver.find_element(By.XPATH, post_xpath)
-                            see_more = None
-                            try:
-                                see_more = post_elem.find_element(By.XPATH, ".//button[contains(translate(., 'SEE MORE', 'see more') or contains(., 'more')]")
-                            except Exception:
-                                try:
-                                    see_more = post_elem.find_element(By.XPATH, ".//span[contains(translate(., 'SEE MORE', 'see more') or contains(., 'more')]")
-                                except Exception:
-                                    pass
-                            if see_more:
-                                local_driver.execute_script("arguments[0].click();", see_more)
-                                time.sleep(0.5)
-                        except Exception:
-                            pass
-                        # Extract author name
-                        try:
-                            author_elem = post.find('span', class_=lambda x: x and 'actor__name' in x)
-                            author = author_elem.get_text(strip=True) if author_elem else "Unknown"
-                        except Exception:
-                            author = "Unknown"
-                        # Extract profile URL
-                        profile_url = ''
-                        try:
-                            for a in post.find_all('a', href=True):
-                                if '/in/' in a['href']:
-                                    profile_url = a['href']
-                                    if not profile_url.startswith('http'):
-                                        profile_url = f"https://www.linkedin.com{profile_url}"
-                                    break
-                        except Exception:
-                            profile_url = ''
-                        # Extract post content using multiple selectors
-                        content = ''
-                        raw_content = ''
-                        try:
-                            selectors = [
-                                lambda p: p.find('span', class_=lambda x: x and 'update-components-text' in x),
-                                lambda p: p.find('div', class_=lambda x: x and 'feed-shared-text' in x),
-                                lambda p: p.find('div', class_=lambda x: x and 'feed-shared-update-v2' in x),
-                            ]
-                            for sel in selectors:
-                                elem = sel(post)
-                                if elem and elem.get_text(strip=True):
-                                    content = elem.get_text(strip=True)
-                                    break
-                            if not content:
-                                content = post.get_text(separator=' ', strip=True)
-                            raw_content = str(post)
-                        except Exception:
-                            content = ''
-                            raw_content = ''
-                        post_emails = ', '.join(set(EMAIL_REGEX.findall(content)))
-                        websites = ', '.join(set(URL_REGEX.findall(content)))
-                        all_page_posts.append({
-                            'author': author,
-                            'profile_url': profile_url,
-                            'post_emails': post_emails,
-                            'websites': websites,
-                            'content': content,
-                            'raw_content': raw_content if debug_mode else '',
-                            'keyword': kw
-                        })
-                        posts_collected += 1
-                        results.append(all_page_posts[-1])
-                        all_results.append(all_page_posts[-1])
-                        update_results_live()
-                        if posts_collected >= max_posts:
-                            break
-                    scrolls += 1
-                # Final update after all scrolls
-                update_results_live()
-            finally:
-                try:
-                    local_driver.quit()
-                except Exception:
-                    pass
-            return results
+        page_metrics = []
+        keyword_job = KeywordJob(
+            max_posts=max_posts,
+            max_scrolls=20 if not fast_mode else 10,
+            delay=delay,
+            scroll_floor=scroll_floor,
+            resource_profile=resource_profile,
+            network_capture=network_capture_mode,
+            keep_raw=debug_mode,
+        )
 
         if fast_mode and parallel_fast_mode:
             max_workers = min(4, len(keyword_list))
-            status.info(f"Parallel Fast Mode: Spinning up {max_workers} browsers!")
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_kw = {executor.submit(scrape_keyword, kw, fast_mode): kw for kw in keyword_list}
-                for i, future in enumerate(concurrent.futures.as_completed(future_to_kw)):
-                    kw = future_to_kw[future]
-                    try:
-                        result = future.result()
-                        all_results.extend(result)
+            keyword_workers = get_keyword_workers()
+            status.info(f"Parallel Fast Mode: {max_workers} worker processes, one browser each!")
+            browser_setup = BrowserSetup(
+                cookies=primary_driver.get_cookies(),
+                user_agents=USER_AGENTS,
+                use_uc=UNDETECTED_CHROME_AVAILABLE,
+                network_logging=bool(st.session_state.get('network_logging')),
+                memory_ceiling_mb=get_process_supervisor().memory_ceiling_mb,
+            )
+            # Workers only send records back; this script thread does all rendering and aggregating
+            keywords_done = 0
+            with closing(keyword_workers.run(keyword_list, keyword_job, browser_setup, max_workers)) as messages:
+                for message in messages:
+                    if message.kind == "record":
+                        all_results.append(message.data)
+                        if len(all_results) % batch_update == 0:
+                            update_results_live()
+                    elif message.kind == "log":
+                        log_debug(message.data)
+                    elif message.kind == "launch":
+                        launch_timings = LaunchTimings(**{k: v for k, v in message.data.items() if k != "total_seconds"})
+                        record_launch(launch_timings)
+                        log_launch(launch_timings)
+                    else:
+                        keywords_done += 1
+                        if message.kind == "done" and message.data['metrics']:
+                            page_metrics.append(PageMetrics(**message.data['metrics']))
+                        elif message.kind == "error":
+                            st.error(f"Keyword '{message.keyword}' generated an exception: {message.data}")
                         update_results_live()
-                    except Exception as exc:
-                        st.error(f"Keyword '{kw}' generated an exception: {exc}")
-                    progress.progress((i+1)/len(keyword_list), text=f"{i+1} / {len(keyword_list)} keywords done. Keep slayin'!")
+                        progress.progress(keywords_done/len(keyword_list), text=f"{keywords_done} / {len(keyword_list)} keywords done. Keep slayin'!")
             status.success("Scraping complete!")
             post_progress.progress(1.0, text="All posts scraped! 🥳")
         else:
-            # Non-parallel: loop over keywords and call scrape_keyword for each
+            # Non-parallel: loop over keywords and scrape each on the logged-in browser
+            post_parser = get_html_parser()
+
+            def add_result(record):
+                all_results.append(record)
+                update_results_live()
+
             for i, kw in enumerate(keyword_list):
                 status.info(f"Searching for: {kw}")
                 try:
-                    result = scrape_keyword(kw, fast_mode)
-                    all_results.extend(result)
+                    primary_driver = recycle_session_driver(primary_driver)
+                    _, metrics = scrape_keyword_page(primary_driver, kw, keyword_job, post_parser, add_result,
+                                                     should_stop=lambda: st.session_state.pause, log=log_debug)
+                    if metrics:
+                        page_metrics.append(metrics)
                     update_results_live()
                 except Exception as e:
                     st.error(f"Error scraping for '{kw}': {e}")
@@ -1265,6 +1804,8 @@ if scrape_mode == "Scrape by Posts/Keywords":
             df = df.drop_duplicates(subset=[col for col in ['profile_url', 'content'] if col in df.columns])
         st.session_state.results = df
         st.success(f"Scraped {len(df)} unique posts.")
+        if page_metrics:
+            st.caption(resource_usage_caption(page_metrics))
 
 elif scrape_mode == "Scrape by Emails (lead mode)":
     with st.form("email_lead_form"):
@@ -1272,6 +1813,9 @@ elif scrape_mode == "Scrape by Emails (lead mode)":
             value="looking for designer\nneed developer\nseeking marketing help")
         num_emails = st.number_input("Number of unique emails to collect", min_value=1, max_value=1000, value=10)
         delay = st.slider("Delay between actions (seconds)", 1, 10, 2)
+        scroll_floor = st.slider("Minimum pause between scrolls (seconds)", 0.0, 5.0, 0.5, 0.1,
+            help="Each scroll moves on as soon as new posts load (or after 'Delay between actions' at most), "
+                 "but never sooner than this.")
         time_limit = st.slider("Max scraping time (seconds)", min_value=10, max_value=360000, value=300, step=10)
         max_scrolls_per_keyword = st.slider("Max scrolls per keyword", min_value=3, max_value=30, value=10, step=1)
         fast_mode = False
@@ -1300,11 +1844,19 @@ if start_btn and keywords:
     scraped_posts = []  # Ensure this is always defined before the scraping loop
     start_time = pytime.time()
     posts_scraped = 0
+    see_more_wait_saved = 0.0
+    page_metrics = []
+    apply_resource_profile(driver, resource_profile)
     results_placeholder = st.empty()
     debug_placeholder = st.empty()
     progress_bar = st.progress(0.0, text="Scraping...")
     try:
         for kw in keyword_list:
+            # Between keywords, replace the session browser if it has outgrown the memory ceiling
+            recycled_driver = recycle_session_driver(driver)
+            if recycled_driver is not driver:
+                driver = recycled_driver
+                apply_resource_profile(driver, resource_profile)
             seen_posts = set()
             posts_scraped = 0
             scraped_posts = []
@@ -1316,85 +1868,41 @@ if start_btn and keywords:
             scroll_num = 0
             while (pytime.time() - start_time) < time_limit and len(found_emails) < num_emails and no_new_posts_scrolls < max_no_new_scrolls and scroll_num < max_scrolls_per_keyword:
                 scroll_num += 1
-                scroll_height = 1000 * scroll_num
-                driver.execute_script(f"window.scrollTo(0, {scroll_height});")
-                time.sleep(0.7)
-                # Use Selenium to find all post elements after scrolling
-                post_elems = driver.find_elements(By.XPATH, "//div[@data-urn]")
-                new_posts_found = False
-                for post_elem in post_elems:
-                    try:
-                        post_id = post_elem.get_attribute('data-urn')
-                    except Exception:
-                        post_id = None
-                    if not post_id or post_id in seen_posts:
-                        continue
+                scroll = scroll_and_wait(driver, step=1000, min_pause=scroll_floor, timeout=delay)
+                # Expand every collapsed post in view at once, then hand over the ones it has visited in one round trip
+                scroll_started = time.perf_counter()
+                expansion = expand_collapsed_posts(driver)
+                expanded = set(expansion.clicked)
+                see_more_wait_saved += expansion.saved_seconds(LEAD_SEE_MORE_SLEEP)
+                expanded_at = time.perf_counter()
+                page_posts = collect_lead_posts(driver)
+                new_posts = [post for post in page_posts['posts'] if post['urn'] and post['urn'] not in seen_posts]
+                log_debug(f"[SCROLL TIMING] {kw} scroll {scroll_num}: {len(new_posts)} new of {page_posts['total']} posts, "
+                          f"waited {scroll.wait_seconds:.2f}s ({scroll.reason}), "
+                          f"{len(expanded)} expanded ({expansion.still_collapsed} timed out) in {1000 * (expanded_at - scroll_started):.0f} ms, "
+                          f"saved {expansion.saved_seconds(LEAD_SEE_MORE_SLEEP):.1f}s of see-more waits, "
+                          f"extract {1000 * (time.perf_counter() - expanded_at):.0f} ms")
+                for post in new_posts:
+                    post_id = post['urn']
                     seen_posts.add(post_id)
                     posts_scraped += 1
-                    new_posts_found = True
-                    post_text = ''
-                    post_html = ''
-                    see_more_clicked = False
-                    see_more_found = False
-                    see_more_error = ''
-                    # Scroll post into view and try to click 'see more' robustly
-                    try:
-                        driver.execute_script("arguments[0].scrollIntoView();", post_elem)
-                        time.sleep(0.2)
-                        ActionChains(driver).move_to_element(post_elem).perform()
-                        see_more = None
-                        # Try multiple selectors for the button
-                        see_more_selectors = [
-                            ".//button[contains(translate(., 'SEE MORE', 'see more') or contains(., 'more')]",
-                            ".//span[contains(translate(., 'SEE MORE', 'see more') or contains(., 'more')]",
-                            ".//*[contains(text(), '...see more') or contains(text(), 'See more') or contains(text(), 'more') or contains(text(), 'More') or contains(text(), 'Show more')]"
-                        ]
-                        for selector in see_more_selectors:
-                            try:
-                                see_more = WebDriverWait(post_elem, 1).until(
-                                    lambda el: el.find_element(By.XPATH, selector)
-                                )
-                                if see_more:
-                                    see_more_found = True
-                                    break
-                            except Exception as e:
-                                see_more_error = str(e)
-                                continue
-                        if see_more:
-                            try:
-                                ActionChains(driver).move_to_element(see_more).perform()
-                                WebDriverWait(driver, 2).until(EC.element_to_be_clickable((By.XPATH, './*')))
-                                driver.execute_script("arguments[0].click();", see_more)
-                                time.sleep(1.5)
-                                see_more_clicked = True
-                            except Exception as e:
-                                see_more_error = f"Click error: {e}"
-                        # After clicking, extract the post's text and innerHTML using Selenium
-                        try:
-                            post_text = post_elem.text
-                        except Exception:
-                            post_text = ''
-                        try:
-                            post_html = post_elem.get_attribute('innerHTML')
-                        except Exception:
-                            post_html = ''
-                    except Exception as e:
-                        post_text = ''
-                        post_html = ''
-                        see_more_error = f"Outer error: {e}"
-                    # Extract emails from both text and innerHTML
+                    post_text = post['text']
+                    post_html = post['html_snippet']
+                    # Emails come from the visible text plus any mailto: links
                     emails_text = set(EMAIL_REGEX.findall(post_text))
-                    emails_html = set(EMAIL_REGEX.findall(post_html))
+                    emails_html = set(EMAIL_REGEX.findall(' '.join(post['mailto'])))
                     all_emails = emails_text | emails_html
                     # Debug output for each post
-                    log_debug(f"[POST] id={post_id} see_more_found={see_more_found} see_more_clicked={see_more_clicked} see_more_error={see_more_error} emails_text={list(emails_text)} emails_html={list(emails_html)} text_snippet={post_text[:80]}")
-                    if not see_more_found:
-                        log_debug(f"[POST_HTML] id={post_id} html_snippet={post_html[:200]}")
+                    log_debug(f"[POST] id={post_id} still_collapsed={post['collapsed']} see_more_clicked={post_id in expanded} emails_text={list(emails_text)} emails_html={list(emails_html)} text_snippet={post_text[:80]}")
+                    if not post['collapsed']:
+                        log_debug(f"[POST_HTML] id={post_id} html_snippet={post_html}")
                     for email in all_emails:
                         if email not in found_emails:
                             found_emails.add(email)
                             email_results.append({
                                 'email': email,
+                                'author': post['author'],
+                                'profile_url': post['profile_url'],
                                 'content': post_text,
                                 'html_snippet': post_html[:120],
                                 'keyword': kw,
@@ -1418,6 +1926,7 @@ if start_btn and keywords:
                 else:
                     no_new_posts_scrolls = 0
                 last_seen_count = len(seen_posts)
+            record_page_metrics(driver, resource_profile, kw, page_metrics)
             if len(found_emails) >= num_emails or (pytime.time() - start_time) >= time_limit:
                 break
     except Exception as scrape_e:
@@ -1442,6 +1951,10 @@ if start_btn and keywords:
     else:
         st.info("No emails found in the scraped posts.")
         st.info(reason)
+    if page_metrics:
+        st.caption(resource_usage_caption(page_metrics))
+    if see_more_wait_saved:
+        st.caption(f"Bulk \"see more\" expansion saved about {see_more_wait_saved:.0f}s of fixed per-post waits.")
 
 # After scraping, show a table of all scraped post texts for inspection
 if scraped_posts:
@@ -1499,119 +2012,48 @@ if not df.empty:
 
     # --- LLM enrichment: generate subject/body for each row, only on button click ---
     st.markdown("---")
-    llm_delay = st.slider("Delay between LLM requests (seconds)", min_value=0.0, max_value=30.0, value=5.0, step=0.5)
-
-    def generate_email_with_retries(email, content, llm_func, max_retries=3, delay=1.0, cooldown_callback=None):
-        retries = 0
-        llm_error = ""
-        consecutive_429s = 0
-        while retries <= max_retries:
-            subject, body = llm_func(email, content)
-            if (subject == "[Groq error]" or body == "[Groq error]" or subject == "[OpenAI error]" or body == "[OpenAI error]"):
-                last_log = st.session_state.debug_log.split('\n')[-2] if st.session_state.debug_log else ""
-                if "429" in last_log or "Too Many Requests" in last_log:
-                    llm_error = "429 Too Many Requests - Retrying..."
-                    consecutive_429s += 1
-                    import time as pytime
-                    pytime.sleep(delay)
-                    delay = min(delay * 2, 30)
-                    retries += 1
-                    if consecutive_429s >= 3:
-                        if cooldown_callback:
-                            cooldown_callback()
-                        st.warning("Groq rate limit hit 3 times in a row. Cooling down for 60 seconds...")
-                        pytime.sleep(60)
-                        consecutive_429s = 0
-                    continue
-                else:
-                    llm_error = last_log or "LLM error"
-            else:
-                llm_error = ""
-                consecutive_429s = 0
-            break
-        return subject, body, llm_error
+    st.caption(f"LLM throughput: {st.session_state.get('llm_workers', 4)} workers, "
+               "paced by the model's RPM/TPM quota (change in the sidebar)")
 
     if st.button("Generate Email"):
         st.markdown("#### Personalized Email CSV")
-        personalized_rows = []
         progress_bar = st.progress(0.0, text="Generating emails...")
-        if st.session_state.get("api_provider") == "Groq":
-            llm_func = call_groq_api
-        else:
-            llm_func = lambda email, content: call_openai_api(email, content, st.session_state.get("openai_api_key", ""))
-        total = len(df)
-        def cooldown_callback():
-            st.warning("Groq rate limit hit 3 times in a row. Cooling down for 60 seconds...")
-        for i, row in df.iterrows():
-            email = row.get('email', '') if 'email' in row else ''
-            context_content = row.get('raw_content', '') or row.get('content', '')
-            
-            # Extract name from content using LLM
-            progress_bar.progress((i+0.3)/total, text=f"Extracting name for {i+1}/{total}")
-            extracted_name = extract_name_from_content(context_content)
-            
-            # Create greeting
-            greeting = f"Moshi moshi {extracted_name}!"
-            
-            prompt_content = f"""
-You are Anusha, a sales person from Moshi Moshi, a branding and consultancy agency in Bangalore. Write a personalized outreach email based on the following LinkedIn post content.
-
-Use this EXACT email format:
-
-Well, that's how we say hello. Hope you are doing great!
-
-Just a quick intro about Moshi Moshi — we're a Bangalore-headquartered communication company with offices in Mumbai and Gurgaon, working at the intersection of design, digital, content, and code — turning brand goals into sharp strategies, clean visuals, and campaigns that don't just look good, but actually connect with the right audience.
-
-Over the last 10 years, we haven't just worked on major launches, legacy rebrands, or brand campaigns that grabbed attention — we've steadily become long-term partners to many businesses, including several and your space space, supporting them from brand creation all the way to customer acquisition. That's where both our clients and we see real value.
-
-[ADD A PERSONALIZED PARAGRAPH HERE based on the LinkedIn content - mention their specific need/pain point and how Moshi Moshi can help them specifically]
+        table_placeholder = st.empty()
+        settings = llm_settings()
+        engine = make_enrichment_engine(settings)
+        rows = [row for _, row in df.iterrows()]
+        personalized_rows = [None] * len(rows)
+
+        def to_result_row(row, generated):
+            result_row = dict(generated)
+            for col in EXPECTED_COLS:
+                if col in row:
+                    result_row[col] = row[col]
+            return result_row
 
-Attaching a few relevant projects from your space (and a few others), along with a quick proposal. Let us know a good time this week — we'd love to walk you through our approach.
+        previews = {}
 
-Respond ONLY in valid JSON with keys: subject, body.
-- Subject: Max 10 words, catchy and relevant to their specific need.
-- Body: Use the exact format above, only customize the personalized paragraph based on their LinkedIn content.
+        def render_table():
+            shown = [r if r is not None else previews.get(i) for i, r in enumerate(personalized_rows)]
+            table_placeholder.dataframe(pd.DataFrame([r for r in shown if r is not None]), use_container_width=True)
 
-LinkedIn Post Content:
-{context_content}
-"""
-            progress_bar.progress((i+0.6)/total, text=f"Generating email for {i+1}/{total}")
-            subject, body, llm_error = generate_email_with_retries(email, prompt_content, llm_func, max_retries=3, delay=llm_delay, cooldown_callback=cooldown_callback)
-            
-            # Combine greeting with body and regards
-            regards_section = f"""
+        def on_progress(done, total, i, generated):
+            personalized_rows[i] = to_result_row(rows[i], generated)
+            progress_bar.progress(done/total, text=f"{done}/{total} emails generated")
+            render_table()
 
-Check out our portfolio: https://drive.google.com/file/d/1zaK36IRSEWesf2ccPudco_G6fdPD2YYN/view?usp=sharing
-        
-Best regards,
-Anusha
-Moshi Moshi Communications Ltd.
-Bangalore
+        def on_partial(i, fields):
+            if personalized_rows[i] is None and 'subject' in fields:
+                previews[i] = streaming_preview(rows[i], fields)
+                render_table()
 
-+91 91485 44178
-www.moshimoshi.in"""
-            
-            full_body = greeting + "\n\n" + body + regards_section
-            
-            result_row = {
-                'email': email,
-                'extracted_name': extracted_name,
-                'greetings': greeting,
-                'subject': subject,
-                'body': body,
-                'full_body': full_body,
-                'llm_error': llm_error
-            }
-            for col in EXPECTED_COLS:
-                if col in row:
-                    result_row[col] = row[col]
-            personalized_rows.append(result_row)
-            progress_bar.progress((i+1)/total, text=f"{i+1}/{total} emails generated")
-            st.session_state["personalized_results"] = pd.DataFrame(personalized_rows)
-            st.dataframe(st.session_state["personalized_results"], use_container_width=True)
-            import time as pytime
-            pytime.sleep(llm_delay)
+        engine.run(rows, lambda row: personalize_row(row, settings, engine),
+                   on_progress=on_progress, on_error=failed_personalization, on_partial=on_partial, on_log=log_debug)
+        st.session_state["personalized_results"] = pd.DataFrame(personalized_rows)
+        table_placeholder.dataframe(st.session_state["personalized_results"], use_container_width=True)
         st.success("All emails generated!")
+        st.caption(context_reduction_caption(st.session_state["personalized_results"]))
+        st.caption(name_resolution_caption(st.session_state["personalized_results"]))
         csv = st.session_state["personalized_results"].to_csv(index=False)
         st.download_button("Download Personalized CSV", csv, file_name=f"linkedin_personalized_emails_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", mime="text/csv", key="csv_personalized")
         
@@ -1687,7 +2129,10 @@ www.moshimoshi.in"""
                         sender_password=smtp_password,
                         email_data=email_data,
                         delay_seconds=email_delay,
-                        sender_name=sender_name
+                        sender_name=sender_name,
+                        connections=st.session_state.get("smtp_connections", 1),
+                        messages_per_minute=st.session_state.get("smtp_rate", 0),
+                        burst=st.session_state.get("smtp_burst", 1)
                     )
                     
                     # Display results
@@ -1699,6 +2144,9 @@ www.moshimoshi.in"""
                         st.metric("Successfully Sent", results['sent'], delta=f"+{results['sent']}")
                     with col3:
                         st.metric("Failed", results['failed'], delta=f"-{results['failed']}" if results['failed'] > 0 else None)
+                    stats = results.get('stats', {})
+                    st.caption(f"SMTP: {stats.get('connections', 0)} connection(s), {stats.get('reconnects', 0)} reconnect(s), "
+                               f"avg handshake {stats.get('avg_connect_seconds', 0)}s, avg send {stats.get('avg_message_seconds', 0)}s")
                     
                     # Show detailed results
                     if st.checkbox("Show detailed results", key="show_email_details_personalized"):
@@ -1722,81 +2170,41 @@ if uploaded_csv is not None:
     if not any(col in user_df.columns for col in ["content", "raw_content"]):
         st.error("Your CSV must have a 'content' or 'raw_content' column for LLM email generation.")
     else:
-        llm_delay = st.slider("Delay between LLM requests (seconds)", min_value=0.0, max_value=30.0, value=2.0, step=0.5, key="llm_delay_upload")
         if st.button("Generate Emails for Uploaded CSV"):
             st.markdown("#### Personalized Email CSV (from upload)")
-            personalized_rows = []
             progress_bar = st.progress(0.0, text="Generating emails...")
-            if st.session_state.get("api_provider") == "Groq":
-                llm_func = call_groq_api
-            else:
-                llm_func = lambda email, content: call_openai_api(email, content, st.session_state.get("openai_api_key", ""))
-            total = len(user_df)
-            for i, row in user_df.iterrows():
-                email = row.get('email', '') if 'email' in row else ''
-                context_content = row.get('raw_content', '') or row.get('content', '')
-                
-                # Extract name from content using LLM
-                progress_bar.progress((i+0.3)/total, text=f"Extracting name for {i+1}/{total}")
-                extracted_name = extract_name_from_content(context_content)
-                
-                # Create greeting
-                greeting = f"Moshi moshi {extracted_name}!"
-                
-                prompt_content = f"""
-You are Anusha, a sales person from Moshi Moshi, a branding and consultancy agency in Bangalore. Write a personalized outreach email based on the following LinkedIn post content.
-
-Use this EXACT email format:
-
-Well, that's how we say hello. Hope you are doing great!
-
-Just a quick intro about Moshi Moshi — we're a Bangalore-headquartered communication company with offices in Mumbai and Gurgaon, working at the intersection of design, digital, content, and code — turning brand goals into sharp strategies, clean visuals, and campaigns that don't just look good, but actually connect with the right audience.
-
-Over the last 10 years, we haven't just worked on major launches, legacy rebrands, or brand campaigns that grabbed attention — we've steadily become long-term partners to many businesses, including several and in your space, supporting them from brand creation all the way to customer acquisition. That's where both our clients and we see real value.
-
-[ADD A PERSONALIZED PARAGRAPH HERE based on the LinkedIn content - mention their specific need/pain point and how Moshi Moshi can help them specifically]
-
-Attaching a few relevant projects from your space (and a few others), along with a quick proposal. Let us know a good time this week — we'd love to walk you through our approach.
-
-Respond ONLY in valid JSON with keys: subject, body.
-- Subject: Max 10 words, catchy and relevant to their specific need.
-- Body: Use the exact format above, only customize the personalized paragraph based on their LinkedIn content.
-
-LinkedIn Post Content:
-{context_content}
-"""
-                progress_bar.progress((i+0.6)/total, text=f"Generating email for {i+1}/{total}")
-                subject, body, llm_error = generate_email_with_retries(email, prompt_content, llm_func, max_retries=3, delay=llm_delay)
-                
-                # Combine greeting with body and regards
-                regards_section = f"""
-
-Check out our portfolio: https://drive.google.com/file/d/1zaK36IRSEWesf2ccPudco_G6fdPD2YYN/view?usp=sharing
-        
-Best regards,
-Anusha
-Moshi Moshi Communications Ltd.
-Bangalore
-
-+91 91485 44178
-www.moshimoshi.in"""
-                
-                full_body = greeting + "\n\n" + body + regards_section
-                
-                result_row = dict(row)
-                result_row['extracted_name'] = extracted_name
-                result_row['greetings'] = greeting
-                result_row['subject'] = subject
-                result_row['body'] = body
-                result_row['full_body'] = full_body
-                result_row['llm_error'] = llm_error
-                personalized_rows.append(result_row)
-                progress_bar.progress((i+1)/total, text=f"{i+1}/{total} emails generated")
-                st.session_state["personalized_upload_results"] = pd.DataFrame(personalized_rows)
-                st.dataframe(st.session_state["personalized_upload_results"], use_container_width=True)
-                import time as pytime
-                pytime.sleep(llm_delay)
+            table_placeholder = st.empty()
+            settings = llm_settings()
+            engine = make_enrichment_engine(settings)
+            rows = [row for _, row in user_df.iterrows()]
+            personalized_rows = [None] * len(rows)
+
+            upload_previews = {}
+
+            def render_upload_table():
+                shown = [r if r is not None else upload_previews.get(i) for i, r in enumerate(personalized_rows)]
+                table_placeholder.dataframe(pd.DataFrame([r for r in shown if r is not None]), use_container_width=True)
+
+            def on_upload_progress(done, total, i, generated):
+                result_row = dict(rows[i])
+                result_row.update({k: v for k, v in generated.items() if k != 'email'})
+                personalized_rows[i] = result_row
+                progress_bar.progress(done/total, text=f"{done}/{total} emails generated")
+                render_upload_table()
+
+            def on_upload_partial(i, fields):
+                if personalized_rows[i] is None and 'subject' in fields:
+                    upload_previews[i] = streaming_preview(rows[i], fields)
+                    render_upload_table()
+
+            engine.run(rows, lambda row: personalize_row(row, settings, engine),
+                       on_progress=on_upload_progress, on_error=failed_personalization, on_partial=on_upload_partial,
+                       on_log=log_debug)
+            st.session_state["personalized_upload_results"] = pd.DataFrame(personalized_rows)
+            table_placeholder.dataframe(st.session_state["personalized_upload_results"], use_container_width=True)
             st.success("All emails generated for uploaded CSV!")
+            st.caption(context_reduction_caption(st.session_state["personalized_upload_results"]))
+            st.caption(name_resolution_caption(st.session_state["personalized_upload_results"]))
             csv = st.session_state["personalized_upload_results"].to_csv(index=False)
             st.download_button("Download Personalized CSV", csv, file_name=f"uploaded_personalized_emails_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", mime="text/csv", key="csv_personalized_upload")
             
@@ -1872,7 +2280,10 @@ www.moshimoshi.in"""
                             sender_password=smtp_password,
                             email_data=email_data,
                             delay_seconds=email_delay,
-                            sender_name=sender_name
+                            sender_name=sender_name,
+                            connections=st.session_state.get("smtp_connections", 1),
+                            messages_per_minute=st.session_state.get("smtp_rate", 0),
+                            burst=st.session_state.get("smtp_burst", 1)
                         )
                         
                         # Display results
@@ -1884,6 +2295,9 @@ www.moshimoshi.in"""
                             st.metric("Successfully Sent", results['sent'], delta=f"+{results['sent']}")
                         with col3:
                             st.metric("Failed", results['failed'], delta=f"-{results['failed']}" if results['failed'] > 0 else None)
+                        stats = results.get('stats', {})
+                        st.caption(f"SMTP: {stats.get('connections', 0)} connection(s), {stats.get('reconnects', 0)} reconnect(s), "
+                                   f"avg handshake {stats.get('avg_connect_seconds', 0)}s, avg send {stats.get('avg_message_seconds', 0)}s")
                         
                         # Show detailed results
                         if st.checkbox("Show detailed results", key="show_email_details_upload"):
@@ -1892,6 +2306,50 @@ www.moshimoshi.in"""
                 else:
                     st.warning("No valid emails found to send. Make sure your data has valid email addresses and generated content.")
 
+        with st.expander("📦 Offline batch mode (large lists)"):
+            st.caption("Writes one single-call request per row to a batch JSONL under batches/ and lets the provider "
+                       "process it offline, so no browser session has to stay open. Jobs can also be driven from a shell: "
+                       "`python llm_batch.py wait batches/<job>/state.json`. Results can be merged at any time, even partially.")
+            batch_provider = st.session_state.get("api_provider", "Groq").lower()
+            batch_base_url = st.text_input("Batch API base URL", value=llm_batch.BATCH_BASE_URLS.get(batch_provider, llm_batch.BATCH_BASE_URLS["openai"]),
+                                           help="Any OpenAI-compatible Files + Batches API, e.g. a local stand-in for testing")
+            if st.button("📝 Write batch files", key="batch_write"):
+                job = write_batch_job(user_df, os.path.splitext(uploaded_csv.name)[0], batch_base_url)
+                st.session_state["batch_state_path"] = job.state_path
+                st.success(f"Wrote {job.total_requests} requests to {job.requests_path}")
+            batch_state_path = st.text_input("Batch job state file", value=st.session_state.get("batch_state_path", ""))
+            if batch_state_path and os.path.exists(batch_state_path):
+                job = llm_batch.BatchJob.load(batch_state_path)
+                st.session_state["batch_state_path"] = batch_state_path
+                _, batch_api_key = batch_model_and_key()
+                submit_col, refresh_col, retry_col = st.columns(3)
+                try:
+                    client = llm_batch.BatchClient(batch_base_url or job.base_url, batch_api_key, provider=batch_provider)
+                    if submit_col.button("🚀 Submit", key="batch_submit"):
+                        llm_batch.submit(job, client)
+                    if refresh_col.button("🔄 Refresh & merge", key="batch_refresh"):
+                        llm_batch.refresh(job, client)
+                    # Retrying before the batch finishes would drop it and bill every row twice
+                    if retry_col.button("♻️ Retry failed rows", key="batch_retry", disabled=not job.finished,
+                                        help=None if job.finished else f"Available once the batch finishes ({job.status})"):
+                        retried = job.prepare_retry(llm_batch.read_results(job.result_paths))
+                        if retried:
+                            llm_batch.submit(job, client)
+                        st.info(f"Resubmitted {retried} row(s)" if retried else "No failed or missing rows to retry")
+                    client.close()
+                except Exception as e:
+                    st.error(f"Batch API error: {e}")
+                merged_df, batch_summary = merge_batch_job(job)
+                st.caption(f"Batch {job.batch_id or '(not submitted)'}: {batch_summary['status']}, attempt {batch_summary['attempt']} — "
+                           f"{batch_summary['succeeded']} ok, {batch_summary['failed']} failed, {batch_summary['pending']} pending "
+                           f"of {batch_summary['total']}, {batch_summary['tokens']} tokens")
+                if batch_summary['succeeded'] or batch_summary['failed']:
+                    st.session_state["personalized_upload_results"] = merged_df
+                    st.dataframe(merged_df, use_container_width=True)
+                    st.download_button("Download Batch Results CSV", merged_df.to_csv(index=False),
+                                       file_name=f"batch_personalized_emails_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                                       mime="text/csv", key="csv_batch_results")
+
 st.markdown("---")
 st.header("3. 📧 Send Emails from CSV File")
 st.markdown("Upload a CSV file with email data and send personalized emails directly.")
@@ -1984,8 +2442,45 @@ Attaching a few relevant projects from your space (and a few others), along with
                         # Prepare email data with optional name extraction
                         email_data = []
                         progress_bar = st.progress(0.0, text="Preparing emails...")
-                        
-                        for i, row in valid_email_df.iterrows():
+                        csv_rows = [row for _, row in valid_email_df.iterrows()]
+
+                        # Run the LLM name extraction for every row that needs it up front, concurrently
+                        extracted_names = {}
+                        if use_name_extraction:
+                            needs_name = [idx for idx, row in enumerate(csv_rows)
+                                          if not ('greetings' in row and row.get('greetings'))
+                                          and 'content' in row and row.get('content', '')]
+                            # Author, profile slug, email or sign-off first; the LLM only for low-confidence rows
+                            to_extract = []
+                            for idx in needs_name:
+                                row = csv_rows[idx]
+                                guess = resolve_name(row.get('author', ''), row.get('profile_url', ''),
+                                                     row.get('email', ''), row.get('content', ''))
+                                if guess.confident:
+                                    extracted_names[idx] = guess.name
+                                else:
+                                    to_extract.append(idx)
+                            if needs_name:
+                                st.caption(f"Names: {len(extracted_names)}/{len(needs_name)} resolved locally, "
+                                           f"{len(extracted_names)} LLM request(s) saved")
+                            settings = llm_settings()
+                            engine = make_enrichment_engine(settings)
+
+                            def extract_row_name(idx):
+                                def attempt():
+                                    engine.throttle()
+                                    return extract_name_from_content(clean_post_content(csv_rows[idx].get('content', '')).text, settings)
+                                return call_with_rate_limit_retries(attempt)
+
+                            names = engine.run(
+                                to_extract, extract_row_name,
+                                on_progress=lambda done, total, _i, _name: progress_bar.progress(done/total, text=f"Extracted names for {done}/{total} rows"),
+                                on_error=lambda _idx, _e: 'there',
+                                on_log=log_debug
+                            )
+                            extracted_names.update(zip(to_extract, names))
+
+                        for i, row in enumerate(csv_rows):
                             email_subject = row.get('subject', default_subject)
                             
                             # Check if we already have a greetings column
@@ -2010,13 +2505,11 @@ www.moshimoshi.in"""
                                 email_body = greeting + "\n\n" + email_body + regards_section
                                 
                             elif use_name_extraction and 'content' in row:
-                                # Extract name from content using LLM
-                                progress_bar.progress((i+0.3)/len(valid_email_df), text=f"Extracting name for {i+1}/{len(valid_email_df)}")
                                 content = row.get('content', '')
                                 email_body = row.get('body', default_body)
                                 
                                 if content:
-                                    extracted_name = extract_name_from_content(content)
+                                    extracted_name = extracted_names.get(i, 'there')
                                     
                                     # Create greeting
                                     greeting = f"Moshi moshi {extracted_name}!"
@@ -2048,9 +2541,6 @@ www.moshimoshi.in"""
                                 'subject': email_subject,
                                 'body': email_body
                             })
-                            
-                            if use_name_extraction:
-                                progress_bar.progress((i+1)/len(valid_email_df), text=f"Prepared {i+1}/{len(valid_email_df)} emails")
                         
                         progress_bar.progress(1.0, text="All emails prepared!")
                         
@@ -2061,7 +2551,10 @@ www.moshimoshi.in"""
                             sender_password=smtp_password,
                             email_data=email_data,
                             delay_seconds=email_delay_csv,
-                            sender_name=sender_name_csv
+                            sender_name=sender_name_csv,
+                            connections=st.session_state.get("smtp_connections", 1),
+                            messages_per_minute=st.session_state.get("smtp_rate", 0),
+                            burst=st.session_state.get("smtp_burst", 1)
                         )
                         
                         # Display results
@@ -2073,6 +2566,9 @@ www.moshimoshi.in"""
                             st.metric("Successfully Sent", results['sent'], delta=f"+{results['sent']}")
                         with col3:
                             st.metric("Failed", results['failed'], delta=f"-{results['failed']}" if results['failed'] > 0 else None)
+                        stats = results.get('stats', {})
+                        st.caption(f"SMTP: {stats.get('connections', 0)} connection(s), {stats.get('reconnects', 0)} reconnect(s), "
+                                   f"avg handshake {stats.get('avg_connect_seconds', 0)}s, avg send {stats.get('avg_message_seconds', 0)}s")
                         
                         # Show detailed results
                         if st.checkbox("Show detailed sending results", key="show_csv_email_details"):
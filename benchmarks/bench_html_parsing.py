@@ -0,0 +1,104 @@
+"""
+Compare the post parser backends on saved LinkedIn search pages.
+
+Every ``*.html`` file under ``benchmarks/fixtures`` is parsed two ways:
+as a whole page (``parse_page``) and post by post, which is what the
+scraper does with the fragments from page_scripts.collect_new_posts. The
+"legacy" row is the old html.parser + ``class_=lambda`` matching, kept as
+a baseline, and every backend's fields are checked against it.
+
+    python benchmarks/bench_html_parsing.py [--repeat 20]
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from html_parsing import BACKENDS, ParsedPost, absolute_profile_url  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_parse_page(html):
+    """The pre-backend scrape_keyword parsing, for comparison."""
+    soup = BeautifulSoup(html, 'html.parser')
+    posts = []
+    for post in soup.find_all('div', attrs={'data-urn': True}):
+        author_elem = post.find('span', class_=lambda x: x and 'actor__name' in x)
+        parsed = ParsedPost(urn=post.get('data-urn'), author=author_elem.get_text(strip=True) if author_elem else "Unknown")
+        for a in post.find_all('a', href=True):
+            if '/in/' in a['href']:
+                parsed.profile_url = absolute_profile_url(a['href'])
+                break
+        for sel in (lambda p: p.find('span', class_=lambda x: x and 'update-components-text' in x),
+                    lambda p: p.find('div', class_=lambda x: x and 'feed-shared-text' in x),
+                    lambda p: p.find('div', class_=lambda x: x and 'feed-shared-update-v2' in x)):
+            elem = sel(post)
+            if elem and elem.get_text(strip=True):
+                parsed.content = elem.get_text(strip=True)
+                break
+        posts.append(parsed)
+    return posts
+
+
+def split_posts(html):
+    """Top-level post fragments, the way the page-side extractor hands them over."""
+    soup = BeautifulSoup(html, 'html.parser')
+    return [str(node) for node in soup.find_all('div', attrs={'data-urn': True})]
+
+
+def normalize(post):
+    # Backends differ in how they join text nodes; compare without whitespace
+    return post.urn, post.author, post.profile_url, re.sub(r"\s+", "", post.content)
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement (best time is reported)")
+    args = parser.parse_args()
+
+    fixtures = sorted(glob.glob(os.path.join(FIXTURES, "*.html")))
+    if not fixtures:
+        sys.exit(f"No fixtures in {FIXTURES}")
+    backends = {}
+    for name, backend in BACKENDS.items():
+        try:
+            backends[name] = backend()
+        except ImportError as e:
+            print(f"skipping {name}: {e}")
+
+    for path in fixtures:
+        with open(path, encoding="utf-8") as fh:
+            html = fh.read()
+        fragments = split_posts(html)
+        print(f"\n{os.path.basename(path)}: {len(html) / 1024:.0f} KiB, {len(fragments)} posts")
+        print(f"{'backend':<12} {'page ms':>9} {'posts ms':>9} {'speedup':>8}  fields match")
+        legacy_time, legacy_posts = timed(lambda: legacy_parse_page(html), args.repeat)
+        reference = [normalize(p) for p in legacy_posts]
+        print(f"{'legacy':<12} {legacy_time * 1000:>9.2f} {'-':>9} {1.0:>7.1f}x")
+        for name, backend in backends.items():
+            page_time, page_posts = timed(lambda: backend.parse_page(html), args.repeat)
+            posts_time, _ = timed(lambda: [backend.parse_post(f) for f in fragments], args.repeat)
+            matches = sum(normalize(a) == b for a, b in zip(page_posts, reference))
+            print(f"{name:<12} {page_time * 1000:>9.2f} {posts_time * 1000:>9.2f} "
+                  f"{legacy_time / page_time:>7.1f}x  {matches}/{len(reference)}")
+
+
+if __name__ == "__main__":
+    main()
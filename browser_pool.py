@@ -0,0 +1,186 @@
+"""
+Warm pool of logged-in scraping browsers.
+
+Starting Chrome (and undetected-chromedriver's patching) costs several
+seconds per browser; parallel keyword scraping used to pay that for every
+keyword and then quit the browser. The pool keeps finished browsers open,
+hands them to the next keyword, and only replaces one when it has died,
+sat idle too long, served ``max_uses`` leases, or fails ``should_recycle``
+(e.g. it has grown past a memory ceiling). Drivers registered with
+:meth:`BrowserPool.protect` (the session the user logged in with) are never
+quit by the pool.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+class PoolExhausted(RuntimeError):
+    """No browser became free before the lease timeout."""
+
+
+@dataclass
+class PooledBrowser:
+    driver: object
+    generation: int = 0
+    uses: int = 0
+    idle_since: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class PoolStats:
+    launched: int = 0
+    reused: int = 0
+    recycled: int = 0
+    dead: int = 0
+    idle: int = 0
+    leased: int = 0
+
+
+class BrowserPool:
+    """
+    Thread-safe lease/release pool of WebDriver instances
+
+    Args:
+        factory: Launches a new browser; called with the ``seed`` given to lease()
+        is_alive: Health check, e.g. app.is_driver_alive
+        max_size: Most browsers open at once (idle, leased and launching)
+        max_uses: Leases a browser serves before it is quit and replaced
+        max_idle_seconds: Idle browsers older than this are quit instead of reused
+        should_recycle: Checked on release; True replaces the browser instead of keeping it warm
+        dispose: Shuts a browser down; defaults to ``driver.quit()``
+    """
+
+    def __init__(self, factory: Callable[[Optional[object]], object], is_alive: Callable[[object], bool],
+                 max_size: int = 4, max_uses: int = 20, max_idle_seconds: float = 1800.0,
+                 should_recycle: Optional[Callable[[object], bool]] = None,
+                 dispose: Optional[Callable[[object], None]] = None):
+        self.factory = factory
+        self.is_alive = is_alive
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.max_idle_seconds = max_idle_seconds
+        self.should_recycle = should_recycle
+        self.dispose = dispose
+        self._idle: List[PooledBrowser] = []
+        self._leased: Dict[int, PooledBrowser] = {}
+        self._launching = 0
+        self._generation = 0
+        self._protected = set()
+        self._cond = threading.Condition()
+        self._stats = PoolStats()
+
+    def protect(self, driver):
+        """Never quit ``driver`` (the primary logged-in session), even on close()."""
+        with self._cond:
+            self._protected.add(id(driver))
+
+    def _quit(self, driver):
+        if id(driver) in self._protected:
+            return
+        try:
+            if self.dispose is not None:
+                self.dispose(driver)
+            else:
+                driver.quit()
+        except Exception:
+            pass
+
+    def _take_idle(self) -> Optional[PooledBrowser]:
+        """Newest healthy idle browser; stale and dead ones are quit. Caller holds the lock."""
+        now = time.monotonic()
+        while self._idle:
+            browser = self._idle.pop()
+            if now - browser.idle_since > self.max_idle_seconds:
+                self._stats.recycled += 1
+            elif not self.is_alive(browser.driver):
+                self._stats.dead += 1
+            else:
+                return browser
+            self._quit(browser.driver)
+        return None
+
+    def lease(self, seed=None, timeout: Optional[float] = None):
+        """
+        A browser for one keyword: a warm idle one if available, else a newly launched one
+
+        Args:
+            seed: Passed to the factory for new browsers (e.g. the session to copy cookies from)
+            timeout: Seconds to wait while ``max_size`` browsers are busy; None waits indefinitely
+
+        Returns:
+            The WebDriver; hand it back with release()
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                browser = self._take_idle()
+                if browser is not None:
+                    browser.uses += 1
+                    self._leased[id(browser.driver)] = browser
+                    self._stats.reused += 1
+                    return browser.driver
+                if len(self._leased) + self._launching < self.max_size:
+                    self._launching += 1
+                    generation = self._generation
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolExhausted(f"All {self.max_size} browsers are busy")
+                self._cond.wait(remaining)
+        # Launch outside the lock so other threads can lease and release meanwhile
+        try:
+            driver = self.factory(seed)
+        except Exception:
+            with self._cond:
+                self._launching -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._launching -= 1
+            self._leased[id(driver)] = PooledBrowser(driver, generation=generation, uses=1)
+            self._stats.launched += 1
+        return driver
+
+    def release(self, driver):
+        """Give a leased browser back; dead, worn-out, oversized or pre-close() browsers are quit instead."""
+        with self._cond:
+            browser = self._leased.pop(id(driver), None)
+            if browser is None:
+                return
+            if (browser.generation != self._generation or browser.uses >= self.max_uses
+                    or (self.should_recycle is not None and self.should_recycle(driver))):
+                self._stats.recycled += 1
+                self._quit(driver)
+            elif not self.is_alive(driver):
+                self._stats.dead += 1
+                self._quit(driver)
+            else:
+                browser.idle_since = time.monotonic()
+                self._idle.append(browser)
+            self._cond.notify()
+
+    @contextmanager
+    def leased(self, seed=None, timeout: Optional[float] = None):
+        driver = self.lease(seed, timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self):
+        """Quit every idle browser now and every leased one when it is released (e.g. after logout)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._generation += 1
+        for browser in idle:
+            self._quit(browser.driver)
+
+    def stats(self) -> PoolStats:
+        with self._cond:
+            return PoolStats(launched=self._stats.launched, reused=self._stats.reused,
+                             recycled=self._stats.recycled, dead=self._stats.dead,
+                             idle=len(self._idle), leased=len(self._leased))
@@ -0,0 +1,232 @@
+"""
+Fixed pool of reusable Chrome profiles for the login browser, plus cleanup.
+
+Every login used to create a new ``MoScraper_<timestamp>_<id>`` user data
+directory and never delete it, so each browser started cold (empty HTTP
+cache, no service workers) and old profiles piled up on disk. Instead,
+:class:`ProfilePool` hands out one of ``size`` fixed ``MoScraper_pool_<n>``
+directories, guarded by a lock file so two live browsers never share one,
+and :func:`gc_profiles` prunes stale ``MoScraper_*`` directories by age and
+total size.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PROFILE_PREFIX = "MoScraper_"
+POOL_PREFIX = "MoScraper_pool_"
+LOCK_NAME = "moscraper.lock"
+# Cache directories inside a profile that are safe to drop (cookies and logins live elsewhere)
+CACHE_SUBDIRS = [os.path.join("Default", name) for name in ("Cache", "Code Cache", "GPUCache", "Service Worker")]
+
+# Locks taken by this process, to tell our own live leases from ones leaked by an earlier run
+_held_locks = set()
+_held_lock = threading.Lock()
+
+
+@dataclass
+class ProfileLease:
+    """A profile directory reserved for one browser until release()."""
+    path: str
+    lock_path: str = ""
+    pooled: bool = True
+
+
+@dataclass
+class GCReport:
+    removed: List[str] = field(default_factory=list)
+    caches_cleared: List[str] = field(default_factory=list)
+    freed_bytes: int = 0
+    remaining_bytes: int = 0
+
+    @property
+    def freed_mb(self) -> float:
+        return self.freed_bytes / (1024 * 1024)
+
+
+def _pid_alive(pid: int) -> Optional[bool]:
+    """True/False when we can tell, None when we can't (no psutil on Windows)."""
+    if psutil is not None:
+        return psutil.pid_exists(pid)
+    if os.name == "nt":
+        # os.kill on Windows terminates the process instead of probing it
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _lock_is_stale(lock_path: str, max_lock_age: float) -> bool:
+    try:
+        with open(lock_path, encoding="utf-8") as fh:
+            info = json.load(fh)
+    except (OSError, ValueError):
+        # Unreadable or half-written: only stale once it is old
+        try:
+            return time.time() - os.path.getmtime(lock_path) > max_lock_age
+        except OSError:
+            return True
+    pid = int(info.get("pid") or 0)
+    if pid == os.getpid():
+        with _held_lock:
+            return lock_path not in _held_locks
+    alive = _pid_alive(pid)
+    if alive is None:
+        return time.time() - float(info.get("created") or 0) > max_lock_age
+    return not alive
+
+
+def _try_lock(lock_path: str, max_lock_age: float) -> bool:
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not _lock_is_stale(lock_path, max_lock_age):
+                return False
+            try:
+                os.remove(lock_path)
+            except OSError:
+                return False
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump({"pid": os.getpid(), "created": time.time()}, fh)
+        with _held_lock:
+            _held_locks.add(lock_path)
+        return True
+    return False
+
+
+def is_locked(profile_dir: str, max_lock_age: float = 12 * 3600) -> bool:
+    """Whether a live browser (in this or another process) holds the profile."""
+    lock_path = os.path.join(profile_dir, LOCK_NAME)
+    return os.path.exists(lock_path) and not _lock_is_stale(lock_path, max_lock_age)
+
+
+class ProfilePool:
+    """
+    ``size`` reusable profile directories under ``base_dir``
+
+    Args:
+        base_dir: Parent directory for the profiles
+        size: Number of pooled profiles; when all are taken a throwaway one is created
+        max_lock_age: Seconds after which a lock whose owner can't be checked is treated as stale
+    """
+
+    def __init__(self, base_dir: str, size: int = 4, max_lock_age: float = 12 * 3600):
+        self.base_dir = base_dir
+        self.size = size
+        self.max_lock_age = max_lock_age
+
+    def acquire(self) -> ProfileLease:
+        """Lock the first free pooled profile (warm cache); a fresh temporary one if all are busy."""
+        os.makedirs(self.base_dir, exist_ok=True)
+        for index in range(self.size):
+            path = os.path.join(self.base_dir, f"{POOL_PREFIX}{index}")
+            os.makedirs(path, exist_ok=True)
+            lock_path = os.path.join(path, LOCK_NAME)
+            if _try_lock(lock_path, self.max_lock_age):
+                os.utime(path)
+                return ProfileLease(path=path, lock_path=lock_path)
+        path = os.path.join(self.base_dir, f"{PROFILE_PREFIX}{int(time.time())}_{uuid.uuid4().hex[:8]}")
+        os.makedirs(path, exist_ok=True)
+        return ProfileLease(path=path, pooled=False)
+
+    @staticmethod
+    def release(lease: Optional[ProfileLease]):
+        """Unlock a pooled profile (kept for the next browser) or delete a temporary one."""
+        if lease is None:
+            return
+        if not lease.pooled:
+            shutil.rmtree(lease.path, ignore_errors=True)
+            return
+        with _held_lock:
+            _held_locks.discard(lease.lock_path)
+        try:
+            os.remove(lease.lock_path)
+        except OSError:
+            pass
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def gc_profiles(base_dir: str, max_age_days: float = 7, max_total_mb: float = 2048,
+                max_lock_age: float = 12 * 3600) -> GCReport:
+    """
+    Delete stale ``MoScraper_*`` profiles and keep the rest under a size budget
+
+    Unpooled profiles older than ``max_age_days`` are removed. If the total is
+    still over ``max_total_mb``, the oldest unpooled profiles go next, then the
+    HTTP/code caches of the least recently used pooled profiles. Locked
+    profiles are never touched.
+
+    Returns:
+        GCReport: What was removed and how many bytes it freed
+    """
+    report = GCReport()
+    if not os.path.isdir(base_dir):
+        return report
+    now = time.time()
+    entries = []
+    for entry in os.scandir(base_dir):
+        if not entry.is_dir(follow_symlinks=False) or not entry.name.startswith(PROFILE_PREFIX):
+            continue
+        if is_locked(entry.path, max_lock_age):
+            report.remaining_bytes += _dir_size(entry.path)
+            continue
+        entries.append((entry.stat().st_mtime, entry.name.startswith(POOL_PREFIX), entry.path, _dir_size(entry.path)))
+    entries.sort()
+
+    kept = []
+    for mtime, pooled, path, size in entries:
+        if not pooled and now - mtime > max_age_days * 86400:
+            shutil.rmtree(path, ignore_errors=True)
+            report.removed.append(path)
+            report.freed_bytes += size
+        else:
+            kept.append((mtime, pooled, path, size))
+
+    budget = max_total_mb * 1024 * 1024
+    total = report.remaining_bytes + sum(size for *_, size in kept)
+    for mtime, pooled, path, size in kept:
+        if total <= budget:
+            break
+        if not pooled:
+            shutil.rmtree(path, ignore_errors=True)
+            report.removed.append(path)
+            freed = size
+        else:
+            freed = 0
+            for sub in CACHE_SUBDIRS:
+                cache = os.path.join(path, sub)
+                if os.path.isdir(cache):
+                    freed += _dir_size(cache)
+                    shutil.rmtree(cache, ignore_errors=True)
+            report.caches_cleared.append(path)
+        report.freed_bytes += freed
+        total -= freed
+    report.remaining_bytes = total
+    return report
@@ -0,0 +1,124 @@
+"""
+Post content reduction before it goes into an LLM prompt.
+
+Scraped rows can carry the whole post HTML (``raw_content`` in debug mode)
+or text polluted with LinkedIn UI chrome. This stage turns either into
+plain text, drops the chrome, and caps it at a token budget, recording how
+many tokens that saved per row.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+
+from bs4 import BeautifulSoup
+
+CHARS_PER_TOKEN = 4.0
+DEFAULT_MAX_TOKENS = 600
+
+_HTML_TAG = re.compile(r"<\s*/?\s*[a-zA-Z][^>]*>")
+_COUNTER = r"\d[\d,.]*[ \t]*[KkMm]?[ \t]+(?:reactions?|comments?|reposts?|likes?|followers?|views?|impressions?)"
+_CHROME_PATTERNS = [
+    # "…see more" / "…more" closing a truncated post, and toggles left on a line of their own;
+    # anchored to line ends so "we want to see more growth" survives
+    re.compile(r"[ \t]*(?:…|\.\.\.)[ \t]*(?:(?:see|show)[ \t]+)?more[ \t]*$", re.IGNORECASE | re.MULTILINE),
+    re.compile(r"^[ \t]*(?:see|show) (?:more|less|translation)[ \t]*$", re.IGNORECASE | re.MULTILINE),
+    # Reaction / comment / repost / follower counters, only on a line of their own ("56 comments • 3 reposts"),
+    # so "grew 200 followers this week" survives
+    re.compile(r"^[ \t]*(?:" + _COUNTER + r"[ \t]*[•·,]?[ \t]*)+$", re.IGNORECASE | re.MULTILINE),
+    # Action bar and header badges
+    re.compile(r"\b(?:Like|Celebrate|Support|Love|Insightful|Funny)\s+Comment\s+(?:Repost|Share)(?:\s+Send)?\b"),
+    re.compile(r"\bVisible to anyone on or off LinkedIn\b", re.IGNORECASE),
+    # Connection degree next to the author ("Jane Doe • 2nd"); only after a bullet, never "1st place"
+    re.compile(r"•[ \t]*(?:1st|2nd|3rd\+?)(?:[ \t]+degree connection)?(?!\w)[ \t]*•?"),
+    # Post age at the start of the header line ("3d • Edited •"), and the "Promoted" label on its own line
+    re.compile(r"^[ \t]*\d+[ \t]*(?:s|m|h|d|w|mo|yr)[ \t]*•[ \t]*(?:Edited[ \t]*•[ \t]*)?", re.MULTILINE),
+    re.compile(r"^[ \t]*Promoted[ \t]*$", re.MULTILINE),
+    re.compile(r"\+[ \t]*Follow\b"),
+]
+# Two or more hashtags in a row (LinkedIn renders them as "hashtag#foo")
+_HASHTAG_RUN = re.compile(r"(?:(?:hashtag)?#[\w-]+[\s,]*){2,}", re.IGNORECASE)
+_HASHTAG_PREFIX = re.compile(r"\bhashtag(?=#)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token), matching the request scheduler."""
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+
+def html_to_text(markup: str) -> str:
+    """Visible text of an HTML fragment; plain text passes through unchanged."""
+    if not _HTML_TAG.search(markup):
+        return markup
+    soup = BeautifulSoup(markup, "html.parser")
+    for tag in soup(["script", "style", "svg", "button", "img", "noscript"]):
+        tag.decompose()
+    return soup.get_text(separator=" ")
+
+
+def strip_linkedin_chrome(text: str) -> str:
+    """
+    Drop "…see more", counters, action bars and hashtag lists, then collapse whitespace
+
+    Chrome is only matched where LinkedIn renders it (its own line, after a bullet,
+    at the end of the text), so the same words inside the post body are kept:
+
+    >>> strip_linkedin_chrome("Promoted\\nOur team grew 200 followers this week and 1,000 views\\n56 comments • 3 reposts")
+    'Our team grew 200 followers this week and 1,000 views'
+    >>> strip_linkedin_chrome("3d • Excited to share I was Promoted to VP of Sales!")
+    'Excited to share I was Promoted to VP of Sales!'
+    """
+    for pattern in _CHROME_PATTERNS:
+        text = pattern.sub(" ", text)
+    text = _HASHTAG_RUN.sub(" ", text)
+    text = _HASHTAG_PREFIX.sub("", text)
+    lines = [_WHITESPACE.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` to about ``max_tokens``, preferring a sentence or word boundary."""
+    limit = int(max_tokens * CHARS_PER_TOKEN)
+    if not max_tokens or len(text) <= limit:
+        return text
+    cut = text[:limit]
+    boundary = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "), cut.rfind("\n"))
+    if boundary < limit // 2:
+        boundary = cut.rfind(" ")
+    return (cut[:boundary + 1] if boundary > 0 else cut).rstrip() + " …"
+
+
+@dataclass
+class CleanedContent:
+    """Prompt-ready post text plus what the reduction saved."""
+    text: str
+    tokens_before: int
+    tokens_after: int
+    truncated: bool = False
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_before - self.tokens_after)
+
+
+def clean_post_content(content, raw_content="", max_tokens: int = DEFAULT_MAX_TOKENS) -> CleanedContent:
+    """
+    Build the LLM context for one row
+
+    Args:
+        content: Extracted post text (preferred when present)
+        raw_content: Post HTML, used when there is no extracted text
+        max_tokens: Token budget for the cleaned text; 0 disables truncation
+
+    Returns:
+        CleanedContent: ``tokens_before`` measures what used to be sent, i.e. raw_content when set
+    """
+    content = content if isinstance(content, str) else ""
+    raw_content = raw_content if isinstance(raw_content, str) else ""
+    original = raw_content or content
+    text = strip_linkedin_chrome(html_to_text(content.strip() or raw_content))
+    reduced = truncate_to_tokens(text, max_tokens)
+    return CleanedContent(text=reduced, tokens_before=estimate_tokens(original),
+                          tokens_after=estimate_tokens(reduced), truncated=reduced != text)
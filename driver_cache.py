@@ -0,0 +1,329 @@
+"""
+Pinned chromedriver binaries and timed browser launches.
+
+``ChromeDriverManager().install()`` looks up the matching driver version
+online on every call, and ``uc.Chrome()`` re-downloads and re-patches its
+own copy each launch. Here the driver is resolved once per installed Chrome
+major version, recorded in a small JSON manifest, and reused from then on,
+so launches need no network once warmed. undetected-chromedriver gets its own
+copy of the binary, which it patches in place the first time and then reuses
+as is. When the Chrome version can't be detected nothing is pinned.
+
+Keyword workers launch browsers from separate processes, so manifest writes
+and the uc copy happen under a lock file in the cache directory rather than
+a thread lock.
+
+Chrome updates itself while the server keeps running. A launch the pinned
+driver refuses (``SessionNotCreatedException``) drops that pin, detects the
+version again and retries once on a freshly resolved driver.
+
+Every launch records how long driver resolution, process spawn and the
+first navigation took (:class:`LaunchTimings`).
+"""
+
+import copy
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+DRIVER_CACHE_DIR = os.path.join(".moscraper_cache", "drivers")
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".manifest.lock"
+# A driver download that takes longer than this means the lock holder is stuck
+LOCK_MAX_AGE = 300.0
+
+_chrome_version: Optional[str] = None
+_history_lock = threading.Lock()
+_launch_history = deque(maxlen=50)
+
+
+@dataclass
+class LaunchTimings:
+    """Where the seconds of one browser launch went."""
+    kind: str = "chrome"
+    chrome_version: str = ""
+    driver_cached: bool = False
+    resolve_seconds: float = 0.0
+    spawn_seconds: float = 0.0
+    first_navigation_seconds: float = 0.0
+    started_at: str = ""
+
+    @property
+    def total_seconds(self) -> float:
+        return self.resolve_seconds + self.spawn_seconds + self.first_navigation_seconds
+
+    def navigate(self, driver, url: str):
+        """driver.get(url); the first call is recorded as this launch's first navigation."""
+        started = time.perf_counter()
+        try:
+            driver.get(url)
+        finally:
+            if not self.first_navigation_seconds:
+                self.first_navigation_seconds = time.perf_counter() - started
+
+
+def _version_commands() -> List[List[str]]:
+    system = platform.system()
+    if system == "Darwin":
+        return [["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome", "--version"]]
+    if system == "Windows":
+        return [["reg", "query", r"HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon", "/v", "version"],
+                ["reg", "query", r"HKEY_LOCAL_MACHINE\Software\Google\Chrome\BLBeacon", "/v", "version"]]
+    return [[name, "--version"] for name in ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser")]
+
+
+def installed_chrome_version() -> str:
+    """Full version of the local Chrome (e.g. '131.0.6778.86'), or '' if it can't be found. Cached per process."""
+    global _chrome_version
+    if _chrome_version is not None:
+        return _chrome_version
+    version = ""
+    for command in _version_commands():
+        try:
+            output = subprocess.run(command, capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = re.search(r"(\d+)\.\d+\.\d+\.\d+", output)
+        if match:
+            version = match.group(0)
+            break
+    _chrome_version = version
+    return version
+
+
+def _major(version: str) -> str:
+    return version.split(".", 1)[0] if version else ""
+
+
+def _manifest_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, MANIFEST_NAME)
+
+
+def _lock_is_stale(lock_path: str) -> bool:
+    try:
+        with open(lock_path, encoding="utf-8") as fh:
+            info = json.load(fh)
+    except (OSError, ValueError):
+        # Unreadable or half-written: only stale once it is old
+        try:
+            return time.time() - os.path.getmtime(lock_path) > LOCK_MAX_AGE
+        except OSError:
+            return True
+    if time.time() - float(info.get("created") or 0) > LOCK_MAX_AGE:
+        return True
+    pid = int(info.get("pid") or 0)
+    if os.name == "nt" or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+@contextmanager
+def _cache_lock(cache_dir: str, poll: float = 0.1):
+    """Hold the cache directory's lock file; shared by threads and worker processes alike."""
+    os.makedirs(cache_dir, exist_ok=True)
+    lock_path = os.path.join(cache_dir, LOCK_NAME)
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if _lock_is_stale(lock_path):
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+                continue
+            time.sleep(poll)
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        json.dump({"pid": os.getpid(), "created": time.time()}, fh)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+def load_manifest(cache_dir: str = DRIVER_CACHE_DIR) -> Dict[str, dict]:
+    try:
+        with open(_manifest_path(cache_dir), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest: Dict[str, dict], cache_dir: str):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{_manifest_path(cache_dir)}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp, _manifest_path(cache_dir))
+
+
+def resolve_chromedriver(chrome_version: str = "", cache_dir: str = DRIVER_CACHE_DIR):
+    """
+    Path to a chromedriver for the installed Chrome, resolved online only on a manifest miss
+
+    Args:
+        chrome_version: Installed Chrome version; detected when empty
+        cache_dir: Where the manifest lives
+
+    Returns:
+        tuple: (chromedriver path, True when it came from the manifest)
+    """
+    from webdriver_manager.chrome import ChromeDriverManager
+    major = _major(chrome_version or installed_chrome_version())
+    if not major:
+        # Nothing to key a pin on; let webdriver_manager pick the driver every time
+        return ChromeDriverManager().install(), False
+    with _cache_lock(cache_dir):
+        entry = load_manifest(cache_dir).get(major) or {}
+        path = entry.get("chromedriver")
+        if path and os.path.exists(path):
+            return path, True
+        path = ChromeDriverManager().install()
+        manifest = load_manifest(cache_dir)
+        manifest[major] = {**manifest.get(major, {}), "chromedriver": path,
+                           "resolved_at": datetime.now().isoformat(timespec="seconds")}
+        _save_manifest(manifest, cache_dir)
+        return path, False
+
+
+def uc_driver_path(chrome_version: str = "", cache_dir: str = DRIVER_CACHE_DIR):
+    """
+    A chromedriver copy reserved for undetected-chromedriver
+
+    uc patches the binary it is given in place and skips the patch when it is
+    already patched, so handing it the same copy every time skips both its
+    download and its re-patching.
+
+    Returns:
+        tuple: (path, True when the copy already existed); path is None when the
+        Chrome version is unknown, leaving uc to fetch its own driver
+    """
+    major = _major(chrome_version or installed_chrome_version())
+    if not major:
+        return None, False
+    name = "chromedriver.exe" if platform.system() == "Windows" else "chromedriver"
+    path = os.path.abspath(os.path.join(cache_dir, f"uc-{major}", name))
+    if os.path.exists(path):
+        return path, True
+    source, _ = resolve_chromedriver(chrome_version, cache_dir)
+    with _cache_lock(cache_dir):
+        # Another worker may have made the copy while we waited for the lock
+        if os.path.exists(path):
+            return path, True
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        shutil.copy2(source, tmp)
+        os.replace(tmp, path)
+        manifest = load_manifest(cache_dir)
+        manifest.setdefault(major, {})["uc_driver"] = path
+        _save_manifest(manifest, cache_dir)
+    return path, False
+
+
+def forget_pinned_driver(chrome_version: str, cache_dir: str = DRIVER_CACHE_DIR):
+    """Drop the manifest entry and uc copy pinned for ``chrome_version``'s major, and forget the detected version."""
+    global _chrome_version
+    _chrome_version = None
+    major = _major(chrome_version)
+    if not major or not os.path.exists(cache_dir):
+        return
+    with _cache_lock(cache_dir):
+        manifest = load_manifest(cache_dir)
+        if manifest.pop(major, None) is not None:
+            _save_manifest(manifest, cache_dir)
+        shutil.rmtree(os.path.join(cache_dir, f"uc-{major}"), ignore_errors=True)
+
+
+def record_launch(timings: LaunchTimings):
+    with _history_lock:
+        _launch_history.append(timings)
+
+
+def launch_history() -> List[LaunchTimings]:
+    """Most recent launches first."""
+    with _history_lock:
+        return list(reversed(_launch_history))
+
+
+def launch_chrome(options, use_uc: bool = False, cache_dir: str = DRIVER_CACHE_DIR):
+    """
+    Start Chrome on the pinned driver, timing the resolve and spawn phases
+
+    Args:
+        options: ChromeOptions for the new browser
+        use_uc: Launch through undetected-chromedriver
+        cache_dir: Driver cache / manifest directory
+
+    Returns:
+        tuple: (driver, LaunchTimings); call ``timings.navigate(driver, url)`` for the first page load
+    """
+    from selenium.common.exceptions import SessionNotCreatedException
+    # uc refuses an options object it has already been started with
+    retry_options = copy.deepcopy(options)
+    try:
+        return _launch(options, use_uc, cache_dir)
+    except SessionNotCreatedException:
+        # Most likely Chrome updated under a driver pinned for the old version
+        forget_pinned_driver(installed_chrome_version(), cache_dir)
+        return _launch(retry_options, use_uc, cache_dir)
+
+
+def _launch(options, use_uc: bool, cache_dir: str):
+    version = installed_chrome_version()
+    timings = LaunchTimings(kind="uc" if use_uc else "chrome", chrome_version=version,
+                            started_at=datetime.now().isoformat(timespec="seconds"))
+    started = time.perf_counter()
+    if use_uc:
+        path, timings.driver_cached = uc_driver_path(version, cache_dir)
+    else:
+        path, timings.driver_cached = resolve_chromedriver(version, cache_dir)
+    timings.resolve_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if use_uc:
+        import undetected_chromedriver as uc
+        major = int(_major(version)) if version else None
+        driver = uc.Chrome(options=options, driver_executable_path=path, version_main=major)
+    else:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        driver = webdriver.Chrome(service=Service(path), options=options)
+    timings.spawn_seconds = time.perf_counter() - started
+    record_launch(timings)
+    return driver, timings
+
+
+def clear_driver_cache(cache_dir: str = DRIVER_CACHE_DIR) -> bool:
+    """Forget pinned drivers so the next launch resolves them again. Returns whether anything was removed."""
+    global _chrome_version
+    _chrome_version = None
+    if not os.path.exists(cache_dir):
+        return False
+    shutil.rmtree(cache_dir)
+    return True
+
+
+def timings_summary(timings: LaunchTimings) -> Dict[str, float]:
+    row = asdict(timings)
+    row["total_seconds"] = round(timings.total_seconds, 2)
+    return row
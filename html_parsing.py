@@ -0,0 +1,221 @@
+"""
+Pluggable HTML backends for parsing scraped LinkedIn posts.
+
+All backends pull the same fields out of a post node with selectors
+compiled once at import time:
+
+- author: ``span[class*=actor__name]``
+- profile link: the first ``a[href*="/in/"]``
+- content: the first non-empty of ``update-components-text``,
+  ``feed-shared-text`` and ``feed-shared-update-v2``, else the whole post
+
+selectolax and lxml are much faster than BeautifulSoup's pure-Python
+``html.parser``; they are optional, and :func:`get_post_parser` falls back
+to ``html.parser`` when neither is installed.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Type
+
+AUTHOR_CSS = 'span[class*="actor__name"]'
+PROFILE_LINK_CSS = 'a[href*="/in/"]'
+CONTENT_CSS = [
+    'span[class*="update-components-text"]',
+    'div[class*="feed-shared-text"]',
+    'div[class*="feed-shared-update-v2"]',
+]
+POST_CSS = 'div[data-urn]'
+
+
+@dataclass
+class ParsedPost:
+    """The fields the scraper needs from one post node."""
+    urn: str = ""
+    author: str = "Unknown"
+    profile_url: str = ""
+    content: str = ""
+
+
+def absolute_profile_url(href: str) -> str:
+    if href and not href.startswith('http'):
+        return f"https://www.linkedin.com{href}"
+    return href or ""
+
+
+class PostParser:
+    """Backend interface: parse one post fragment, or every post on a page."""
+
+    name = "base"
+
+    def parse_post(self, html: str) -> ParsedPost:
+        raise NotImplementedError
+
+    def parse_page(self, html: str) -> List[ParsedPost]:
+        raise NotImplementedError
+
+
+class SoupPostParser(PostParser):
+    """BeautifulSoup + ``html.parser``; always available."""
+
+    name = "html.parser"
+
+    def __init__(self):
+        import soupsieve
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup
+        self._author = soupsieve.compile(AUTHOR_CSS)
+        self._profile = soupsieve.compile(PROFILE_LINK_CSS)
+        self._content = [soupsieve.compile(css) for css in CONTENT_CSS]
+        self._post = soupsieve.compile(POST_CSS)
+
+    def _parse_node(self, node) -> ParsedPost:
+        post = ParsedPost(urn=node.get('data-urn', ''))
+        author = self._author.select_one(node)
+        if author is not None:
+            post.author = author.get_text(strip=True) or post.author
+        link = self._profile.select_one(node)
+        if link is not None:
+            post.profile_url = absolute_profile_url(link.get('href', ''))
+        for selector in self._content:
+            elem = selector.select_one(node)
+            if elem is not None and elem.get_text(strip=True):
+                post.content = elem.get_text(strip=True)
+                break
+        if not post.content:
+            post.content = node.get_text(separator=' ', strip=True)
+        return post
+
+    def parse_post(self, html: str) -> ParsedPost:
+        soup = self._soup(html, 'html.parser')
+        node = self._post.select_one(soup) or soup
+        return self._parse_node(node)
+
+    def parse_page(self, html: str) -> List[ParsedPost]:
+        soup = self._soup(html, 'html.parser')
+        return [self._parse_node(node) for node in self._post.select(soup)]
+
+
+class LxmlPostParser(PostParser):
+    """lxml with XPath expressions precompiled from the shared selectors."""
+
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import etree, html as lxml_html
+        self._fromstring = lxml_html.fromstring
+        self._document_fromstring = lxml_html.document_fromstring
+        self._author = etree.XPath("(.//span[contains(@class, 'actor__name')])[1]")
+        self._profile = etree.XPath("(.//a[contains(@href, '/in/')])[1]")
+        self._content = [
+            etree.XPath("(.//span[contains(@class, 'update-components-text')])[1]"),
+            etree.XPath("(.//div[contains(@class, 'feed-shared-text')])[1]"),
+            etree.XPath("(.//div[contains(@class, 'feed-shared-update-v2')])[1]"),
+        ]
+        self._posts = etree.XPath("//div[@data-urn]")
+        self._post_self = etree.XPath("descendant-or-self::div[@data-urn][1]")
+
+    @staticmethod
+    def _text(node, separator: str = "") -> str:
+        return separator.join(t.strip() for t in node.itertext() if t.strip())
+
+    def _parse_node(self, node) -> ParsedPost:
+        post = ParsedPost(urn=node.get('data-urn', ''))
+        author = self._author(node)
+        if author:
+            post.author = self._text(author[0]) or post.author
+        link = self._profile(node)
+        if link:
+            post.profile_url = absolute_profile_url(link[0].get('href', ''))
+        for selector in self._content:
+            elem = selector(node)
+            if elem:
+                text = self._text(elem[0])
+                if text:
+                    post.content = text
+                    break
+        if not post.content:
+            post.content = self._text(node, ' ')
+        return post
+
+    def parse_post(self, html: str) -> ParsedPost:
+        root = self._fromstring(html)
+        nodes = self._post_self(root)
+        return self._parse_node(nodes[0] if nodes else root)
+
+    def parse_page(self, html: str) -> List[ParsedPost]:
+        return [self._parse_node(node) for node in self._posts(self._document_fromstring(html))]
+
+
+class SelectolaxPostParser(PostParser):
+    """selectolax (lexbor engine): a C parser with native CSS matching."""
+
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser = LexborHTMLParser
+
+    @staticmethod
+    def _first_descendant(node, css: str):
+        # Lexbor matches the node itself too; the other backends only search below it
+        for elem in node.css(css):
+            if elem.mem_id != node.mem_id:
+                return elem
+        return None
+
+    def _parse_node(self, node) -> ParsedPost:
+        post = ParsedPost(urn=node.attributes.get('data-urn') or '')
+        author = self._first_descendant(node, AUTHOR_CSS)
+        if author is not None:
+            post.author = author.text(strip=True) or post.author
+        link = self._first_descendant(node, PROFILE_LINK_CSS)
+        if link is not None:
+            post.profile_url = absolute_profile_url(link.attributes.get('href') or '')
+        for css in CONTENT_CSS:
+            elem = self._first_descendant(node, css)
+            if elem is not None:
+                text = elem.text(strip=True)
+                if text:
+                    post.content = text
+                    break
+        if not post.content:
+            post.content = node.text(separator=' ', strip=True)
+        return post
+
+    def parse_post(self, html: str) -> ParsedPost:
+        tree = self._parser(html)
+        node = tree.css_first(POST_CSS) or tree.body
+        return self._parse_node(node)
+
+    def parse_page(self, html: str) -> List[ParsedPost]:
+        return [self._parse_node(node) for node in self._parser(html).css(POST_CSS)]
+
+
+BACKENDS: Dict[str, Type[PostParser]] = {
+    "selectolax": SelectolaxPostParser,
+    "lxml": LxmlPostParser,
+    "html.parser": SoupPostParser,
+}
+
+
+def available_backends() -> List[str]:
+    """Backends whose library imports, fastest first."""
+    names = []
+    for name, backend in BACKENDS.items():
+        try:
+            backend()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_post_parser(preferred: Optional[str] = None) -> PostParser:
+    """The preferred backend if it can be loaded, otherwise the fastest available one."""
+    order = ([preferred] if preferred in BACKENDS else []) + [n for n in BACKENDS if n != preferred]
+    for name in order:
+        try:
+            return BACKENDS[name]()
+        except ImportError:
+            continue
+    raise ImportError("No HTML parser backend available; install beautifulsoup4")
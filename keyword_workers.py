@@ -0,0 +1,507 @@
+"""
+Keyword scraping, in the script thread or in parallel worker processes.
+
+:func:`scrape_keyword_page` is the scroll-expand-extract-parse loop for one
+keyword's search page. It reports through callbacks and never touches
+Streamlit, so the sequential path runs it on the logged-in browser and the
+worker processes run it unchanged.
+
+Parallel Fast Mode used to run that loop on a ThreadPoolExecutor whose
+threads rendered results and read ``st.session_state`` off the script thread,
+with all of their parsing fighting over one GIL. :class:`KeywordWorkerPool`
+runs it in separate processes instead. Each worker owns its browser (kept warm
+between keywords and runs by a one-slot :class:`BrowserPool`), parses its own
+posts, and sends finished records back over its own pipe. The Streamlit
+script thread is the only consumer, so it alone renders and aggregates.
+"""
+
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import random
+import re
+import signal
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+
+from selenium.common.exceptions import NoSuchWindowException
+
+from browser_pool import BrowserPool
+from driver_cache import launch_chrome, timings_summary
+from html_parsing import get_post_parser
+from network_capture import capture_search, enable_performance_logging
+from page_scripts import ExpansionResult, collect_new_posts, expand_collapsed_posts, scroll_and_wait
+from process_supervisor import ProcessSupervisor
+from resource_profiles import apply_profile, measure_page
+
+EMAIL_REGEX = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+# Regex for website URLs
+URL_REGEX = re.compile(r'(https?://[\w\.-]+(?:/[\w\.-]*)*|www\.[\w\.-]+(?:/[\w\.-]*)*)', re.IGNORECASE)
+
+# Fixed sleep the old per-post "see more" clicks took, for reporting what the bulk expander saves
+KEYWORD_SEE_MORE_SLEEP = 0.5
+COOKIE_FIELDS = ['name', 'value', 'domain', 'path', 'expiry', 'secure', 'httpOnly', 'sameSite']
+
+
+def post_record(author, profile_url, content, raw_content, keyword):
+    """One scraped post in the results schema, with emails and websites pulled from its text."""
+    return {
+        'author': author,
+        'profile_url': profile_url,
+        'post_emails': ', '.join(set(EMAIL_REGEX.findall(content))),
+        'websites': ', '.join(set(URL_REGEX.findall(content))),
+        'content': content,
+        'raw_content': raw_content,
+        'keyword': keyword
+    }
+
+
+def search_url(keyword: str) -> str:
+    return f"https://www.linkedin.com/search/results/content/?keywords={keyword.replace(' ', '%20')}&sortBy=date_posted"
+
+
+@dataclass
+class KeywordJob:
+    """How to scrape each keyword's search page (the scrape form's settings)."""
+    max_posts: int = 30
+    max_scrolls: int = 20
+    delay: float = 2.0
+    scroll_floor: float = 0.5
+    resource_profile: str = "full"
+    network_capture: bool = False
+    keep_raw: bool = False
+
+
+@dataclass
+class BrowserSetup:
+    """What a worker needs to launch a logged-in browser of its own."""
+    cookies: List[dict] = field(default_factory=list)
+    user_agents: List[str] = field(default_factory=list)
+    use_uc: bool = False
+    network_logging: bool = False
+    memory_ceiling_mb: float = 0
+    max_uses: int = 20
+    max_idle_seconds: float = 1800.0
+
+
+@dataclass
+class WorkerMessage:
+    """
+    One event from a worker process
+
+    ``kind`` is 'record' (data: post record), 'log' (data: message),
+    'launch' (data: LaunchTimings fields), 'done' (data: {'posts', 'metrics'}),
+    'error' (data: message) or 'skipped' (the run was cancelled first).
+    """
+    run_id: int
+    kind: str
+    keyword: str = ""
+    data: object = None
+    worker_id: int = 0
+
+
+# Kinds that finish a keyword
+FINAL_KINDS = ("done", "error", "skipped")
+
+
+def scraping_options(user_agent: str = "", network_logging: bool = False):
+    """ChromeOptions for an extra (non-login) scraping browser."""
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    if user_agent:
+        options.add_argument(f'user-agent={user_agent}')
+    if network_logging:
+        enable_performance_logging(options)
+    return options
+
+
+def load_cookies(driver, cookies: List[dict], launch_timings=None):
+    """Log a fresh browser in with another session's cookies."""
+    if launch_timings is not None:
+        launch_timings.navigate(driver, "https://www.linkedin.com")
+    else:
+        driver.get("https://www.linkedin.com")
+    for cookie in cookies:
+        cookie_dict = {k: v for k, v in cookie.items() if k in COOKIE_FIELDS}
+        if 'expiry' in cookie_dict and cookie_dict['expiry'] is not None:
+            cookie_dict['expiry'] = int(cookie_dict['expiry'])
+        try:
+            driver.add_cookie(cookie_dict)
+        except Exception:
+            pass
+    driver.refresh()
+
+
+def is_driver_alive(driver) -> bool:
+    try:
+        _ = driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+def scrape_keyword_page(driver, keyword: str, job: KeywordJob, parser, on_record: Callable[[dict], None],
+                        should_stop: Callable[[], bool] = lambda: False,
+                        log: Callable[[str], None] = print):
+    """
+    Scroll one keyword's search results and turn new posts into records
+
+    Args:
+        driver: Logged-in WebDriver
+        keyword: Search keyword
+        job: Scrape settings
+        parser: PostParser from html_parsing
+        on_record: Called with each record as soon as it is parsed
+        should_stop: Polled between scrolls and posts; True ends the keyword early
+        log: Diagnostic lines ([SCROLL TIMING], [PAGE METRICS], errors)
+
+    Returns:
+        tuple: (records, PageMetrics or None)
+    """
+    records = []
+
+    def add(record):
+        records.append(record)
+        on_record(record)
+
+    try:
+        apply_profile(driver, job.resource_profile)
+    except Exception as e:
+        log(f"[WARN] Could not apply resource profile '{job.resource_profile}': {e}")
+
+    if job.network_capture:
+        def on_posts(batch):
+            for post in batch[:job.max_posts - len(records)]:
+                add(post_record(post.author, post.profile_url, post.content, '', keyword))
+
+        posts = capture_search(driver, search_url(keyword), max_scrolls=job.max_scrolls, wait=max(job.delay, 1.0),
+                               on_posts=on_posts, should_stop=lambda: len(records) >= job.max_posts or should_stop())
+        log(f"[NETWORK CAPTURE] {keyword}: {len(posts)} posts from voyager responses, kept {len(records)}")
+    else:
+        try:
+            driver.get(search_url(keyword))
+        except NoSuchWindowException:
+            log(f"[ERROR] Browser window closed for keyword: {keyword}")
+            return records, None
+        time.sleep(job.delay)
+        _scroll_keyword(driver, keyword, job, parser, add, should_stop, log)
+
+    try:
+        metrics = measure_page(driver, job.resource_profile)
+    except Exception as e:
+        log(f"[WARN] Could not read page metrics for {keyword}: {e}")
+        return records, None
+    log(f"[PAGE METRICS] {keyword} ({job.resource_profile}): {metrics.megabytes:.2f} MB in {metrics.resources} requests, "
+        f"DOM ready {metrics.dom_ready_ms:.0f} ms, load {metrics.load_ms:.0f} ms")
+    return records, metrics
+
+
+def _scroll_keyword(driver, kw, job, parser, add, should_stop, log):
+    posts_collected = 0
+    seen_posts = set()
+    scrolls = 0
+    last_first_ids = []
+    stale_scrolls = 0
+    while posts_collected < job.max_posts and scrolls < job.max_scrolls and not should_stop():
+        try:
+            # Random step down from where we are, to mimic human behavior; wait until new posts load
+            scroll = scroll_and_wait(driver, step=random.randint(300, 1000),
+                                     min_pause=job.scroll_floor * random.uniform(0.8, 1.2), timeout=job.delay)
+        except NoSuchWindowException:
+            log(f"[ERROR] Scroll failed for keyword: {kw}")
+            break
+        # Expand collapsed posts in view first, so their HTML is captured with the full text
+        scroll_started = time.perf_counter()
+        try:
+            expansion = expand_collapsed_posts(driver)
+        except NoSuchWindowException:
+            log(f"[ERROR] See-more expansion failed for keyword: {kw}")
+            break
+        except Exception as e:
+            log(f"[ERROR] See-more expansion failed for keyword {kw}: {e}")
+            expansion = ExpansionResult()
+        expanded_at = time.perf_counter()
+        # Only posts the expander has visited and the page hasn't handed over yet cross the wire and get parsed
+        try:
+            page_posts = collect_new_posts(driver)
+        except NoSuchWindowException:
+            log(f"[ERROR] Post extraction failed for keyword: {kw}")
+            break
+        except Exception as e:
+            log(f"[ERROR] Unexpected error during scroll/extraction: {e}")
+            break
+        extracted_at = time.perf_counter()
+        posts = []
+        for fragment in page_posts['posts']:
+            try:
+                posts.append((parser.parse_post(fragment['html']), fragment['html']))
+            except Exception as e:
+                log(f"[ERROR] Could not parse post {fragment.get('urn')}: {e}")
+        log(f"[SCROLL TIMING] {kw} scroll {scrolls+1}: {len(posts)} new of {page_posts['total']} posts, "
+            f"waited {scroll.wait_seconds:.2f}s ({scroll.reason}), "
+            f"{sum(len(f['html']) for f in page_posts['posts'])} bytes, "
+            f"{len(expansion.clicked)} expanded in {1000 * (expanded_at - scroll_started):.0f} ms "
+            f"(saved {expansion.saved_seconds(KEYWORD_SEE_MORE_SLEEP):.1f}s), "
+            f"extract {1000 * (extracted_at - expanded_at):.0f} ms, "
+            f"parse {1000 * (time.perf_counter() - extracted_at):.0f} ms")
+        if page_posts['total']:
+            first_ids = page_posts['first']
+            log(f"[DEBUG] Keyword: {kw}, Scroll: {scrolls+1}, First 3 post IDs: {first_ids}")
+            # The top of the feed never changes while scrolling, so only count it when nothing new loaded
+            if first_ids == last_first_ids and not scroll.new_posts:
+                stale_scrolls += 1
+            else:
+                stale_scrolls = 0
+            last_first_ids = first_ids
+            if stale_scrolls >= 3:
+                log(f"[INFO] Breaking scroll loop for {kw} due to repeated post IDs.")
+                break
+        for post, post_html in posts:
+            if should_stop():
+                break
+            post_id = post.urn
+            if post_id and post_id in seen_posts:
+                continue
+            seen_posts.add(post_id)
+            add(post_record(post.author, post.profile_url, post.content, post_html if job.keep_raw else '', kw))
+            posts_collected += 1
+            if posts_collected >= job.max_posts:
+                break
+        scrolls += 1
+
+
+def _worker_main(worker_id: int, conn, cancelled):
+    """Worker process loop: take (run_id, keyword, job, setup) tasks from ``conn`` until a None sentinel."""
+    # terminate() should still quit this worker's browsers on the way out
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    parser = get_post_parser()
+    supervisor = ProcessSupervisor(state_dir=None)
+    current = {'run_id': 0}
+
+    def send(run_id, kind, keyword="", data=None):
+        conn.send(WorkerMessage(run_id, kind, keyword, data, worker_id))
+
+    def launch(setup: BrowserSetup):
+        driver, timings = launch_chrome(scraping_options(random.choice(setup.user_agents or [""]),
+                                                         setup.network_logging), use_uc=setup.use_uc)
+        supervisor.register(driver, f"worker-{worker_id}")
+        load_cookies(driver, setup.cookies, timings)
+        send(current['run_id'], "launch", data=timings_summary(timings))
+        return driver
+
+    pool, pool_key = None, None
+    try:
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                break  # the pool went away
+            if task is None:
+                break
+            run_id, keyword, job, setup = task
+            current['run_id'] = run_id
+            if cancelled.value >= run_id:
+                send(run_id, "skipped", keyword)
+                continue
+            # A different browser flavour means new browsers; otherwise keep this one warm across runs
+            key = (setup.use_uc, setup.network_logging)
+            if pool is None or key != pool_key:
+                if pool is not None:
+                    pool.close()
+                pool = BrowserPool(factory=launch, is_alive=is_driver_alive, max_size=1, max_uses=setup.max_uses,
+                                   max_idle_seconds=setup.max_idle_seconds,
+                                   should_recycle=supervisor.over_ceiling, dispose=supervisor.terminate)
+                pool_key = key
+            supervisor.memory_ceiling_mb = setup.memory_ceiling_mb
+            try:
+                driver = pool.lease(seed=setup)
+            except Exception as e:
+                send(run_id, "error", keyword, f"Could not launch a browser: {e}")
+                continue
+            try:
+                records, metrics = scrape_keyword_page(
+                    driver, keyword, job, parser,
+                    on_record=lambda record: send(run_id, "record", keyword, record),
+                    should_stop=lambda: cancelled.value >= run_id,
+                    log=lambda msg: send(run_id, "log", keyword, msg))
+                send(run_id, "done", keyword, {'posts': len(records), 'metrics': asdict(metrics) if metrics else None})
+            except (BrokenPipeError, EOFError):
+                break
+            except Exception as e:
+                send(run_id, "error", keyword, str(e))
+            finally:
+                pool.release(driver)
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+@dataclass
+class _Worker:
+    process: object
+    conn: object
+    task: Optional[tuple] = None  # (run_id, keyword) it is scraping
+    stopping: bool = False  # sent a None sentinel
+
+
+class KeywordWorkerPool:
+    """
+    Long-lived worker processes that scrape keywords in parallel
+
+    Every worker has its own pipe and the pool hands out keywords itself, so
+    it always knows which keyword each worker holds, and a worker that is
+    killed (crash, OOM, supervisor) can only break its own pipe.
+
+    Args:
+        on_spawn: Called with (process, label) for each worker started, e.g. to supervise it
+        on_exit: Called with each worker process found to have exited
+        dispose: Stops a worker that didn't exit on request, browsers included; defaults to ``process.terminate()``
+    """
+
+    def __init__(self, on_spawn: Optional[Callable[[object, str], None]] = None,
+                 on_exit: Optional[Callable[[object], None]] = None,
+                 dispose: Optional[Callable[[object], None]] = None):
+        self.on_spawn = on_spawn
+        self.on_exit = on_exit
+        self.dispose = dispose
+        # spawn everywhere: forking a multi-threaded Streamlit server is unsafe
+        self._ctx = multiprocessing.get_context("spawn")
+        self._cancelled = self._ctx.Value("i", 0)
+        self._workers: Dict[int, _Worker] = {}  # worker id -> worker
+        self._worker_ids = itertools.count(1)
+        self._run_ids = itertools.count(1)
+        self._lock = threading.Lock()  # one parallel run at a time
+
+    @property
+    def processes(self) -> List:
+        return [worker.process for worker in self._workers.values()]
+
+    def _retire(self, worker_id: int) -> _Worker:
+        worker = self._workers.pop(worker_id)
+        worker.conn.close()
+        if self.on_exit is not None:
+            self.on_exit(worker.process)
+        return worker
+
+    def _stop(self, worker: _Worker):
+        try:
+            worker.conn.send(None)
+        except OSError:
+            pass
+        worker.stopping = True
+
+    def _resize(self, size: int):
+        for worker_id in [w for w, worker in self._workers.items() if not worker.process.is_alive()]:
+            self._retire(worker_id)
+        # Workers already told to stop don't count; idle ones are the first to go
+        active = sorted((worker for worker in self._workers.values() if not worker.stopping),
+                        key=lambda worker: worker.task is not None)
+        for worker in active[size:]:
+            self._stop(worker)
+        for _ in range(size - len(active)):
+            worker_id = next(self._worker_ids)
+            conn, child_conn = self._ctx.Pipe()
+            process = self._ctx.Process(target=_worker_main, name=f"moscraper-worker-{worker_id}",
+                                        args=(worker_id, child_conn, self._cancelled), daemon=True)
+            process.start()
+            child_conn.close()
+            self._workers[worker_id] = _Worker(process, conn)
+            if self.on_spawn is not None:
+                self.on_spawn(process, f"worker-{worker_id}")
+
+    def _cancel(self, run_id: int):
+        with self._cancelled.get_lock():
+            self._cancelled.value = max(self._cancelled.value, run_id)
+
+    def _receive(self, timeout: float):
+        """(worker id, message) pairs ready within ``timeout``; message is None when the worker is gone."""
+        by_conn = {worker.conn: worker_id for worker_id, worker in self._workers.items()}
+        received = []
+        for conn in multiprocessing.connection.wait(list(by_conn), timeout):
+            try:
+                received.append((by_conn[conn], conn.recv()))
+            except (EOFError, OSError):
+                received.append((by_conn[conn], None))
+        # A worker can also die without its pipe reporting it yet
+        reported = {worker_id for worker_id, _ in received}
+        received += [(worker_id, None) for worker_id, worker in self._workers.items()
+                     if worker_id not in reported and not worker.process.is_alive() and not worker.conn.poll()]
+        return received
+
+    def run(self, keywords: List[str], job: KeywordJob, setup: BrowserSetup, size: int) -> Iterator[WorkerMessage]:
+        """
+        Scrape ``keywords`` on ``size`` workers, yielding their messages as they arrive
+
+        Close the iterator (or let it be garbage collected) to cancel the run:
+        workers stop at their next check and the keywords not yet handed out
+        are dropped. A worker that dies mid-keyword yields an 'error' for
+        that keyword and is replaced.
+        """
+        with self._lock:
+            run_id = next(self._run_ids)
+            pending = list(keywords)
+            remaining = len(keywords)
+            try:
+                while remaining:
+                    if pending:
+                        self._resize(size)
+                    for worker in self._workers.values():
+                        if pending and worker.task is None and not worker.stopping:
+                            keyword = pending.pop(0)
+                            try:
+                                worker.conn.send((run_id, keyword, job, setup))
+                            except OSError:
+                                pending.insert(0, keyword)
+                                continue
+                            worker.task = (run_id, keyword)
+                    for worker_id, message in self._receive(timeout=1.0):
+                        if message is None:
+                            worker = self._retire(worker_id)
+                            if worker.task and worker.task[0] == run_id:
+                                remaining -= 1
+                                yield WorkerMessage(run_id, "error", worker.task[1],
+                                                    "Worker process exited mid-keyword", worker_id)
+                            continue
+                        if message.kind in FINAL_KINDS:
+                            self._workers[worker_id].task = None
+                        if message.run_id != run_id:
+                            continue  # late output of a cancelled run
+                        if message.kind in FINAL_KINDS:
+                            remaining -= 1
+                        yield message
+                    if remaining and not pending and not self._workers:
+                        raise RuntimeError("All keyword workers exited")
+            finally:
+                if remaining:
+                    self._cancel(run_id)
+
+    def close(self, timeout: float = 10.0):
+        """Stop every worker (quitting its browser), e.g. after logout so none keeps the old session."""
+        with self._lock:
+            for worker in self._workers.values():
+                if not worker.stopping:
+                    self._stop(worker)
+            deadline = time.monotonic() + timeout
+            for worker in self._workers.values():
+                # Keep reading so a worker still sending a cancelled run's output isn't blocked on its pipe
+                while worker.process.is_alive() and time.monotonic() < deadline:
+                    try:
+                        while worker.conn.poll():
+                            worker.conn.recv()
+                    except (EOFError, OSError):
+                        pass
+                    worker.process.join(0.1)
+                if not worker.process.is_alive():
+                    continue
+                if self.dispose is not None:
+                    self.dispose(worker.process)
+                else:
+                    worker.process.terminate()
+            for worker_id in list(self._workers):
+                self._retire(worker_id)
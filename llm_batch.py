@@ -0,0 +1,464 @@
+"""
+Offline batch generation through an OpenAI-compatible Batch API.
+
+For lead lists too large to enrich interactively, every prompt is written to
+a JSONL file in the OpenAI batch input format (one chat-completions request
+per line, ``custom_id`` = ``row-<index>``), uploaded, and processed by the
+provider without a Streamlit session kept open. Job progress is stored in a
+small JSON state file next to the requests, so submission, polling and
+result download can all be resumed after a crash or restart.
+
+Typical use from a shell, after "Write batch files" in the app:
+
+    python llm_batch.py submit batches/<job>/state.json --api-key-env OPENAI_API_KEY
+    python llm_batch.py wait batches/<job>/state.json
+    python llm_batch.py merge batches/<job>/state.json --out merged.csv
+
+Point ``--base-url`` at a local OpenAI-compatible server to test the whole
+flow without a real account.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from llm_client import LLMError, raise_for_provider_status
+
+BATCH_DIR = "batches"
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "groq": "https://api.groq.com/openai/v1",
+}
+# Batch statuses after which the provider won't produce any more output
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def row_custom_id(index: int) -> str:
+    return f"row-{index}"
+
+
+def new_job_dir(name: str = "", root: str = BATCH_DIR) -> str:
+    """Create and return a fresh ``batches/<timestamp>[_name]`` directory for one job."""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(root, f"{stamp}_{name}" if name else stamp)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_batch_requests(path: str, bodies: Iterable[Tuple[str, dict]], endpoint: str = BATCH_ENDPOINT) -> int:
+    """
+    Write (custom_id, request body) pairs as batch input JSONL
+
+    Args:
+        path: Destination file; written atomically so a crash never leaves half a file
+        bodies: Pairs of custom_id and chat-completions payload
+        endpoint: Endpoint every request line targets
+
+    Returns:
+        int: Number of requests written
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    count = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        for custom_id, body in bodies:
+            fh.write(json.dumps({"custom_id": custom_id, "method": "POST", "url": endpoint, "body": body},
+                                ensure_ascii=False) + "\n")
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+@dataclass
+class BatchJob:
+    """Everything needed to resume one batch job, persisted as JSON in ``state_path``.
+
+    ``result_paths`` collects the output and error files of every attempt;
+    :meth:`prepare_retry` starts a new attempt for the rows still missing.
+    """
+    state_path: str
+    requests_path: str
+    base_url: str = BATCH_BASE_URLS["openai"]
+    endpoint: str = BATCH_ENDPOINT
+    completion_window: str = "24h"
+    rows_path: str = ""
+    total_requests: int = 0
+    attempt: int = 1
+    input_file_id: Optional[str] = None
+    batch_id: Optional[str] = None
+    status: str = "written"
+    output_file_id: Optional[str] = None
+    error_file_id: Optional[str] = None
+    request_counts: Dict[str, int] = field(default_factory=dict)
+    result_paths: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def job_dir(self) -> str:
+        return os.path.dirname(self.state_path)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def save(self):
+        self.updated_at = time.time()
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(asdict(self), fh, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    @classmethod
+    def load(cls, state_path: str) -> "BatchJob":
+        with open(state_path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        data["state_path"] = state_path
+        known = cls.__dataclass_fields__
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+    @classmethod
+    def create(cls, job_dir: str, bodies: Iterable[Tuple[str, dict]], base_url: str = BATCH_BASE_URLS["openai"],
+               rows_path: str = "", **kwargs) -> "BatchJob":
+        """Write ``requests.jsonl`` into ``job_dir`` and save a new job state beside it."""
+        requests_path = os.path.join(job_dir, "requests.jsonl")
+        job = cls(state_path=os.path.join(job_dir, "state.json"), requests_path=requests_path,
+                  base_url=base_url, rows_path=rows_path, **kwargs)
+        job.total_requests = write_batch_requests(requests_path, bodies, job.endpoint)
+        job.save()
+        return job
+
+    def prepare_retry(self, results: Dict[str, "BatchResult"]) -> int:
+        """Start a new attempt holding only the requests without a successful result.
+
+        Returns the number of requests in the new attempt (0 means nothing to retry). A
+        batch that hasn't reached a terminal status is never retried: it has no results
+        yet, and starting over would drop it and bill every row twice.
+        """
+        if not self.finished:
+            return 0
+        pending = []
+        with open(self.requests_path, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                result = results.get(request["custom_id"])
+                if result is None or not result.ok:
+                    pending.append((request["custom_id"], request["body"]))
+        if not pending:
+            return 0
+        self.attempt += 1
+        self.requests_path = os.path.join(self.job_dir, f"requests_retry{self.attempt}.jsonl")
+        write_batch_requests(self.requests_path, pending, self.endpoint)
+        self.input_file_id = self.batch_id = self.output_file_id = self.error_file_id = None
+        self.request_counts = {}
+        self.status = "written"
+        self.save()
+        return len(pending)
+
+
+class BatchClient:
+    """Files + Batches API client for one OpenAI-compatible base URL."""
+
+    def __init__(self, base_url: str, api_key: str, provider: str = "batch",
+                 timeout: Tuple[float, float] = (5.0, 120.0)):
+        self.base_url = base_url.rstrip("/")
+        self.provider = provider
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(max_retries=2))
+        self.session.mount("http://", HTTPAdapter(max_retries=2))
+        self.session.headers.update({"Authorization": f"Bearer {api_key}"})
+
+    def _check(self, response: requests.Response) -> requests.Response:
+        raise_for_provider_status(self.provider, response)
+        return response
+
+    def upload(self, path: str) -> str:
+        """Upload a batch input file and return its file id."""
+        with open(path, "rb") as fh:
+            response = self.session.post(f"{self.base_url}/files", data={"purpose": "batch"},
+                                         files={"file": (os.path.basename(path), fh, "application/jsonl")},
+                                         timeout=self.timeout)
+        return self._check(response).json()["id"]
+
+    def create_batch(self, input_file_id: str, endpoint: str, completion_window: str,
+                     metadata: Optional[dict] = None) -> dict:
+        payload = {"input_file_id": input_file_id, "endpoint": endpoint, "completion_window": completion_window}
+        if metadata:
+            payload["metadata"] = metadata
+        return self._check(self.session.post(f"{self.base_url}/batches", json=payload, timeout=self.timeout)).json()
+
+    def retrieve_batch(self, batch_id: str) -> dict:
+        return self._check(self.session.get(f"{self.base_url}/batches/{batch_id}", timeout=self.timeout)).json()
+
+    def find_batch(self, input_file_id: str) -> Optional[dict]:
+        """Look for an already-created batch for this input file (a create whose reply was lost)."""
+        try:
+            response = self._check(self.session.get(f"{self.base_url}/batches", params={"limit": 100},
+                                                    timeout=self.timeout))
+            batches = response.json().get("data", [])
+        except (LLMError, requests.RequestException, ValueError, AttributeError):
+            # Listing is optional; local stand-ins often don't implement it
+            return None
+        return next((b for b in batches if b.get("input_file_id") == input_file_id), None)
+
+    def download(self, file_id: str, dest: str):
+        """Stream a file's content to ``dest``."""
+        response = self._check(self.session.get(f"{self.base_url}/files/{file_id}/content",
+                                                timeout=self.timeout, stream=True))
+        tmp_path = dest + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                fh.write(chunk)
+        os.replace(tmp_path, dest)
+
+    def close(self):
+        self.session.close()
+
+
+def submit(job: BatchJob, client: BatchClient) -> BatchJob:
+    """Upload and create the batch, saving state after each step so a rerun picks up where it stopped."""
+    if job.batch_id:
+        return job
+    if not job.input_file_id:
+        job.input_file_id = client.upload(job.requests_path)
+        job.status = "uploaded"
+        job.save()
+    batch = client.find_batch(job.input_file_id) or client.create_batch(
+        job.input_file_id, job.endpoint, job.completion_window,
+        metadata={"job": os.path.basename(job.job_dir), "attempt": str(job.attempt)})
+    _apply_batch(job, batch)
+    job.save()
+    return job
+
+
+def _apply_batch(job: BatchJob, batch: dict):
+    job.batch_id = batch.get("id", job.batch_id)
+    job.status = batch.get("status", job.status)
+    job.output_file_id = batch.get("output_file_id") or job.output_file_id
+    job.error_file_id = batch.get("error_file_id") or job.error_file_id
+    job.request_counts = batch.get("request_counts") or job.request_counts
+    errors = (batch.get("errors") or {}).get("data") or []
+    job.errors = [e.get("message", str(e)) for e in errors if isinstance(e, dict)]
+
+
+def refresh(job: BatchJob, client: BatchClient) -> BatchJob:
+    """Poll the batch once and download its output/error files when they appear."""
+    if not job.batch_id:
+        return job
+    _apply_batch(job, client.retrieve_batch(job.batch_id))
+    # Expired or cancelled batches still publish the rows they finished
+    if job.finished:
+        for kind, file_id in (("output", job.output_file_id), ("errors", job.error_file_id)):
+            if not file_id:
+                continue
+            dest = os.path.join(job.job_dir, f"{kind}_{job.attempt}.jsonl")
+            if dest not in job.result_paths:
+                client.download(file_id, dest)
+                job.result_paths.append(dest)
+    job.save()
+    return job
+
+
+def wait(job: BatchJob, client: BatchClient, poll_interval: float = 30.0, timeout: Optional[float] = None,
+         on_status: Optional[Callable[[BatchJob], None]] = None) -> BatchJob:
+    """Poll until the batch reaches a terminal status (or ``timeout`` seconds pass)."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        refresh(job, client)
+        if on_status:
+            on_status(job)
+        if job.finished or (deadline is not None and time.monotonic() >= deadline):
+            return job
+        time.sleep(poll_interval)
+
+
+@dataclass
+class BatchResult:
+    """The outcome of one request line: the message content, or why there is none."""
+    custom_id: str
+    content: Optional[str] = None
+    error: str = ""
+    usage: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.content is not None and not self.error
+
+
+def _parse_result_line(record: dict) -> BatchResult:
+    result = BatchResult(custom_id=str(record.get("custom_id")))
+    error = record.get("error")
+    response = record.get("response") or {}
+    body = response.get("body") or {}
+    if error:
+        result.error = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+    elif response.get("status_code", 200) >= 400:
+        message = (body.get("error") or {}).get("message") if isinstance(body, dict) else None
+        result.error = f"HTTP {response.get('status_code')}: {message or body}"
+    else:
+        try:
+            result.content = body["choices"][0]["message"]["content"]
+            result.usage = body.get("usage") or {}
+        except (KeyError, IndexError, TypeError):
+            result.error = "response has no message content"
+    return result
+
+
+def read_results(paths: Sequence[str]) -> Dict[str, BatchResult]:
+    """Read output/error JSONL files from every attempt, keyed by custom_id.
+
+    Later files win, except that an error never overwrites an earlier success.
+    """
+    results: Dict[str, BatchResult] = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                try:
+                    result = _parse_result_line(json.loads(line))
+                except ValueError:
+                    continue
+                previous = results.get(result.custom_id)
+                if previous is None or result.ok or not previous.ok:
+                    results[result.custom_id] = result
+    return results
+
+
+def merge_results(rows: Sequence, results: Dict[str, BatchResult],
+                  on_result: Callable[[object, str], dict], on_error: Callable[[object, str], dict],
+                  on_pending: Optional[Callable[[object], dict]] = None) -> List[dict]:
+    """
+    Join batch results back onto the source rows by row id
+
+    Args:
+        rows: Source rows, in the order their custom_ids were assigned
+        results: Output of :func:`read_results`
+        on_result: Builds the merged row from (row, content); an exception marks the row as failed
+        on_error: Builds the merged row from (row, error message)
+        on_pending: Builds the row for ids with no result yet; defaults to on_error(row, "pending")
+
+    Returns:
+        list: One merged dict per source row
+    """
+    merged = []
+    for i, row in enumerate(rows):
+        result = results.get(row_custom_id(i))
+        if result is None:
+            merged.append(on_pending(row) if on_pending else on_error(row, "pending"))
+        elif not result.ok:
+            merged.append(on_error(row, result.error))
+        else:
+            try:
+                merged.append(on_result(row, result.content))
+            except Exception as e:
+                merged.append(on_error(row, f"unusable response: {e}"))
+    return merged
+
+
+def summarize(job: BatchJob, results: Dict[str, BatchResult]) -> dict:
+    ok = sum(1 for r in results.values() if r.ok)
+    return {
+        'status': job.status,
+        'attempt': job.attempt,
+        'total': job.total_requests,
+        'succeeded': ok,
+        'failed': len(results) - ok,
+        'pending': max(0, job.total_requests - len(results)),
+        'tokens': sum(r.usage.get('total_tokens', 0) for r in results.values()),
+    }
+
+
+# --- Command line ---
+
+def _client_for(job: BatchJob, args) -> BatchClient:
+    api_key = os.environ.get(args.api_key_env, "")
+    if not api_key:
+        sys.exit(f"Set {args.api_key_env} to the API key for {job.base_url}")
+    return BatchClient(args.base_url or job.base_url, api_key)
+
+
+def _json_fields(content: str) -> dict:
+    """Flatten a JSON-object completion into columns; non-JSON content goes in 'content'."""
+    try:
+        parsed = json.loads(content)
+    except ValueError:
+        return {"content": content}
+    return parsed if isinstance(parsed, dict) else {"content": content}
+
+
+def _cmd_merge(job: BatchJob, out_path: str):
+    if not job.rows_path or not os.path.exists(job.rows_path):
+        sys.exit("This job has no rows CSV to merge into")
+    with open(job.rows_path, newline="", encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+    results = read_results(job.result_paths)
+    merged = merge_results(
+        rows, results,
+        on_result=lambda row, content: {**row, **_json_fields(content), "batch_error": ""},
+        on_error=lambda row, error: {**row, "batch_error": error},
+    )
+    columns = list(dict.fromkeys(key for row in merged for key in row))
+    with open(out_path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(merged)
+    print(json.dumps(summarize(job, results)))
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Submit and collect offline LLM batch jobs")
+    parser.add_argument("command", choices=["submit", "status", "wait", "retry", "merge"])
+    parser.add_argument("state", help="Path to the job's state.json")
+    parser.add_argument("--base-url", default="", help="Override the job's API base URL, e.g. a local stand-in")
+    parser.add_argument("--api-key-env", default="OPENAI_API_KEY", help="Environment variable holding the API key")
+    parser.add_argument("--interval", type=float, default=30.0, help="Seconds between status polls for 'wait'")
+    parser.add_argument("--out", default="", help="Merged CSV path for 'merge' (default: <job>/merged.csv)")
+    args = parser.parse_args(argv)
+
+    job = BatchJob.load(args.state)
+    if args.command == "merge":
+        _cmd_merge(job, args.out or os.path.join(job.job_dir, "merged.csv"))
+        return
+    if args.command == "retry":
+        if not job.finished:
+            print(f"Attempt {job.attempt} is still {job.status}; wait for it to finish before retrying")
+            return
+        count = job.prepare_retry(read_results(job.result_paths))
+        print(f"{count} request(s) queued for attempt {job.attempt}" if count else "Nothing to retry")
+        if not count:
+            return
+    client = _client_for(job, args)
+    try:
+        if args.command in ("submit", "retry", "wait"):
+            submit(job, client)
+        if args.command == "wait":
+            wait(job, client, poll_interval=args.interval,
+                 on_status=lambda j: print(f"{j.status} {j.request_counts}", flush=True))
+        else:
+            refresh(job, client)
+    finally:
+        client.close()
+    print(json.dumps(summarize(job, read_results(job.result_paths))))
+
+
+if __name__ == "__main__":
+    main()
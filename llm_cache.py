@@ -0,0 +1,133 @@
+"""
+Persistent, content-addressed cache for LLM chat completions.
+
+Entries live in a small SQLite database keyed by provider, model,
+temperature and a hash of the full request (messages plus generation
+parameters). Old entries expire after a TTL, and the least recently used
+ones are evicted once the cache grows past a size limit.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class LLMCache:
+    """SQLite-backed response cache with TTL and LRU size-based eviction.
+
+    Safe to share between the enrichment worker threads: one connection is
+    guarded by a lock, which is plenty for a handful of lookups per second.
+    """
+
+    def __init__(self, path: str = os.path.join(".moscraper_cache", "llm_cache.sqlite3"),
+                 ttl_seconds: float = 7 * 24 * 3600, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                temperature REAL NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (provider, model, temperature, prompt_hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(provider: str, payload: dict) -> tuple:
+        """Cache key for a chat-completions payload: (provider, model, temperature, prompt_hash)."""
+        hashed = {k: v for k, v in payload.items() if k not in ("model", "temperature", "stream")}
+        prompt_hash = hashlib.sha256(json.dumps(hashed, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return (provider.lower(), str(payload.get("model", "")), float(payload.get("temperature", 1.0)), prompt_hash)
+
+    def get(self, key: tuple) -> Optional[str]:
+        """Return the cached response text, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE provider=? AND model=? AND temperature=? AND prompt_hash=?",
+                key
+            ).fetchone()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE provider=? AND model=? AND temperature=? AND prompt_hash=?", key)
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access=? WHERE provider=? AND model=? AND temperature=? AND prompt_hash=?",
+                (now,) + tuple(key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: tuple, response: str):
+        """Store (or overwrite) a response, then enforce the TTL and size limits."""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                tuple(key) + (response, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        if self.ttl_seconds:
+            cur = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.evictions += max(cur.rowcount, 0)
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until we're back under the limit
+        for provider, model, temperature, prompt_hash, size in self._conn.execute(
+                "SELECT provider, model, temperature, prompt_hash, size FROM responses ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute(
+                "DELETE FROM responses WHERE provider=? AND model=? AND temperature=? AND prompt_hash=?",
+                (provider, model, temperature, prompt_hash)
+            )
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'bytes': total,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,186 @@
+"""
+Pooled HTTP client for the Groq and OpenAI chat-completions endpoints.
+
+One requests.Session per provider keeps TLS connections alive between
+calls instead of doing a fresh TCP + TLS handshake for every request.
+"""
+
+import json
+import re
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class LLMClient:
+    """Keep-alive chat-completions client for one provider.
+
+    The connection pool is sized for the enrichment workers so concurrent
+    rows reuse warm connections instead of queueing for one or opening
+    throwaway ones.
+    """
+
+    def __init__(self, provider: str, chat_url: str, connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0, pool_maxsize: int = 16):
+        self.provider = provider
+        self.chat_url = chat_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+    def chat(self, api_key: str, payload: dict, timeout: Optional[Tuple[float, float]] = None,
+             stream: bool = False) -> requests.Response:
+        """POST a chat-completions payload over the pooled session and return the raw response.
+
+        With ``stream=True`` the body is left unread so an SSE completion can be
+        consumed with :func:`iter_stream_chunks`; close the response when done.
+        """
+        return self.session.post(
+            self.chat_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            json=payload,
+            timeout=timeout or self.timeout,
+            stream=stream
+        )
+
+    def close(self):
+        self.session.close()
+
+
+def iter_stream_chunks(response: requests.Response) -> Iterator[dict]:
+    """Yield the JSON chunks of a server-sent-events chat completion until ``[DONE]``."""
+    if response.encoding is None:
+        response.encoding = "utf-8"
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except ValueError:
+            continue
+
+
+# --- Typed provider errors and rate-limit headers ---
+
+class LLMError(Exception):
+    """A chat-completions request failed with an HTTP error status."""
+
+    def __init__(self, provider: str, status: int, message: str, response: Optional[requests.Response] = None):
+        super().__init__(f"{provider} HTTP {status}: {message}")
+        self.provider = provider
+        self.status = status
+        self.response = response
+
+
+class LLMRateLimitError(LLMError):
+    """HTTP 429. ``retry_after`` is the server's suggested wait in seconds, if any."""
+
+    def __init__(self, provider: str, status: int, message: str, response: Optional[requests.Response] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(provider, status, message, response)
+        self.retry_after = retry_after
+
+
+class LLMAuthError(LLMError):
+    """HTTP 401/403: bad or missing API key."""
+
+
+class LLMServerError(LLMError):
+    """HTTP 5xx: provider-side failure, usually worth a retry."""
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse reset headers such as '7.66s', '2m59.56s', '20ms' or plain seconds into seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def _int_header(headers, name: str) -> Optional[int]:
+    try:
+        return int(float(headers[name]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RateLimitInfo:
+    """The rate-limit state a provider reported on one response."""
+    retry_after: Optional[float] = None
+    limit_requests: Optional[int] = None
+    remaining_requests: Optional[int] = None
+    reset_requests: Optional[float] = None
+    limit_tokens: Optional[int] = None
+    remaining_tokens: Optional[int] = None
+    reset_tokens: Optional[float] = None
+
+    @classmethod
+    def from_headers(cls, headers) -> "RateLimitInfo":
+        retry_after = headers.get("retry-after")
+        try:
+            retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            # HTTP-date form
+            try:
+                retry_after = max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                retry_after = None
+        return cls(
+            retry_after=retry_after,
+            limit_requests=_int_header(headers, "x-ratelimit-limit-requests"),
+            remaining_requests=_int_header(headers, "x-ratelimit-remaining-requests"),
+            reset_requests=parse_duration(headers.get("x-ratelimit-reset-requests")),
+            limit_tokens=_int_header(headers, "x-ratelimit-limit-tokens"),
+            remaining_tokens=_int_header(headers, "x-ratelimit-remaining-tokens"),
+            reset_tokens=parse_duration(headers.get("x-ratelimit-reset-tokens")),
+        )
+
+
+def raise_for_provider_status(provider: str, response: requests.Response, info: Optional[RateLimitInfo] = None):
+    """Raise the typed LLMError matching an unsuccessful response; return quietly on 2xx."""
+    status = response.status_code
+    if status < 400:
+        return
+    try:
+        message = response.json()["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        message = response.text
+    message = (message or response.reason or "").strip()[:300]
+    if status == 429:
+        info = info or RateLimitInfo.from_headers(response.headers)
+        retry_after = info.retry_after
+        if retry_after is None:
+            retry_after = max(filter(None, [info.reset_requests, info.reset_tokens]), default=None)
+        raise LLMRateLimitError(provider, status, message, response, retry_after=retry_after)
+    if status in (401, 403):
+        raise LLMAuthError(provider, status, message, response)
+    if status >= 500:
+        raise LLMServerError(provider, status, message, response)
+    raise LLMError(provider, status, message, response)
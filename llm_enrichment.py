@@ -0,0 +1,131 @@
+"""
+Bounded-concurrency enrichment engine for LLM email generation.
+
+Runs a per-row function over a thread pool, keeps results in input order,
+and keeps every LLM request under a shared requests-per-minute ceiling.
+"""
+
+import concurrent.futures
+import queue
+import threading
+from typing import Any, Callable, List, Optional, Sequence
+
+from rate_limit import TokenBucket
+
+
+class EnrichmentEngine:
+    """Fan rows out to ``max_workers`` threads under one request-rate ceiling.
+
+    Row functions call :meth:`throttle` right before each LLM request, so a
+    row that needs two requests (name + email) consumes two tokens.
+    Progress callbacks always run on the thread that called :meth:`run`,
+    which for the app is the Streamlit script thread. Row functions can also
+    surface early partial results (e.g. a streamed subject line) with
+    :meth:`report_partial`; those are handed to ``on_partial`` on that same
+    thread while the row is still running, and log lines queued with
+    :meth:`report_log` go to ``on_log`` the same way.
+    """
+
+    def __init__(self, max_workers: int = 4, requests_per_minute: float = 0,
+                 thread_initializer: Optional[Callable[[], None]] = None):
+        self.max_workers = max(1, int(max_workers))
+        self.bucket = TokenBucket(requests_per_minute, burst=self.max_workers) if requests_per_minute > 0 else None
+        self.thread_initializer = thread_initializer
+        self._partials = queue.Queue()
+        self._logs = queue.Queue()
+        self._local = threading.local()
+
+    def throttle(self):
+        """Block until the rate ceiling allows one more request."""
+        if self.bucket is not None:
+            self.bucket.acquire()
+
+    def report_partial(self, partial: Any):
+        """Queue a partial result for the row running on this worker thread."""
+        index = getattr(self._local, 'index', None)
+        if index is not None:
+            self._partials.put((index, partial))
+
+    def report_log(self, message: str):
+        """Queue a log line from a worker thread."""
+        self._logs.put(message)
+
+    def _run_row(self, row_fn: Callable[[Any], Any], index: int, item: Any) -> Any:
+        self._local.index = index
+        try:
+            return row_fn(item)
+        finally:
+            self._local.index = None
+
+    def _drain_partials(self, on_partial: Optional[Callable[[int, Any], None]]):
+        while True:
+            try:
+                index, partial = self._partials.get_nowait()
+            except queue.Empty:
+                return
+            if on_partial:
+                on_partial(index, partial)
+
+    def _drain_logs(self, on_log: Optional[Callable[[str], None]]):
+        while True:
+            try:
+                message = self._logs.get_nowait()
+            except queue.Empty:
+                return
+            if on_log:
+                on_log(message)
+
+    def run(self, items: Sequence[Any], row_fn: Callable[[Any], Any],
+            on_progress: Optional[Callable[[int, int, int, Any], None]] = None,
+            on_error: Optional[Callable[[Any, Exception], Any]] = None,
+            on_partial: Optional[Callable[[int, Any], None]] = None,
+            on_log: Optional[Callable[[str], None]] = None, poll_interval: float = 0.2) -> List[Any]:
+        """
+        Apply ``row_fn`` to every item concurrently
+
+        Args:
+            items: Rows to enrich
+            row_fn: Called as row_fn(item) on a worker thread
+            on_progress: Called as on_progress(done, total, index, result) after each row finishes
+            on_error: Builds the result for a row whose row_fn raised; re-raises if not given
+            on_partial: Called as on_partial(index, partial) for each report_partial from a running row
+            on_log: Called as on_log(message) for each report_log from a worker
+            poll_interval: How often (seconds) to check for partial results and log lines while rows run
+
+        Returns:
+            list: Results in the same order as ``items``
+        """
+        total = len(items)
+        results: List[Any] = [None] * total
+        if not total:
+            return results
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_workers, total),
+                                                   initializer=self.thread_initializer) as executor:
+            future_to_idx = {executor.submit(self._run_row, row_fn, i, item): i for i, item in enumerate(items)}
+            pending = set(future_to_idx)
+            done = 0
+            try:
+                while pending:
+                    finished, pending = concurrent.futures.wait(
+                        pending, timeout=poll_interval if on_partial or on_log else None,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    self._drain_partials(on_partial)
+                    self._drain_logs(on_log)
+                    for future in finished:
+                        i = future_to_idx[future]
+                        try:
+                            results[i] = future.result()
+                        except Exception as e:
+                            if on_error is None:
+                                raise
+                            results[i] = on_error(items[i], e)
+                        done += 1
+                        if on_progress:
+                            on_progress(done, total, i, results[i])
+            except BaseException:
+                # Streamlit stops a rerun by raising in the script thread; don't start queued rows
+                for future in future_to_idx:
+                    future.cancel()
+                raise
+        self._drain_logs(on_log)
+        return results
@@ -0,0 +1,136 @@
+"""
+Incremental parsing of streamed JSON completions.
+
+The outreach prompts ask for a flat JSON object of string fields. While the
+completion streams in, :class:`IncrementalJSONFields` picks out each
+top-level string field the moment its closing quote arrives, so the UI can
+show a subject line early and the stream can be closed as soon as every
+required field is in, instead of paying for trailing tokens.
+"""
+
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+import requests
+
+from llm_client import iter_stream_chunks
+
+
+class IncrementalJSONFields:
+    """Feed JSON text in arbitrary pieces; completed top-level string fields land in ``fields``.
+
+    Nested objects/arrays and non-string values are skipped. Text before the
+    opening brace (such as a code fence) is ignored.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, str] = {}
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._chars: List[str] = []
+        self._key: Optional[str] = None
+        self._expect = "key"  # what the next top-level string is: "key" or "value"
+
+    def _decode(self) -> str:
+        raw = "".join(self._chars)
+        try:
+            return json.loads(f'"{raw}"')
+        except ValueError:
+            return raw
+
+    def feed(self, text: str) -> List[str]:
+        """Consume more text and return the names of fields completed by it."""
+        completed = []
+        for char in text:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._chars.append(char)
+                elif char == "\\":
+                    self._escape = True
+                    self._chars.append(char)
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        value = self._decode()
+                        if self._expect == "key":
+                            self._key = value
+                        elif self._key is not None:
+                            self.fields[self._key] = value
+                            completed.append(self._key)
+                            self._key = None
+                else:
+                    self._chars.append(char)
+            elif char == '"':
+                self._in_string = True
+                self._chars = []
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth = max(0, self._depth - 1)
+            elif self._depth == 1 and char == ":":
+                self._expect = "value"
+            elif self._depth == 1 and char == ",":
+                self._expect = "key"
+                self._key = None
+        return completed
+
+    def has_all(self, names: Sequence[str]) -> bool:
+        return all(name in self.fields for name in names)
+
+
+@dataclass
+class StreamedCompletion:
+    """What came out of one streamed request."""
+    text: str
+    fields: Dict[str, str] = field(default_factory=dict)
+    usage: Dict[str, int] = field(default_factory=dict)
+    generated_chars: int = 0
+    cancelled_early: bool = False
+
+    def completion_tokens_estimate(self) -> int:
+        return int(math.ceil(self.generated_chars / 4))
+
+
+def read_json_stream(response: requests.Response, required_fields: Sequence[str],
+                     on_fields: Optional[Callable[[Dict[str, str]], None]] = None) -> StreamedCompletion:
+    """
+    Consume an SSE chat completion whose content is a JSON object
+
+    Args:
+        response: A streaming chat-completions response with a 2xx status
+        required_fields: Once all of these string fields are complete the stream is closed early
+        on_fields: Called with a copy of the fields parsed so far whenever one completes
+
+    Returns:
+        StreamedCompletion: ``text`` is the raw completion, or the parsed fields re-encoded
+        as JSON when the stream was cut short
+    """
+    parser = IncrementalJSONFields()
+    pieces: List[str] = []
+    usage: Dict[str, int] = {}
+    cancelled = False
+    try:
+        for chunk in iter_stream_chunks(response):
+            # OpenAI sends usage on a final chunk when asked to; Groq puts it under x_groq
+            usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or usage
+            choices = chunk.get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if not delta:
+                continue
+            pieces.append(delta)
+            if parser.feed(delta) and on_fields is not None:
+                on_fields(dict(parser.fields))
+            if required_fields and parser.has_all(required_fields):
+                cancelled = True
+                break
+    finally:
+        # Dropping the connection is what tells the provider to stop generating
+        response.close()
+    raw = "".join(pieces)
+    text = json.dumps(parser.fields, ensure_ascii=False) if cancelled else raw
+    return StreamedCompletion(text=text, fields=dict(parser.fields), usage=usage,
+                              generated_chars=len(raw), cancelled_early=cancelled)
@@ -0,0 +1,171 @@
+"""
+Local first-name resolution for outreach greetings.
+
+Most rows already carry enough to name the recipient without an LLM round
+trip: the scraped ``author``, the ``/in/<slug>`` profile URL, a
+``firstname.lastname@`` address or a sign-off in the post itself. Each
+source yields a guess with a confidence score; callers only ask the LLM
+when the best guess is below :data:`CONFIDENCE_THRESHOLD`. Weak sources (a
+single-word author, sign-offs and self-introductions in the post) stay below
+it on their own and only pass when another source names the same person.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+from urllib.parse import unquote
+
+CONFIDENCE_THRESHOLD = 0.6
+FALLBACK_NAME = "there"
+
+_TITLES = {"dr", "mr", "mrs", "ms", "miss", "prof", "er", "ca", "adv", "sir", "shri", "smt"}
+_NOT_NAMES = {
+    "unknown", "linkedin", "member", "user", "admin", "info", "hello", "hi", "contact", "hr", "careers", "jobs",
+    "sales", "support", "team", "office", "noreply", "no-reply", "mail", "enquiry", "enquiries", "hiring",
+    "recruitment", "marketing", "business", "accounts", "there", "the", "we", "our", "us", "thanks", "regards",
+}
+# Words often capitalized right after "I am" / "Best" / "Thanks" that are not names
+_COMMON_CAPITALIZED = {
+    "excited", "thrilled", "happy", "glad", "pleased", "proud", "delighted", "honored", "honoured", "grateful",
+    "humbled", "looking", "seeking", "searching", "interested", "available", "open", "currently", "now", "back",
+    "new", "not", "so", "just", "also", "very", "really", "sure", "ready", "working", "based", "here", "again",
+    "everyone", "all", "guys", "folks", "you", "sir", "madam", "welcome", "practices", "practice", "wishes",
+    "luck", "friends", "connections", "network", "today", "tomorrow", "sharing", "announcing", "starting",
+    "joining", "moving", "building", "writing", "reaching", "posting", "going", "hoping", "planning", "a", "an",
+    "in", "on", "at", "for", "with", "from", "and", "but", "to", "of", "it", "this", "that", "your", "my",
+}
+_NAME_TOKEN = re.compile(r"^[A-Za-zÀ-ÖØ-öø-ÿ][A-Za-zÀ-ÖØ-öø-ÿ'’-]{1,24}$")
+_PROFILE_SLUG = re.compile(r"/in/([^/?#]+)")
+_COMPANY_WORDS = {
+    "inc", "ltd", "llc", "llp", "pvt", "corp", "co", "company", "technologies", "tech", "solutions", "agency",
+    "group", "studio", "studios", "labs", "consulting", "services", "media", "digital", "ventures", "global",
+    "india", "official", "careers", "hiring", "recruiters",
+}
+# Keyword parts are case-insensitive; the captured name must still be capitalized. All of these
+# score below CONFIDENCE_THRESHOLD: they need a second source to agree before the LLM step is skipped.
+_SIGNATURE_PATTERNS = [
+    (re.compile(r"\b(?i:my name is)\s+([A-Z][a-z'’-]{1,24})\b"), 0.55),
+    # A sign-off has to start a line and end the message: "Best regards,\nJane (Doe)"
+    (re.compile(r"(?:^|\n)[ \t]*(?i:(?:best |kind |warm |warmest )?regards|thanks|thank you|cheers|best|sincerely|warmly)"
+                r"[ \t]*[,!.]?[ \t]*\n?[ \t]*[-–—]?[ \t]*([A-Z][a-z'’-]{1,24})(?:[ \t]+[A-Z][a-z'’-]{1,24})?[ \t.!]*\Z"), 0.55),
+    (re.compile(r"(?:^|\n)\s*[-–—]\s*([A-Z][a-z'’-]{1,24})\s*\Z"), 0.5),
+    (re.compile(r"\b(?i:i am|i'm|this is)\s+([A-Z][a-z'’-]{1,24})\b"), 0.45),
+]
+
+
+@dataclass
+class NameGuess:
+    """A first name, how sure we are about it (0-1), and where it came from."""
+    name: str = FALLBACK_NAME
+    confidence: float = 0.0
+    source: str = "none"
+
+    @property
+    def confident(self) -> bool:
+        return self.confidence >= CONFIDENCE_THRESHOLD
+
+
+def _clean_token(token: str) -> Optional[str]:
+    token = token.strip(" .,;:!?()[]{}\"'|")
+    if not _NAME_TOKEN.match(token) or token.lower() in _NOT_NAMES:
+        return None
+    return token[0].upper() + token[1:].lower() if token.isupper() or token.islower() else token
+
+
+def first_name(full_name: str) -> Optional[str]:
+    """First usable given name in a display name like 'Dr. Jane A. Doe, MBA | Founder'."""
+    if not isinstance(full_name, str):
+        return None
+    # Credentials and headlines usually follow a comma, pipe or dash
+    head = re.split(r"[,|•(]|\s[-–—]\s", full_name, maxsplit=1)[0]
+    for token in head.split():
+        if token.lower().rstrip(".") in _TITLES:
+            continue
+        return _clean_token(token)
+    return None
+
+
+def from_author(author: str) -> Optional[NameGuess]:
+    name = first_name(author)
+    if not name:
+        return None
+    words = re.split(r"[,|•(]", author, maxsplit=1)[0].lower().replace(".", "").split()
+    if any(word in _COMPANY_WORDS for word in words):
+        return NameGuess(name, 0.2, "author")
+    # 2-4 words reads like a person; a single word is often a company page, so it needs backing up
+    return NameGuess(name, 0.95 if 2 <= len(words) <= 4 else 0.5, "author")
+
+
+def from_profile_url(profile_url: str) -> Optional[NameGuess]:
+    if not isinstance(profile_url, str):
+        return None
+    match = _PROFILE_SLUG.search(profile_url)
+    if not match:
+        return None
+    parts = [p for p in re.split(r"[-_.]", unquote(match.group(1))) if p]
+    # Drop the trailing id LinkedIn appends to duplicate slugs (e.g. jane-doe-4b2a1c93)
+    while parts and any(ch.isdigit() for ch in parts[-1]):
+        parts.pop()
+    if not parts:
+        return None
+    name = _clean_token(parts[0])
+    if not name:
+        return None
+    return NameGuess(name, 0.8 if len(parts) >= 2 else 0.5, "profile_url")
+
+
+def from_email(email: str) -> Optional[NameGuess]:
+    if not isinstance(email, str) or "@" not in email:
+        return None
+    local = email.split("@", 1)[0].split("+", 1)[0]
+    parts = [p for p in re.split(r"[._-]", local) if p]
+    parts = [p for p in parts if not p.isdigit()]
+    if not parts:
+        return None
+    name = _clean_token(re.sub(r"\d+$", "", parts[0]))
+    if not name:
+        return None
+    if len(parts) >= 2:
+        return NameGuess(name, 0.75, "email")
+    # 'jane@' is probably a first name; 'janedoe@' can't be split reliably
+    return NameGuess(name, 0.5 if len(name) <= 8 else 0.2, "email")
+
+
+def from_signature(content: str) -> Optional[NameGuess]:
+    if not isinstance(content, str) or not content:
+        return None
+    for pattern, confidence in _SIGNATURE_PATTERNS:
+        for match in pattern.finditer(content):
+            name = _clean_token(match.group(1))
+            if name and name.lower() not in _COMMON_CAPITALIZED:
+                return NameGuess(name, confidence, "signature")
+    return None
+
+
+def resolve_name(author: str = "", profile_url: str = "", email: str = "", content: str = "") -> NameGuess:
+    """
+    Best local guess at the recipient's first name
+
+    Args:
+        author: Scraped post author display name
+        profile_url: LinkedIn profile URL (``/in/<slug>``)
+        email: Recipient address
+        content: Post text, searched for sign-offs and self-introductions
+
+    Returns:
+        NameGuess: The most confident name; one named by two or more sources is boosted to at
+        least CONFIDENCE_THRESHOLD. 'there' with confidence 0 when nothing usable was found
+    """
+    guesses: List[NameGuess] = [g for g in (from_author(author), from_profile_url(profile_url),
+                                            from_email(email), from_signature(content)) if g]
+    if not guesses:
+        return NameGuess()
+    candidates = []
+    for name in {g.name.lower() for g in guesses}:
+        agreeing = [g for g in guesses if g.name.lower() == name]
+        best = max(agreeing, key=lambda g: g.confidence)
+        if len(agreeing) > 1:
+            confidence = max(best.confidence + 0.1 * (len(agreeing) - 1), CONFIDENCE_THRESHOLD)
+            best = NameGuess(best.name, min(1.0, confidence), best.source)
+        candidates.append(best)
+    return max(candidates, key=lambda g: g.confidence)
@@ -0,0 +1,352 @@
+"""
+Read LinkedIn search results from the page's own JSON responses.
+
+The search feed is filled in by background requests to ``/voyager/api/``.
+With Chrome's performance log switched on (see :func:`enable_performance_logging`)
+every ``Network.*`` DevTools event is buffered by chromedriver; :class:`NetworkCapture`
+drains that buffer, fetches the body of each finished voyager response with
+``Network.getResponseBody`` and parses posts straight out of the payload, so
+nothing depends on the rendered DOM or on how long layout takes.
+
+Recorded responses can be replayed from a local server for testing:
+
+    python network_capture.py serve benchmarks/fixtures/voyager --port 8765
+    python network_capture.py capture http://127.0.0.1:8765/search/results/content/?keywords=test
+    python network_capture.py parse benchmarks/fixtures/voyager
+"""
+
+import argparse
+import base64
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+from urllib.parse import parse_qs, urlparse
+
+from html_parsing import ParsedPost, absolute_profile_url
+
+VOYAGER_PATH = "/voyager/api/"
+# chromedriver capability that turns on the DevTools event log
+PERFORMANCE_LOG_PREFS = {"performance": "ALL"}
+PERF_LOGGING_PREFS = {"enableNetwork": True, "enablePage": False}
+
+
+def enable_performance_logging(options):
+    """Ask chromedriver to buffer Network events; must be set before the driver starts."""
+    options.set_capability("goog:loggingPrefs", PERFORMANCE_LOG_PREFS)
+    options.add_experimental_option("perfLoggingPrefs", PERF_LOGGING_PREFS)
+    return options
+
+
+def _text(value) -> str:
+    """Voyager wraps most strings as ``{"text": ...}``, sometimes twice."""
+    while isinstance(value, dict):
+        value = value.get("text")
+    return value if isinstance(value, str) else ""
+
+
+def _walk(node) -> Iterator[dict]:
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def _post_urn(entity: dict) -> str:
+    metadata = entity.get("metadata") or entity.get("updateMetadata") or {}
+    return metadata.get("backendUrn") or metadata.get("urn") or entity.get("entityUrn") or ""
+
+
+def parse_voyager_payload(payload) -> List[ParsedPost]:
+    """
+    Posts found anywhere in a voyager response (normalized ``included`` list or nested GraphQL data)
+
+    Args:
+        payload: Decoded JSON body
+
+    Returns:
+        List[ParsedPost]: One entry per update with commentary, in payload order, without duplicates
+    """
+    posts = []
+    seen = set()
+    for entity in _walk(payload):
+        if "commentary" not in entity or "actor" not in entity:
+            continue
+        urn = _post_urn(entity)
+        content = _text(entity.get("commentary"))
+        if not content or urn in seen:
+            continue
+        seen.add(urn)
+        actor = entity.get("actor") or {}
+        target = (actor.get("navigationContext") or {}).get("actionTarget") or ""
+        posts.append(ParsedPost(
+            urn=urn,
+            author=_text(actor.get("name")) or "Unknown",
+            profile_url=absolute_profile_url(target) if "/in/" in target else "",
+            content=content,
+        ))
+    return posts
+
+
+class NetworkCapture:
+    """
+    Collects voyager JSON responses from a driver started with performance logging
+
+    Args:
+        driver: Selenium Chrome driver whose options went through enable_performance_logging
+        url_filter: Substring a response URL must contain to be captured
+        record_dir: When set, every captured body is also written there for later replay
+    """
+
+    def __init__(self, driver, url_filter: str = VOYAGER_PATH, record_dir: str = ""):
+        self.driver = driver
+        self.url_filter = url_filter
+        self.record_dir = record_dir
+        self._pending: Dict[str, str] = {}  # requestId -> URL, response headers seen, body not yet loaded
+        self.responses = 0
+        self.bytes_captured = 0
+        self.errors = 0
+
+    def start(self):
+        """Enable the Network domain and throw away events from before this capture."""
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.driver.get_log("performance")
+        self._pending.clear()
+        if self.record_dir:
+            os.makedirs(self.record_dir, exist_ok=True)
+
+    def _body(self, request_id: str):
+        result = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        body = result.get("body") or ""
+        if result.get("base64Encoded"):
+            body = base64.b64decode(body).decode("utf-8", errors="replace")
+        return body
+
+    def _record(self, url: str, payload):
+        path = os.path.join(self.record_dir, f"response_{self.responses:04d}.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"url": url, "body": payload}, fh)
+
+    def poll(self) -> List[dict]:
+        """Decoded bodies of the voyager responses that finished loading since the last poll."""
+        payloads = []
+        for entry in self.driver.get_log("performance"):
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params") or {}
+            if method == "Network.responseReceived":
+                response = params.get("response") or {}
+                if self.url_filter in response.get("url", "") and "json" in response.get("mimeType", ""):
+                    self._pending[params.get("requestId")] = response["url"]
+            elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                url = self._pending.pop(params.get("requestId"), None)
+                if url is None or method == "Network.loadingFailed":
+                    continue
+                try:
+                    body = self._body(params["requestId"])
+                    payload = json.loads(body)
+                except Exception:
+                    # Body evicted from Chrome's buffer, or not JSON after all
+                    self.errors += 1
+                    continue
+                if self.record_dir:
+                    self._record(url, payload)
+                self.responses += 1
+                self.bytes_captured += len(body)
+                payloads.append(payload)
+        return payloads
+
+    def wait_for_posts(self, timeout: float, poll_interval: float = 0.2) -> List[ParsedPost]:
+        """Poll until at least one response with posts arrives, or ``timeout`` seconds pass."""
+        deadline = time.monotonic() + timeout
+        while True:
+            posts = [post for payload in self.poll() for post in parse_voyager_payload(payload)]
+            if posts or time.monotonic() >= deadline:
+                return posts
+            time.sleep(poll_interval)
+
+
+# Minimal stand-in for the search page: fetches the next recorded response on load and on scroll
+REPLAY_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Replay</title></head>
+<body style="min-height: 200vh">
+<div id="feed"></div>
+<script>
+let page = 0, loading = false, done = false;
+async function next() {
+    if (loading || done) return;
+    loading = true;
+    const response = await fetch('/voyager/api/search/dash/clusters?start=' + page++);
+    if (response.status !== 200) { done = true; loading = false; return; }
+    const payload = await response.json();
+    for (const item of (payload.included || [])) {
+        if (!item.commentary) continue;
+        const node = document.createElement('div');
+        node.setAttribute('data-urn', (item.metadata || {}).backendUrn || item.entityUrn || '');
+        node.textContent = ((item.commentary || {}).text || {}).text || '';
+        document.getElementById('feed').appendChild(node);
+    }
+    document.body.style.minHeight = (document.body.scrollHeight + window.innerHeight) + 'px';
+    loading = false;
+}
+window.addEventListener('scroll', () => {
+    if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 200) next();
+});
+next();
+</script>
+</body></html>
+"""
+
+
+def load_recorded(fixture_dir: str) -> List[dict]:
+    """Recorded responses in file-name order, as ``{"url", "body"}`` dicts."""
+    responses = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.json"))):
+        with open(path, encoding="utf-8") as fh:
+            responses.append(json.load(fh))
+    return responses
+
+
+class ReplayServer:
+    """
+    Local HTTP server that plays back recorded voyager responses in order
+
+    ``/search/...`` serves :data:`REPLAY_PAGE`; the n-th ``/voyager/api/`` request
+    (``start=n``) gets the n-th recorded body and 404 once they run out.
+    """
+
+    def __init__(self, fixture_dir: str, host: str = "127.0.0.1", port: int = 0):
+        self.responses = load_recorded(fixture_dir)
+        responses = self.responses
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.startswith(VOYAGER_PATH):
+                    index = int((parse_qs(url.query).get("start") or ["0"])[0])
+                    if index >= len(responses):
+                        return self._send(404, "application/json", b"{}")
+                    return self._send(200, "application/vnd.linkedin.normalized+json+2.1",
+                                      json.dumps(responses[index]["body"]).encode("utf-8"))
+                if url.path.startswith("/search/"):
+                    return self._send(200, "text/html; charset=utf-8", REPLAY_PAGE.encode("utf-8"))
+                self._send(404, "text/plain", b"not found")
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def capture_search(driver, url: str, max_scrolls: int = 10, wait: float = 3.0,
+                   on_posts: Optional[Callable[[List[ParsedPost]], None]] = None,
+                   should_stop: Optional[Callable[[], bool]] = None,
+                   record_dir: str = "") -> List[ParsedPost]:
+    """
+    Open a search URL and scroll until responses stop bringing new posts
+
+    Args:
+        driver: Driver started with performance logging
+        url: Search results URL (LinkedIn, or a ReplayServer page)
+        max_scrolls: Scrolls after the first page of results
+        wait: Seconds to wait after each scroll for another response
+        on_posts: Called with each batch of new posts as it arrives
+        should_stop: Checked after each batch; return True to stop scrolling
+        record_dir: Also save every captured response there
+
+    Returns:
+        List[ParsedPost]: Unique posts in arrival order
+    """
+    capture = NetworkCapture(driver, record_dir=record_dir)
+    capture.start()
+    driver.get(url)
+    seen = set()
+    collected = []
+    for scroll in range(max_scrolls + 1):
+        fresh = [post for post in capture.wait_for_posts(wait) if post.urn not in seen]
+        seen.update(post.urn for post in fresh)
+        collected.extend(fresh)
+        if fresh and on_posts:
+            on_posts(fresh)
+        if (not fresh and scroll) or (should_stop and should_stop()):
+            break
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    return collected
+
+
+def _cmd_capture(url: str, max_scrolls: int, record_dir: str):
+    from selenium import webdriver
+    options = enable_performance_logging(webdriver.ChromeOptions())
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    try:
+        posts = capture_search(driver, url, max_scrolls=max_scrolls, record_dir=record_dir,
+                               on_posts=lambda batch: print(f"+{len(batch)} posts", flush=True))
+    finally:
+        driver.quit()
+    for post in posts:
+        print(json.dumps({"urn": post.urn, "author": post.author, "profile_url": post.profile_url,
+                          "content": post.content[:80]}))
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Capture, replay and parse LinkedIn voyager responses")
+    parser.add_argument("command", choices=["serve", "capture", "parse"])
+    parser.add_argument("target", help="Fixture directory for 'serve'/'parse', search URL for 'capture'")
+    parser.add_argument("--port", type=int, default=8765, help="Port for 'serve'")
+    parser.add_argument("--scrolls", type=int, default=10, help="Max scrolls for 'capture'")
+    parser.add_argument("--record", default="", help="Directory to save captured responses to")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = ReplayServer(args.target, port=args.port)
+        print(f"Replaying {len(server.responses)} responses at {server.base_url}/search/results/content/", flush=True)
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+    elif args.command == "capture":
+        _cmd_capture(args.target, args.scrolls, args.record)
+    else:
+        responses = load_recorded(args.target)
+        if not responses:
+            sys.exit(f"No recorded responses in {args.target}")
+        for response in responses:
+            posts = parse_voyager_payload(response["body"])
+            print(f"{response.get('url', '')}: {len(posts)} posts")
+
+
+if __name__ == "__main__":
+    main()
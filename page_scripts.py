@@ -0,0 +1,262 @@
+"""
+JavaScript run inside the LinkedIn page through ``driver.execute_script``.
+
+Doing the DOM work page-side turns many WebDriver round trips (and full
+``page_source`` transfers) into one call per scroll. Each script is a
+plain string constant with a thin Python wrapper that runs it and
+normalises the result.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from html_parsing import AUTHOR_CSS, PROFILE_LINK_CSS
+
+# Attribute stamped on post nodes once their HTML has been handed to Python
+SEEN_ATTR = "data-moscraper-seen"
+# Attribute stamped on post nodes once the expander has looked at them
+EXPANDED_ATTR = "data-moscraper-expanded"
+
+# Posts below the fold haven't been through the expander yet; they are left for a later scroll
+NEW_POSTS_SCRIPT = """
+const [seenAttr, expandedAttr] = arguments;
+const nodes = document.querySelectorAll('div[data-urn]');
+const first = [];
+for (let i = 0; i < Math.min(3, nodes.length); i++) first.push(nodes[i].getAttribute('data-urn'));
+const posts = [];
+for (const node of nodes) {
+    if (node.hasAttribute(seenAttr) || !node.hasAttribute(expandedAttr)) continue;
+    posts.push({urn: node.getAttribute('data-urn'), html: node.outerHTML});
+    node.setAttribute(seenAttr, '1');
+}
+return {first: first, total: nodes.length, posts: posts};
+"""
+
+
+def collect_new_posts(driver) -> dict:
+    """
+    outerHTML of every post node not returned by an earlier call on this page
+
+    Only posts :func:`expand_collapsed_posts` has already visited are returned,
+    so call it first; the rest are picked up once a scroll brings them into view.
+
+    Returns:
+        dict: {'first': first 3 URNs on the page (for stale-scroll detection),
+               'total': post nodes on the page, 'posts': [{'urn', 'html'}, ...]}
+    """
+    result = driver.execute_script(NEW_POSTS_SCRIPT, SEEN_ATTR, EXPANDED_ATTR) or {}
+    return {
+        'first': result.get('first') or [],
+        'total': result.get('total') or 0,
+        'posts': result.get('posts') or [],
+    }
+
+# Lead mode: everything the email collector needs from each new post, in one round trip
+LEAD_POSTS_SCRIPT = """
+const [seenAttr, expandedAttr, authorCss, profileCss, snippetChars, seeMoreSource] = arguments;
+const seeMore = new RegExp(seeMoreSource, 'i');
+const nodes = Array.from(document.querySelectorAll('div[data-urn]'))
+    .filter(node => !node.hasAttribute(seenAttr) && node.hasAttribute(expandedAttr));
+const posts = [];
+for (const node of nodes) {
+    const author = node.querySelector(authorCss);
+    const profile = node.querySelector(profileCss);
+    const toggles = node.querySelectorAll('button, [role="button"]');
+    posts.push({
+        urn: node.getAttribute('data-urn'),
+        text: node.innerText || '',
+        html_snippet: node.innerHTML.slice(0, snippetChars),
+        author: author ? author.innerText.split('\\n')[0].trim() : '',
+        profile_url: profile ? profile.href : '',
+        mailto: Array.from(node.querySelectorAll('a[href^="mailto:"]'), a => a.getAttribute('href').slice(7)),
+        collapsed: Array.from(toggles).some(el => seeMore.test(el.innerText || '')),
+    });
+    node.setAttribute(seenAttr, '1');
+}
+return {total: document.querySelectorAll('div[data-urn]').length, posts: posts};
+"""
+
+# Visible label of LinkedIn's post expander ("…see more", "Show more")
+SEE_MORE_PATTERN = r"see more|show more|…\s*more"
+LEAD_SNIPPET_CHARS = 200
+
+
+def collect_lead_posts(driver) -> dict:
+    """
+    Text and metadata of every new post :func:`expand_collapsed_posts` has already visited
+
+    Returns:
+        dict: {'total': post nodes on the page, 'posts': [{'urn', 'text', 'html_snippet', 'author',
+               'profile_url', 'mailto', 'collapsed'}, ...]}; 'collapsed' marks posts whose
+               expansion timed out, so only their truncated text was read
+    """
+    result = driver.execute_script(LEAD_POSTS_SCRIPT, SEEN_ATTR, EXPANDED_ATTR, AUTHOR_CSS, PROFILE_LINK_CSS,
+                                   LEAD_SNIPPET_CHARS, SEE_MORE_PATTERN) or {}
+    posts = []
+    for post in result.get('posts') or []:
+        posts.append({
+            'urn': post.get('urn') or '',
+            'text': post.get('text') or '',
+            'html_snippet': post.get('html_snippet') or '',
+            'author': post.get('author') or 'Unknown',
+            'profile_url': post.get('profile_url') or '',
+            'mailto': post.get('mailto') or [],
+            'collapsed': bool(post.get('collapsed')),
+        })
+    return {'total': result.get('total') or 0, 'posts': posts}
+
+
+# Click the expander of every unvisited post down to the bottom of the viewport
+EXPAND_SCRIPT = """
+const [expandedAttr, seeMoreSource] = arguments;
+const seeMore = new RegExp(seeMoreSource, 'i');
+const clicked = [];
+for (const node of document.querySelectorAll('div[data-urn]')) {
+    if (node.hasAttribute(expandedAttr) || node.getBoundingClientRect().top > window.innerHeight) continue;
+    node.setAttribute(expandedAttr, '1');
+    const toggle = Array.from(node.querySelectorAll('button, [role="button"]'))
+        .find(el => seeMore.test(el.innerText || ''));
+    if (!toggle) continue;
+    toggle.click();
+    clicked.push(node.getAttribute('data-urn'));
+}
+return clicked;
+"""
+
+# How many of the given posts still show an expander
+COLLAPSED_COUNT_SCRIPT = """
+const [urns, seeMoreSource] = arguments;
+const seeMore = new RegExp(seeMoreSource, 'i');
+return urns.filter(urn => {
+    const node = document.querySelector('div[data-urn="' + CSS.escape(urn) + '"]');
+    return node && Array.from(node.querySelectorAll('button, [role="button"]'))
+        .some(el => seeMore.test(el.innerText || ''));
+}).length;
+"""
+
+
+@dataclass
+class ExpansionResult:
+    """What one bulk "see more" pass clicked and how long it waited for the text to expand."""
+    clicked: List[str] = field(default_factory=list)
+    still_collapsed: int = 0
+    wait_seconds: float = 0.0
+
+    def saved_seconds(self, sleep_per_click: float) -> float:
+        """Wait avoided compared with sleeping ``sleep_per_click`` after each click."""
+        return max(0.0, sleep_per_click * len(self.clicked) - self.wait_seconds)
+
+
+def expand_collapsed_posts(driver, timeout: float = 3.0, poll_frequency: float = 0.1) -> ExpansionResult:
+    """
+    Click every collapsed post in view in one call, then wait once until all of them have expanded
+
+    Args:
+        driver: WebDriver on a search results page
+        timeout: Longest to wait for the expanded text before moving on
+        poll_frequency: Seconds between checks of the DOM condition
+
+    Returns:
+        ExpansionResult: ``still_collapsed`` is non-zero when the wait timed out
+    """
+    clicked = driver.execute_script(EXPAND_SCRIPT, EXPANDED_ATTR, SEE_MORE_PATTERN) or []
+    if not clicked:
+        return ExpansionResult()
+    started = time.perf_counter()
+    still_collapsed = 0
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(
+            lambda d: d.execute_script(COLLAPSED_COUNT_SCRIPT, clicked, SEE_MORE_PATTERN) == 0
+        )
+    except TimeoutException:
+        still_collapsed = driver.execute_script(COLLAPSED_COUNT_SCRIPT, clicked, SEE_MORE_PATTERN) or 0
+    return ExpansionResult(clicked=clicked, still_collapsed=still_collapsed,
+                           wait_seconds=time.perf_counter() - started)
+
+
+# Scroll one step and (re)arm a page-side watcher: a MutationObserver counts post nodes added since
+# the scroll, and DOM mutations or finished resource loads mark the page as still busy
+SCROLL_SCRIPT = """
+const [step] = arguments;
+let state = window.__moscraperScroll;
+if (!state) {
+    state = window.__moscraperScroll = {added: 0, lastActivity: performance.now()};
+    new MutationObserver(records => {
+        for (const record of records) {
+            for (const node of record.addedNodes) {
+                if (node.nodeType !== Node.ELEMENT_NODE) continue;
+                if (node.matches('div[data-urn]')) state.added++;
+                state.added += node.querySelectorAll('div[data-urn]').length;
+            }
+        }
+        state.lastActivity = performance.now();
+    }).observe(document.body, {childList: true, subtree: true});
+    new PerformanceObserver(() => { state.lastActivity = performance.now(); }).observe({type: 'resource'});
+}
+state.added = 0;
+state.lastActivity = performance.now();
+const root = document.scrollingElement || document.documentElement;
+const bottom = Math.max(0, root.scrollHeight - window.innerHeight);
+const target = Math.min(window.scrollY + step, bottom);
+window.scrollTo(0, target);
+return {total: document.querySelectorAll('div[data-urn]').length, at_bottom: target >= bottom};
+"""
+
+SCROLL_STATUS_SCRIPT = """
+const state = window.__moscraperScroll;
+if (!state) return {added: 0, quiet_ms: 0};
+return {added: state.added, quiet_ms: performance.now() - state.lastActivity};
+"""
+
+
+@dataclass
+class ScrollResult:
+    """What one scroll step brought in and why the wait after it ended ('posts', 'idle' or 'timeout')."""
+    new_posts: int = 0
+    at_bottom: bool = False
+    reason: str = ""
+    wait_seconds: float = 0.0
+
+
+def scroll_and_wait(driver, step: int = 1000, min_pause: float = 0.5, timeout: float = 5.0,
+                    idle_ms: float = 1000, poll_frequency: float = 0.1) -> ScrollResult:
+    """
+    Scroll ``step`` pixels down from the current position and wait for the page to react
+
+    The target is clamped to the bottom of what is loaded, so a scroll never
+    jumps past posts that haven't rendered yet. The wait ends as soon as new
+    post nodes appear, or once the page has been quiet (no DOM changes, no
+    finished requests) for ``idle_ms``, but never before ``min_pause``.
+
+    Args:
+        driver: WebDriver on a search results page
+        step: Pixels to scroll down
+        min_pause: Pacing floor in seconds, however quickly the page responds
+        timeout: Longest to wait for either condition
+        idle_ms: Quiet period that counts as "nothing more is coming"
+        poll_frequency: Seconds between checks of the page-side state
+
+    Returns:
+        ScrollResult
+    """
+    def settled(d):
+        status = d.execute_script(SCROLL_STATUS_SCRIPT) or {}
+        return status if status.get('added') or status.get('quiet_ms', 0) >= idle_ms else False
+
+    started = time.perf_counter()
+    scrolled = driver.execute_script(SCROLL_SCRIPT, int(step)) or {}
+    reason = "timeout"
+    try:
+        status = WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(settled)
+        reason = "posts" if status.get('added') else "idle"
+    except TimeoutException:
+        status = driver.execute_script(SCROLL_STATUS_SCRIPT) or {}
+    remaining = min_pause - (time.perf_counter() - started)
+    if remaining > 0:
+        time.sleep(remaining)
+    return ScrollResult(new_posts=int(status.get('added') or 0), at_bottom=bool(scrolled.get('at_bottom')),
+                        reason=reason, wait_seconds=time.perf_counter() - started)
@@ -0,0 +1,259 @@
+"""
+Track, measure and clean up the browser processes MoScraper starts.
+
+``cleanup_chrome_processes`` used to ``pkill -f chrome``, taking every Chrome
+on the machine with it. The supervisor instead records the chromedriver and
+Chrome PIDs of each driver it is given (with their start times, so a reused
+PID is never mistaken for ours), samples RSS and CPU across each browser's
+process tree with psutil, and only ever terminates those trees. The PID list
+is persisted, one file per server process, so trees orphaned by a crashed
+server can still be cleaned up on the next start without touching the
+browsers of another server that is still running in the same folder.
+
+Besides WebDrivers, any object with a ``pid`` (a ``multiprocessing.Process``
+running its own browser) can be registered; its whole tree is tracked.
+
+psutil is optional: without it nothing is sampled, and cleanup falls back to
+``driver.quit()`` (``process.terminate()``).
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PROCESS_DIR = os.path.join(".moscraper_cache", "browser_processes")
+
+
+@dataclass
+class TrackedBrowser:
+    """Root processes of one driver: chromedriver and, when it isn't a child of it, Chrome."""
+    label: str
+    pids: Dict[int, float] = field(default_factory=dict)  # pid -> create_time
+    driver: object = None
+    registered_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class ProcessStats:
+    label: str
+    processes: int = 0
+    rss_mb: float = 0.0
+    cpu_percent: float = 0.0
+    alive: bool = True
+    age_seconds: float = 0.0
+
+
+def _root_pids(driver) -> List[int]:
+    if getattr(driver, "pid", None):
+        return [driver.pid]
+    pids = []
+    service = getattr(driver, "service", None)
+    process = getattr(service, "process", None)
+    if getattr(process, "pid", None):
+        pids.append(process.pid)
+    # undetected-chromedriver starts Chrome itself rather than through chromedriver
+    browser_pid = getattr(driver, "browser_pid", None)
+    if browser_pid and browser_pid not in pids:
+        pids.append(browser_pid)
+    return pids
+
+
+def _create_time(pid: int) -> float:
+    try:
+        return psutil.Process(pid).create_time() if psutil else 0.0
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return 0.0
+
+
+def _process(pid: int, create_time: float):
+    """psutil.Process for ``pid`` if it is still the same process we recorded, else None."""
+    try:
+        proc = psutil.Process(pid)
+        if abs(proc.create_time() - create_time) > 1.0:
+            return None
+        return proc
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+
+def _tree(roots) -> List:
+    procs = {}
+    for root in roots:
+        procs[root.pid] = root
+        try:
+            for child in root.children(recursive=True):
+                procs[child.pid] = child
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return list(procs.values())
+
+
+def _kill(procs, timeout: float = 5.0):
+    for proc in procs:
+        try:
+            proc.terminate()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    _, alive = psutil.wait_procs(procs, timeout=timeout)
+    for proc in alive:
+        try:
+            proc.kill()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+
+
+class ProcessSupervisor:
+    """
+    Registry of the browsers this app launched
+
+    Args:
+        memory_ceiling_mb: RSS of a whole browser tree above which it should be recycled; 0 disables
+        state_dir: Directory the tracked PIDs are mirrored to, as ``<server pid>.json``; None keeps
+            them in memory only
+    """
+
+    def __init__(self, memory_ceiling_mb: float = 0, state_dir: Optional[str] = PROCESS_DIR):
+        self.memory_ceiling_mb = memory_ceiling_mb
+        self.state_dir = state_dir
+        self.state_path = os.path.join(state_dir, f"{os.getpid()}.json") if state_dir else None
+        self._owner = {"pid": os.getpid(), "create_time": _create_time(os.getpid())}
+        self._browsers: Dict[int, TrackedBrowser] = {}  # id(driver) -> browser
+        self._cpu_probes: Dict[int, object] = {}  # pid -> psutil.Process primed for cpu_percent
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return psutil is not None
+
+    def _save(self):
+        if self.state_path is None:
+            return
+        entries = [{"label": b.label, "pids": {str(pid): ct for pid, ct in b.pids.items()}}
+                   for b in self._browsers.values()]
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            with open(self.state_path, "w", encoding="utf-8") as fh:
+                json.dump({"owner": self._owner, "browsers": entries}, fh)
+        except OSError:
+            pass
+
+    def register(self, driver, label: str) -> TrackedBrowser:
+        """Start tracking a freshly launched driver's process tree."""
+        browser = TrackedBrowser(label=label, driver=driver)
+        if self.available:
+            for pid in _root_pids(driver):
+                try:
+                    browser.pids[pid] = psutil.Process(pid).create_time()
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+        with self._lock:
+            self._browsers[id(driver)] = browser
+            self._save()
+        return browser
+
+    def unregister(self, driver):
+        with self._lock:
+            self._browsers.pop(id(driver), None)
+            self._save()
+
+    def drivers(self) -> List:
+        with self._lock:
+            return [browser.driver for browser in self._browsers.values()]
+
+    def _procs(self, browser: TrackedBrowser) -> List:
+        roots = [proc for proc in (_process(pid, ct) for pid, ct in browser.pids.items()) if proc]
+        return _tree(roots)
+
+    def stats(self, driver) -> Optional[ProcessStats]:
+        with self._lock:
+            browser = self._browsers.get(id(driver))
+        return self._stats(browser) if browser and self.available else None
+
+    def _stats(self, browser: TrackedBrowser) -> ProcessStats:
+        stats = ProcessStats(label=browser.label, age_seconds=time.time() - browser.registered_at)
+        procs = self._procs(browser)
+        stats.alive = bool(procs)
+        for proc in procs:
+            # cpu_percent compares against the previous call on the same Process object
+            probe = self._cpu_probes.setdefault(proc.pid, proc)
+            try:
+                stats.rss_mb += proc.memory_info().rss / (1024 * 1024)
+                stats.cpu_percent += probe.cpu_percent(None)
+                stats.processes += 1
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return stats
+
+    def sample(self) -> List[ProcessStats]:
+        """Current RSS/CPU of every tracked browser (empty without psutil)."""
+        if not self.available:
+            return []
+        with self._lock:
+            browsers = list(self._browsers.values())
+        stats = [self._stats(browser) for browser in browsers]
+        self._cpu_probes = {pid: probe for pid, probe in self._cpu_probes.items() if psutil.pid_exists(pid)}
+        return stats
+
+    def over_ceiling(self, driver, ceiling_mb: Optional[float] = None) -> bool:
+        """Whether the driver's whole process tree uses more than ``ceiling_mb`` (default: the configured ceiling)."""
+        ceiling_mb = self.memory_ceiling_mb if ceiling_mb is None else ceiling_mb
+        if not ceiling_mb:
+            return False
+        stats = self.stats(driver)
+        return bool(stats and stats.rss_mb > ceiling_mb)
+
+    def terminate(self, driver, timeout: float = 5.0):
+        """Quit the driver (or terminate the process), then kill whatever is left of its tree, and stop tracking it."""
+        with self._lock:
+            browser = self._browsers.pop(id(driver), None)
+            self._save()
+        procs = self._procs(browser) if browser and self.available else []
+        try:
+            stop = getattr(driver, "quit", None) or getattr(driver, "terminate")
+            stop()
+        except Exception:
+            pass
+        if procs:
+            _kill([proc for proc in procs if proc.is_running()], timeout)
+
+    def terminate_all(self):
+        """Terminate every tracked browser."""
+        for driver in self.drivers():
+            self.terminate(driver)
+
+    def reap_orphans(self) -> int:
+        """Kill process trees recorded by server processes that have exited, and drop their state files."""
+        if not self.available or not self.state_dir or not os.path.isdir(self.state_dir):
+            return 0
+        roots = []
+        for name in os.listdir(self.state_dir):
+            path = os.path.join(self.state_dir, name)
+            if not name.endswith(".json") or path == self.state_path:
+                continue
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    state = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            owner = state.get("owner") or {}
+            if owner.get("pid") and _process(int(owner["pid"]), float(owner.get("create_time") or 0)):
+                # That server is still running; its browsers are its own business
+                continue
+            roots += [proc for entry in state.get("browsers") or [] for pid, ct in (entry.get("pids") or {}).items()
+                      if (proc := _process(int(pid), float(ct)))]
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        procs = _tree(roots)
+        if procs:
+            _kill(procs)
+        return len(procs)
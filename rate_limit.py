@@ -0,0 +1,246 @@
+"""
+Rate limiting primitives shared by the SMTP and LLM dispatchers.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional, Tuple
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    Tokens refill continuously at ``rate_per_minute / 60`` per second up to
+    ``burst``. ``acquire`` blocks until a token is available, so callers on
+    several threads share one throughput ceiling instead of each sleeping a
+    fixed delay.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_second)
+            self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` if available; otherwise return the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate_per_second
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until ``tokens`` are taken. Returns False if ``timeout`` expires first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter steered by provider rate-limit signals.
+
+    Callers hold a slot for the duration of one request. The number of slots
+    grows additively (about +1 per round of successful requests) and halves
+    on every 429. When the provider says the budget is exhausted, either via
+    ``retry-after`` or because ``x-ratelimit-remaining-*`` hit zero, all
+    callers pause until the advertised reset instead of stalling for a fixed
+    cooldown.
+    """
+
+    def __init__(self, initial: float = 2.0, minimum: float = 1.0, maximum: float = 16.0,
+                 increase: float = 1.0, decrease_factor: float = 0.5, default_backoff: float = 2.0,
+                 max_backoff: float = 60.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.default_backoff = default_backoff
+        self.max_backoff = max_backoff
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.rate_limited = 0
+        self.successes = 0
+        self.last_remaining_requests = None
+        self.last_remaining_tokens = None
+        self._consecutive_limited = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a slot is free and no provider-imposed pause is active."""
+        with self._cond:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self):
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def _pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + min(seconds, self.max_backoff))
+
+    def on_success(self, remaining_requests: Optional[int] = None, reset_requests: Optional[float] = None,
+                   remaining_tokens: Optional[int] = None, reset_tokens: Optional[float] = None):
+        """Additive increase, plus a pause if the response says the window is used up."""
+        with self._cond:
+            self.successes += 1
+            self._consecutive_limited = 0
+            self.limit = min(self.maximum, self.limit + self.increase / max(self.limit, 1.0))
+            self.last_remaining_requests = remaining_requests
+            self.last_remaining_tokens = remaining_tokens
+            if remaining_requests is not None and remaining_requests <= 0 and reset_requests:
+                self._pause(reset_requests)
+            if remaining_tokens is not None and remaining_tokens <= 0 and reset_tokens:
+                self._pause(reset_tokens)
+            self._cond.notify_all()
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """Multiplicative decrease and a shared pause for the server-suggested time."""
+        with self._cond:
+            self.rate_limited += 1
+            self._consecutive_limited += 1
+            self.limit = max(self.minimum, self.limit * self.decrease_factor)
+            if retry_after is None:
+                retry_after = self.default_backoff * (2 ** (self._consecutive_limited - 1))
+            self._pause(retry_after)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'concurrency_limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'successes': self.successes,
+                'rate_limited': self.rate_limited,
+                'paused_for': round(max(0.0, self.paused_until - time.monotonic()), 1),
+                'remaining_requests': self.last_remaining_requests,
+                'remaining_tokens': self.last_remaining_tokens,
+            }
+
+
+class TokenBudgetScheduler:
+    """Packs requests into per-minute request (RPM) and token (TPM) budgets.
+
+    Each request reserves its estimated tokens (prompt estimate plus the
+    completion allowance) in a sliding 60-second window and blocks only as
+    long as needed for older reservations to age out. Once the response
+    arrives, :meth:`settle` replaces the estimate with the real ``usage``
+    and recalibrates the chars-per-token estimate, so later requests are
+    packed more tightly.
+    """
+
+    CHARS_PER_TOKEN = 4.0
+    MESSAGE_OVERHEAD_TOKENS = 8
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 window_seconds: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window_seconds = window_seconds
+        self.calibration = 1.0
+        self.requests = 0
+        self.tokens_used = 0
+        self.wait_seconds = 0.0
+        self._events = deque()  # [timestamp, tokens]; tokens is rewritten on settle
+        self._cond = threading.Condition()
+
+    def estimate(self, prompt_chars: int, max_completion_tokens: int = 0, messages: int = 2) -> Tuple[int, int]:
+        """Return (estimated prompt tokens, tokens to reserve including the completion allowance)."""
+        prompt = int(math.ceil(prompt_chars / self.CHARS_PER_TOKEN * self.calibration)) + messages * self.MESSAGE_OVERHEAD_TOKENS
+        return prompt, prompt + int(max_completion_tokens or 0)
+
+    def _prune(self, now: float):
+        while self._events and now - self._events[0][0] >= self.window_seconds:
+            self._events.popleft()
+
+    def _wait_needed(self, tokens: int, now: float) -> float:
+        wait = 0.0
+        if self.requests_per_minute and len(self._events) >= self.requests_per_minute:
+            oldest = self._events[len(self._events) - self.requests_per_minute]
+            wait = max(wait, oldest[0] + self.window_seconds - now)
+        if self.tokens_per_minute and self._events:
+            # A request bigger than the whole budget still goes out once the window is empty
+            tokens = min(tokens, self.tokens_per_minute)
+            excess = sum(event[1] for event in self._events) + tokens - self.tokens_per_minute
+            for event in self._events:
+                if excess <= 0:
+                    break
+                excess -= event[1]
+                wait = max(wait, event[0] + self.window_seconds - now)
+        return wait
+
+    def reserve(self, tokens: int) -> list:
+        """Block until ``tokens`` fit into both budgets, then record the reservation."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                wait = self._wait_needed(tokens, now)
+                if wait <= 0:
+                    entry = [now, tokens]
+                    self._events.append(entry)
+                    self.requests += 1
+                    return entry
+                self.wait_seconds += wait
+                self._cond.wait(timeout=wait)
+
+    def settle(self, entry: list, actual_tokens: Optional[int], estimated_prompt: Optional[int] = None,
+               actual_prompt: Optional[int] = None):
+        """Replace a reservation's estimate with the tokens the provider actually billed."""
+        with self._cond:
+            if actual_tokens is not None:
+                entry[1] = int(actual_tokens)
+                self.tokens_used += int(actual_tokens)
+            if estimated_prompt and actual_prompt:
+                # Exponential moving average of how far off the chars/4 estimate is
+                ratio = actual_prompt / estimated_prompt
+                self.calibration = max(0.25, min(4.0, self.calibration * (0.8 + 0.2 * ratio)))
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._prune(time.monotonic())
+            return {
+                'requests_last_minute': len(self._events),
+                'tokens_last_minute': sum(event[1] for event in self._events),
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'calibration': round(self.calibration, 2),
+                'requests': self.requests,
+                'tokens_used': self.tokens_used,
+                'wait_seconds': round(self.wait_seconds, 1),
+            }
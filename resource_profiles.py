@@ -0,0 +1,155 @@
+"""
+Resource-blocking profiles for the scraping browsers.
+
+The scraper only reads post text, yet a search page pulls in hundreds of
+images, videos, fonts and tracking beacons. A profile is a list of
+``Network.setBlockedURLs`` patterns applied over the DevTools protocol, so
+it works on an already running driver (login browser, parallel browsers,
+undetected-chromedriver) without restarting it:
+
+- ``full``: block nothing
+- ``text-only``: block images, media and fonts
+- ``minimal``: text-only plus analytics, ad and tracking hosts
+
+:func:`measure_page` reads the Resource Timing API to report bytes
+transferred and page-ready time, so profiles can be compared:
+
+    python resource_profiles.py "https://www.linkedin.com/search/results/content/?keywords=test" --scrolls 5
+"""
+
+import argparse
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+IMAGE_PATTERNS = [
+    "*media.licdn.com/dms/image/*", "*static.licdn.com/aero-v1/sc/h/*.png", "*static.licdn.com/aero-v1/sc/h/*.jpg",
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.ico",
+]
+MEDIA_PATTERNS = ["*dms.licdn.com/playlist/*", "*.mp4", "*.webm", "*.m3u8", "*.ts", "*.mp3"]
+FONT_PATTERNS = ["*.woff", "*.woff2", "*.ttf", "*.otf"]
+TRACKER_PATTERNS = [
+    "*px.ads.linkedin.com/*", "*linkedin.com/li/track*", "*snap.licdn.com/*", "*linkedin.com/realtime/*",
+    "*google-analytics.com/*", "*googletagmanager.com/*", "*doubleclick.net/*", "*bat.bing.com/*",
+    "*connect.facebook.net/*", "*sentry.io/*",
+]
+
+# The Resource Timing buffer holds 250 entries by default; a long scroll session fetches more
+RESOURCE_BUFFER_SCRIPT = "performance.setResourceTimingBufferSize(10000);"
+
+PAGE_METRICS_SCRIPT = """
+const nav = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+let bytes = nav ? nav.transferSize : 0;
+for (const entry of resources) bytes += entry.transferSize || 0;
+return {
+    bytes: bytes,
+    resources: resources.length,
+    dom_ready_ms: nav ? nav.domContentLoadedEventEnd - nav.startTime : 0,
+    load_ms: nav && nav.loadEventEnd ? nav.loadEventEnd - nav.startTime : 0,
+};
+"""
+
+
+@dataclass
+class ResourceProfile:
+    """A named set of URL patterns the browser refuses to fetch."""
+    name: str
+    description: str
+    blocked: List[str] = field(default_factory=list)
+
+
+PROFILES: Dict[str, ResourceProfile] = {
+    "full": ResourceProfile("full", "Load everything, like a normal browser"),
+    "text-only": ResourceProfile("text-only", "Block images, video and fonts",
+                                 IMAGE_PATTERNS + MEDIA_PATTERNS + FONT_PATTERNS),
+    "minimal": ResourceProfile("minimal", "Text-only, plus analytics, ad and tracking hosts",
+                               IMAGE_PATTERNS + MEDIA_PATTERNS + FONT_PATTERNS + TRACKER_PATTERNS),
+}
+DEFAULT_PROFILE = "text-only"
+
+
+@dataclass
+class PageMetrics:
+    """What the current document cost to load, from the browser's own timing entries."""
+    profile: str = ""
+    bytes_transferred: int = 0
+    resources: int = 0
+    dom_ready_ms: float = 0.0
+    load_ms: float = 0.0
+
+    @property
+    def megabytes(self) -> float:
+        return self.bytes_transferred / (1024 * 1024)
+
+
+def apply_profile(driver, profile_name: str = DEFAULT_PROFILE) -> ResourceProfile:
+    """
+    Block the profile's URL patterns on a running Chrome driver
+
+    Applies to every request from then on, including later navigations. An
+    unknown name falls back to ``full``.
+
+    Returns:
+        ResourceProfile: The profile that was applied
+    """
+    profile = PROFILES.get(profile_name, PROFILES["full"])
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": profile.blocked})
+    # Registered scripts pile up per call, so only add the buffer resize once per driver
+    if not getattr(driver, "_resource_buffer_script", False):
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": RESOURCE_BUFFER_SCRIPT})
+        driver._resource_buffer_script = True
+    return profile
+
+
+def measure_page(driver, profile_name: str = "") -> PageMetrics:
+    """Bytes transferred and ready times of the current document, counted since it was loaded."""
+    result = driver.execute_script(PAGE_METRICS_SCRIPT) or {}
+    return PageMetrics(
+        profile=profile_name,
+        bytes_transferred=int(result.get("bytes") or 0),
+        resources=int(result.get("resources") or 0),
+        dom_ready_ms=float(result.get("dom_ready_ms") or 0),
+        load_ms=float(result.get("load_ms") or 0),
+    )
+
+
+def compare_profiles(driver, url: str, profiles: Optional[Sequence[str]] = None, scrolls: int = 5,
+                     scroll_pause: float = 1.0) -> List[PageMetrics]:
+    """Load ``url`` under each profile, scroll it ``scrolls`` times and measure what was transferred."""
+    metrics = []
+    for name in profiles or list(PROFILES):
+        apply_profile(driver, name)
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        driver.get(url)
+        for _ in range(scrolls):
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            time.sleep(scroll_pause)
+        metrics.append(measure_page(driver, name))
+    return metrics
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare bytes transferred and load time per resource profile")
+    parser.add_argument("url")
+    parser.add_argument("--scrolls", type=int, default=5)
+    parser.add_argument("--profiles", nargs="*", choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument("--headless", action="store_true")
+    args = parser.parse_args(argv)
+
+    from selenium import webdriver
+    options = webdriver.ChromeOptions()
+    if args.headless:
+        options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    try:
+        for m in compare_profiles(driver, args.url, args.profiles, args.scrolls):
+            print(f"{m.profile:<10} {m.megabytes:8.2f} MB {m.resources:5d} requests "
+                  f"DOM ready {m.dom_ready_ms:7.0f} ms  load {m.load_ms:7.0f} ms")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
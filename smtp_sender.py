@@ -0,0 +1,206 @@
+"""
+Persistent SMTP sender for Mo Scraper bulk email campaigns.
+
+Keeps one authenticated connection open across a whole batch instead of
+reconnecting, running STARTTLS and logging in for every recipient.
+"""
+
+import smtplib
+import ssl
+import time
+from dataclasses import dataclass, field
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import List, Optional, Tuple
+
+
+REGARDS_SECTION = """
+
+Check out our portfolio: https://drive.google.com/file/d/1zaK36IRSEWesf2ccPudco_G6fdPD2YYN/view?usp=sharing
+
+Best regards,
+Anusha
+Moshi Moshi Communications Ltd.
+Bangalore
+
++91 91485 44178
+www.moshimoshi.in
+"""
+
+
+def with_regards(body: str) -> str:
+    """Append the hardcoded regards section unless the body already has one."""
+    if "Best regards," in body or "Moshi Moshi Communications" in body:
+        return body
+    return body + REGARDS_SECTION
+
+
+def build_message(sender_email: str, sender_name: str, recipient_email: str, subject: str, body: str) -> MIMEMultipart:
+    """Build the MIME message for a single outreach email."""
+    msg = MIMEMultipart()
+    msg['From'] = f"{sender_name} <{sender_email}>"
+    msg['To'] = recipient_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(with_regards(body), 'plain'))
+    return msg
+
+
+@dataclass
+class SMTPTimings:
+    """Per-connection and per-message timings collected by an SMTPSender."""
+    connect_seconds: List[float] = field(default_factory=list)
+    message_seconds: List[float] = field(default_factory=list)
+    reconnects: int = 0
+    noop_checks: int = 0
+
+    @classmethod
+    def merge(cls, timings: List["SMTPTimings"]) -> "SMTPTimings":
+        """Combine the timings of several senders (one per parallel connection)."""
+        merged = cls()
+        for t in timings:
+            merged.connect_seconds.extend(t.connect_seconds)
+            merged.message_seconds.extend(t.message_seconds)
+            merged.reconnects += t.reconnects
+            merged.noop_checks += t.noop_checks
+        return merged
+
+    def summary(self) -> dict:
+        def avg(values):
+            return sum(values) / len(values) if values else 0.0
+        return {
+            'connections': len(self.connect_seconds),
+            'reconnects': self.reconnects,
+            'noop_checks': self.noop_checks,
+            'avg_connect_seconds': round(avg(self.connect_seconds), 3),
+            'messages': len(self.message_seconds),
+            'avg_message_seconds': round(avg(self.message_seconds), 3),
+            'total_message_seconds': round(sum(self.message_seconds), 3),
+        }
+
+
+class SMTPSender:
+    """Sends many messages over one reusable, authenticated SMTP session.
+
+    The connection is opened lazily, probed with NOOP when it has been idle
+    for longer than ``noop_interval`` seconds, and transparently re-opened
+    when the server drops it (Gmail closes idle sessions and caps messages
+    per session).
+    """
+
+    def __init__(self, sender_email: str, sender_password: str, sender_name: str = "Anusha from Moshi Moshi",
+                 smtp_server: str = "smtp.gmail.com", smtp_port: int = 587, timeout: float = 30.0,
+                 noop_interval: float = 30.0, max_messages_per_connection: Optional[int] = 90):
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.sender_name = sender_name
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.timeout = timeout
+        self.noop_interval = noop_interval
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timings = SMTPTimings()
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._sent_on_connection = 0
+        self._auth_failed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def connect(self):
+        """Open a new connection, upgrade it with STARTTLS and log in."""
+        self.close()
+        start = time.perf_counter()
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            server.starttls(context=ssl.create_default_context())
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+            raise
+        self.timings.connect_seconds.append(time.perf_counter() - start)
+        self._server = server
+        self._last_used = time.monotonic()
+        self._sent_on_connection = 0
+
+    def close(self):
+        """Politely end the session, ignoring servers that already hung up."""
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+        self._server = None
+
+    def is_alive(self) -> bool:
+        """Check the session with NOOP; a 250 reply means it is still usable."""
+        if self._server is None:
+            return False
+        self.timings.noop_checks += 1
+        try:
+            code, _ = self._server.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    def _ensure_connection(self):
+        if self._server is None:
+            self.connect()
+            return
+        if self.max_messages_per_connection and self._sent_on_connection >= self.max_messages_per_connection:
+            self.timings.reconnects += 1
+            self.connect()
+            return
+        if time.monotonic() - self._last_used > self.noop_interval and not self.is_alive():
+            self.timings.reconnects += 1
+            self.connect()
+
+    def send(self, recipient_email: str, subject: str, body: str) -> Tuple[bool, str]:
+        """
+        Send one email over the shared session
+
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        if self._auth_failed:
+            # Don't hammer the server with logins it has already rejected
+            return False, "Authentication failed. Please check your email and app password."
+        msg = build_message(self.sender_email, self.sender_name, recipient_email, subject, body)
+        start = time.perf_counter()
+        try:
+            for attempt in range(2):
+                try:
+                    self._ensure_connection()
+                    self._server.send_message(msg)
+                    break
+                except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException, ConnectionError, TimeoutError) as e:
+                    # Only a dropped session (or Gmail's 421 "try again later") is worth a reconnect
+                    if isinstance(e, smtplib.SMTPResponseException) and e.smtp_code != 421:
+                        raise
+                    # Session dropped mid-batch: release the socket, reconnect once and retry this message
+                    self.close()
+                    if attempt:
+                        raise
+                    self.timings.reconnects += 1
+            self._last_used = time.monotonic()
+            self._sent_on_connection += 1
+            return True, f"Email sent successfully to {recipient_email}"
+        except smtplib.SMTPAuthenticationError:
+            self._auth_failed = True
+            return False, "Authentication failed. Please check your email and app password."
+        except smtplib.SMTPRecipientsRefused:
+            return False, f"Recipient email {recipient_email} was refused by the server."
+        except Exception as e:
+            return False, f"Failed to send email: {str(e)}"
+        finally:
+            self.timings.message_seconds.append(time.perf_counter() - start)